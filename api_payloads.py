@@ -0,0 +1,164 @@
+import re
+from review_extractor import to_review_record
+
+# Wraps fetch and XMLHttpRequest so every 2GIS API JSON response is pushed into window.api2gisResponses.
+# Registered with Page.addScriptToEvaluateOnNewDocument, so it runs in every document before the page's own scripts.
+API_HOOK_JS = """
+(function() {
+    if (window.__p2gApiHook) return;
+    window.__p2gApiHook = true;
+    window.api2gisResponses = window.api2gisResponses || [];
+    const isApi = url => /api\\.2gis|reviews\\.2gis/.test(url || '');
+    const store = (url, data) => window.api2gisResponses.push({url: url, data: data});
+
+    const originalFetch = window.fetch;
+    window.fetch = function(input) {
+        const promise = originalFetch.apply(this, arguments);
+        const url = typeof input === 'string' ? input : (input && input.url);
+        if (isApi(url)) {
+            promise.then(response => {
+                if (response.ok) {
+                    response.clone().json().then(data => store(url, data)).catch(() => {});
+                }
+            }).catch(() => {});
+        }
+        return promise;
+    };
+
+    const originalOpen = XMLHttpRequest.prototype.open;
+    XMLHttpRequest.prototype.open = function(method, url) {
+        if (isApi(String(url))) {
+            this.addEventListener('load', () => {
+                if (this.status >= 200 && this.status < 300) {
+                    try { store(String(url), JSON.parse(this.responseText)); } catch (e) {}
+                }
+            });
+        }
+        return originalOpen.apply(this, arguments);
+    };
+})();
+"""
+
+# Removes and returns the buffered responses whose URL matches arguments[0] (all of them when null)
+DRAIN_API_RESPONSES_JS = """
+    const buffer = window.api2gisResponses || [];
+    const pattern = arguments[0] ? new RegExp(arguments[0]) : null;
+    const drained = [];
+    const kept = [];
+    for (const entry of buffer) {
+        (!pattern || pattern.test(entry.url) ? drained : kept).push(entry);
+    }
+    window.api2gisResponses = kept;
+    return drained;
+"""
+
+# Reviews come from public-api.reviews.2gis.com/2.0/branches/<id>/reviews; catalog /items calls may
+# also mention reviews in their fields parameter, so only the path identifies them
+REVIEWS_URL_PATTERN = r'/branches/\d+/reviews'
+FIRMS_URL_PATTERN = r'/items'
+
+
+def firm_id_from_url(url):
+    """Extract the numeric firm id from a 2gis.ru firm link, or None"""
+    match = re.search(r'/firm/(\d+)', url or '')
+    return match.group(1) if match else None
+
+
+def install_api_hook(driver):
+    """Register the API hook for every future document and run it in the current one"""
+    driver.execute_cdp_cmd('Page.enable', {})
+    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': API_HOOK_JS})
+    driver.execute_script(API_HOOK_JS)
+
+
+def drain_api_responses(driver, url_pattern=None):
+    """Remove and return captured API responses as a list of {'url', 'data'} dicts"""
+    return driver.execute_script(DRAIN_API_RESPONSES_JS, url_pattern) or []
+
+
+def to_int(value, default=0):
+    """Convert API numbers (which may arrive as strings or floats) to int"""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_reviews_payload(data):
+    """
+    Map a reviews API response into review records
+
+    Args:
+        data: Decoded JSON of a public-api.reviews.2gis.com response
+
+    Returns:
+        list: Review dicts as built by review_extractor.to_review_record(), with the full text and the API's review id
+    """
+    reviews = []
+    for item in (data or {}).get('reviews') or []:
+        user = item.get('user') or {}
+        reviews.append(to_review_record({
+            "name": (user.get('name') or '').strip(),
+            "stars": to_int(item.get('rating'), None),
+            "text": (item.get('text') or '').strip() or None,
+            "likes": to_int(item.get('likes_count')),
+            "date": item.get('date_created') or '',
+            "review_id": item.get('id', ''),
+        }))
+    return reviews
+
+
+def parse_firm_payload(data):
+    """
+    Map a catalog API response into place records keyed by the parser's column names
+
+    Args:
+        data: Decoded JSON of a catalog.api.2gis response
+
+    Returns:
+        list: Place dicts with name, phone, address, link and coordinates
+    """
+    places = []
+    for item in ((data or {}).get('result') or {}).get('items') or []:
+        if not item.get('name'):
+            continue
+        phone = ''
+        for group in item.get('contact_groups') or []:
+            for contact in group.get('contacts') or []:
+                if contact.get('type') == 'phone':
+                    phone = contact.get('text') or contact.get('value') or ''
+                    break
+            if phone:
+                break
+        point = item.get('point') or {}
+        firm_id = str(item.get('id', '')).split('_')[0]
+        places.append({
+            'id': firm_id,
+            'Название': item['name'],
+            'Телефон': phone,
+            'Адрес': item.get('address_name') or item.get('full_address_name') or '',
+            'Ссылка': f"https://2gis.ru/firm/{firm_id}" if firm_id else '',
+            'Широта': point.get('lat', ''),
+            'Долгота': point.get('lon', ''),
+            'rating': (item.get('reviews') or {}).get('general_rating'),
+            'reviews_count': to_int((item.get('reviews') or {}).get('general_review_count')),
+        })
+    return places
+
+
+def map_payloads(entries):
+    """
+    Split drained API responses into firm and review records
+
+    Returns:
+        tuple: (list of place dicts, list of review dicts)
+    """
+    firms, reviews = [], []
+    for entry in entries:
+        url = entry.get('url') or ''
+        data = entry.get('data')
+        if re.search(REVIEWS_URL_PATTERN, url):
+            reviews.extend(parse_reviews_payload(data))
+        elif re.search(FIRMS_URL_PATTERN, url):
+            firms.extend(parse_firm_payload(data))
+    return firms, reviews
@@ -0,0 +1,261 @@
+import re
+import json
+import random
+import threading
+from html import escape
+from time import sleep
+from urllib.parse import urlparse, parse_qs, quote, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pathes
+
+REVIEWS_PAGE_SIZE = 50  # Reviews per 'Load More' response, as on 2gis.ru
+STEP_PATTERN = re.compile(r'^([a-z0-9]+)(?:\[(\d+)\])?$')
+
+
+class Node:
+    """Minimal element tree; paths are created the way pathes.py addresses them"""
+
+    def __init__(self, tag, attrs=None, text=''):
+        self.tag = tag
+        self.attrs = dict(attrs or {})
+        self.text = text
+        self.children = []
+        self.raw = ''  # Markup rendered verbatim after the children
+
+    def append(self, child):
+        self.children.append(child)
+        return child
+
+    def ensure(self, path):
+        """
+        Return the node at a relative XPath of tag[i] steps, creating it and the siblings its indexes imply
+
+        An unindexed step matches every child with that tag, so it reuses the first one.
+        """
+        node = self
+        for step in path.strip('/').split('/'):
+            tag, index = STEP_PATTERN.match(step).groups()
+            same = [child for child in node.children if child.tag == tag]
+            index = int(index or 1)
+            while len(same) < index:
+                same.append(node.append(Node(tag)))
+            node = same[index - 1]
+        return node
+
+    def render(self):
+        attrs = ''.join(f' {key}="{escape(str(value))}"' for key, value in self.attrs.items())
+        if self.tag == 'script':
+            inner = self.text.replace('</', '<\\/')
+        else:
+            inner = escape(self.text) + ''.join(child.render() for child in self.children) + self.raw
+        if self.tag == 'meta':
+            return f'<{self.tag}{attrs}>'
+        return f'<{self.tag}{attrs}>{inner}</{self.tag}>'
+
+
+def page_tree():
+    html = Node('html')
+    html.ensure('head').append(Node('meta', {'charset': 'utf-8'}))
+    return html
+
+
+def absolute(html, xpath):
+    """Node at an absolute pathes.py XPath"""
+    assert xpath.startswith('/html/')
+    return html.ensure(xpath[len('/html/'):])
+
+
+def review_html(firm_id, number, truncated):
+    """One review node laid out for the *_REL paths of pathes.py"""
+    review = Node('div')
+    review.ensure(pathes.REVIEWER_NAME_REL).text = f'Reviewer {firm_id}-{number}'
+    review.ensure(pathes.REVIEW_DATE_REL).text = f'{1 + number % 28} марта 2024'
+    stars = review.ensure(pathes.REVIEW_STARS_REL)
+    for _ in range(1 + number % 5):
+        stars.append(Node('span', text='★'))
+    full_text = f'Review {number} of firm {firm_id}. ' + 'Очень вкусно и быстро. ' * (3 + number % 7)
+    text = review.ensure(pathes.REVIEW_TEXT_REL)
+    if truncated:
+        text.text = full_text[:60] + '...'
+        text.attrs['data-full'] = full_text
+        text_block = review.ensure(pathes.REVIEW_TEXT_REL.rsplit('/', 1)[0])
+        text_block.append(Node('span', {'class': f'{pathes.READ_MORE_CLASS} read-more'}, 'Читать целиком'))
+    else:
+        text.text = full_text
+    review.ensure(pathes.REVIEW_LIKES_REL).text = str(number % 13)
+    return review.render()
+
+
+# In-page behaviour of the fixtures: cookie banner, phone reveal, reviews tab, 'Load More',
+# 'read more' and search paging, each loading its data over fetch() like the real site
+PAGE_SCRIPT = """
+(function() {
+    const byXPath = xpath => document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    const config = JSON.parse(document.getElementById('fixture-config').textContent);
+
+    function loadMoreWrapper(container) {
+        const wrapper = document.createElement('div');
+        wrapper.innerHTML = '<button class="_kuel4no">Загрузить ещё</button>';
+        wrapper.firstChild.addEventListener('click', () => { wrapper.remove(); loadReviews(container); });
+        return wrapper;
+    }
+
+    function loadReviews(container) {
+        const offset = Number(container.dataset.offset || 0);
+        fetch(`/api/reviews?firm=${config.firm}&offset=${offset}`).then(r => r.json()).then(data => {
+            for (const html of data.reviews) container.insertAdjacentHTML('beforeend', html);
+            container.dataset.offset = offset + data.reviews.length;
+            if (data.more) container.appendChild(loadMoreWrapper(container));
+        });
+    }
+
+    document.addEventListener('click', event => {
+        const target = event.target;
+        if (target.closest('#cookie-banner')) target.closest('#cookie-banner').style.display = 'none';
+        if (target.closest('#phone-button')) document.getElementById('phone').style.display = '';
+        if (target.closest('#reviews-link')) {
+            const container = byXPath(config.reviews_container);
+            if (!container.dataset.offset) loadReviews(container);
+        }
+        if (target.classList.contains('read-more')) {
+            const text = target.parentNode.querySelector('a');
+            text.textContent = text.dataset.full;
+            target.remove();
+        }
+        if (target.closest('#next-page')) {
+            fetch(`/api/search?query=${encodeURIComponent(config.query)}&page=${config.page + 1}`).then(r => r.json()).then(data => {
+                config.page += 1;
+                byXPath(config.cards_parent).innerHTML = data.cards.join('');
+                if (!data.more) document.getElementById('next-page').remove();
+            });
+        }
+    });
+})();
+"""
+
+
+class Fixtures:
+    """
+    Synthetic 2gis.ru pages built from the XPaths in pathes.py
+
+    firms firms with reviews_per_firm reviews each (every truncated_every-th one truncated),
+    listed on search pages of per_page cards.
+    """
+
+    def __init__(self, firms=5, reviews_per_firm=200, per_page=12, truncated_every=4, seed=1):
+        self.firm_ids = [str(70000001000000 + random.Random(seed + i).randrange(10 ** 6)) for i in range(firms)]
+        self.reviews_per_firm = reviews_per_firm
+        self.per_page = per_page
+        self.truncated_every = truncated_every
+
+    def page(self, html, config):
+        body = absolute(html, '/html/body')
+        banner = absolute(html, pathes.cookie_banner)
+        banner.attrs['id'] = 'cookie-banner'
+        banner.text = 'Мы используем cookies'
+        body.append(Node('script', {'type': 'application/json', 'id': 'fixture-config'}, json.dumps(config)))
+        body.append(Node('script', text=PAGE_SCRIPT))
+        return '<!DOCTYPE html>' + html.render()
+
+    def firm_page(self, firm_id):
+        html = page_tree()
+        absolute(html, pathes.title).text = f'Кафе {firm_id}'
+        absolute(html, pathes.address).text = f'Алматы, ул. Абая, {int(firm_id) % 300}'
+        phone_button = absolute(html, pathes.phone_btn)
+        phone_button.attrs['id'] = 'phone-button'
+        phone_button.text = 'Показать телефон'
+        phone = absolute(html, pathes.phone)
+        phone.text = f'+7 727 {int(firm_id) % 1000:03d} 00 00'
+        absolute(html, pathes.phone.rsplit('/', 1)[0]).attrs.update({'id': 'phone', 'style': 'display: none'})
+        link = absolute(html, pathes.reviews_hyperlink)
+        link.attrs.update({'id': 'reviews-link', 'href': '#reviews'})
+        absolute(html, pathes.reviews_count).text = str(self.reviews_per_firm)
+        # Rating summary at div[2] of the container; reviews are appended after it
+        absolute(html, pathes.review_overall_rating).text = '4.6'
+        absolute(html, pathes.reviews_total_rating_count).text = f'{self.reviews_per_firm} оценок'
+        return self.page(html, {'firm': firm_id, 'reviews_container': pathes.reviews_main_block})
+
+    def reviews(self, firm_id, offset):
+        """{'reviews': [html, ...], 'more': bool} for one 'Load More' batch"""
+        end = min(offset + REVIEWS_PAGE_SIZE, self.reviews_per_firm)
+        return {'reviews': [review_html(firm_id, number, number % self.truncated_every == 0) for number in range(offset + 1, end + 1)],
+                'more': end < self.reviews_per_firm}
+
+    def cards(self, page):
+        """(card HTML list, more pages) of a search results page"""
+        ids = self.firm_ids[(page - 1) * self.per_page:page * self.per_page]
+        cards = [f'<div class="_1h3cgic"><a href="/firm/{firm_id}"><span class="_tvxwjf">Кафе {firm_id}</span></a></div>'
+                 for firm_id in ids]
+        return cards, page * self.per_page < len(self.firm_ids)
+
+    def search_page(self, query):
+        html = page_tree()
+        absolute(html, pathes.items_count).text = f'{len(self.firm_ids)} мест'
+        cards_parent = pathes.main_block.rsplit('/', 1)[0]
+        cards, more = self.cards(1)
+        absolute(html, cards_parent).raw = ''.join(cards)
+        if more:
+            next_button = absolute(html, pathes.next_page_btn)
+            next_button.attrs['id'] = 'next-page'
+            next_button.text = '›'
+        return self.page(html, {'query': query, 'page': 1, 'cards_parent': cards_parent})
+
+
+class FixtureServer:
+    """Serve Fixtures on 127.0.0.1 with latency seconds added to every response"""
+
+    def __init__(self, fixtures, latency=0.05, port=0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                sleep(server.latency)
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if match := re.match(r'^/firm/(\d+)', url.path):
+                    self.send(server.fixtures.firm_page(match.group(1)))
+                elif url.path.startswith('/search/'):
+                    self.send(server.fixtures.search_page(unquote(url.path[len('/search/'):])))
+                elif url.path == '/api/reviews':
+                    self.send(json.dumps(server.fixtures.reviews(query['firm'], int(query.get('offset', 0)))), 'application/json')
+                elif url.path == '/api/search':
+                    cards, more = server.fixtures.cards(int(query.get('page', 1)))
+                    self.send(json.dumps({'cards': cards, 'more': more}), 'application/json')
+                else:
+                    self.send_error(404)
+
+            def send(self, body, content_type='text/html; charset=utf-8'):
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}'
+
+    def firm_urls(self):
+        return [f'{self.base_url}/firm/{firm_id}' for firm_id in self.fixtures.firm_ids]
+
+    def search_url(self, query='кафе'):
+        return f'{self.base_url}/search/{quote(query)}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
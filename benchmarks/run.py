@@ -0,0 +1,190 @@
+"""
+Offline throughput benchmarks against the fixture pages in fixtures.py
+
+    python benchmarks/run.py                          # every scenario
+    python benchmarks/run.py reviews --latency 0.1    # one scenario, slower server
+
+Each run appends its metrics to benchmarks/history.jsonl (not versioned) and prints the change against the
+previous run of the same scenario and parameters.
+"""
+import os
+import sys
+import json
+import argparse
+import datetime
+import tempfile
+import subprocess
+from time import perf_counter
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import Fixtures, FixtureServer  # noqa: E402
+
+HISTORY_FILE = os.path.join(ROOT, 'benchmarks', 'history.jsonl')
+
+# Metric of each scenario compared between runs; higher is better
+HEADLINE = {'reviews': 'reviews_per_sec', 'search': 'links_per_sec', 'export': 'rows_per_sec'}
+
+
+def peak_rss_mb():
+    """Peak resident size of this process and of its largest finished child (chromedriver and the browser under it)"""
+    if resource is None:
+        return None, None
+    to_mb = 1 / 1024 if sys.platform != 'darwin' else 1 / (1024 * 1024)
+    return (round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * to_mb, 1),
+            round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * to_mb, 1))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def open_parser(args, report_dir, **options):
+    """Headless Parser2GIS with the command profiler on, so commands per review can be counted"""
+    from parser_engine import Parser2GIS
+
+    parser = Parser2GIS('', headless=True, review_mode=args.review_mode, resource_profile='full', profile_driver=True,
+                        **options)
+    parser.profiler.report_dir = report_dir
+    parser.open_browser()
+    parser.parsing_active = True
+    return parser
+
+
+def bench_reviews(args, server, work_dir):
+    """scrape_place() with reviews on every fixture firm"""
+    parser = open_parser(args, work_dir, scrape_reviews=True, max_reviews=args.reviews, prune_reviews=args.prune_reviews)
+    try:
+        started = perf_counter()
+        reviews = 0
+        for url in server.firm_urls():
+            record = parser.scrape_place(url)
+            reviews += len((record or {}).get('Отзывы') or [])
+        elapsed = perf_counter() - started
+        commands = parser.profiler.run.report()['commands']
+    finally:
+        parser.close_browser()
+    return {'places': len(server.firm_urls()), 'reviews': reviews, 'seconds': round(elapsed, 2),
+            'reviews_per_sec': round(reviews / elapsed, 2) if elapsed else 0,
+            'commands_per_review': round(commands / reviews, 2) if reviews else None}
+
+
+def bench_search(args, server, work_dir):
+    """iter_place_urls() over every search results page"""
+    parser = open_parser(args, work_dir)
+    try:
+        started = perf_counter()
+        links = list(parser.iter_place_urls(server.search_url()))
+        elapsed = perf_counter() - started
+        commands = parser.profiler.run.report()['commands']
+    finally:
+        parser.close_browser()
+    return {'links': len(links), 'pages': parser.page_count, 'seconds': round(elapsed, 2),
+            'links_per_sec': round(len(links) / elapsed, 2) if elapsed else 0,
+            'commands_per_link': round(commands / len(links), 2) if links else None}
+
+
+def bench_export(args, server, work_dir):
+    """StreamWriter, then the Excel and (with pyarrow) Parquet exports of firms x reviews synthetic records"""
+    import exporters
+    from output_writer import StreamWriter
+
+    base_path = os.path.join(work_dir, 'bench')
+    writer = StreamWriter(base_path)
+    started = perf_counter()
+    for number, firm_id in enumerate(server.fixtures.firm_ids):
+        reviews = [{'reviewer_name': f'Reviewer {i}', 'rating': f'{1 + i % 5} stars', 'text': 'Очень вкусно. ' * (1 + i % 20),
+                    'likes': str(i % 13)} for i in range(args.reviews)]
+        writer.write_record({'Название': f'Кафе {firm_id}', 'Телефон': '', 'Адрес': f'Абая, {number}',
+                             'Ссылка': f'https://2gis.ru/almaty/firm/{firm_id}', 'Широта': '', 'Долгота': '', 'Отзывы': reviews})
+    writer.close()
+    rows = writer.place_count + writer.review_count
+    timings = {'stream_seconds': round(perf_counter() - started, 2)}
+
+    started = perf_counter()
+    exporters.export_excel(writer.place_files(), writer.review_files(), f'{base_path}.xlsx')
+    timings['xlsx_seconds'] = round(perf_counter() - started, 2)
+    try:
+        started = perf_counter()
+        exporters.export_columnar(writer.place_files(), writer.review_files(), base_path, 'parquet')
+        timings['parquet_seconds'] = round(perf_counter() - started, 2)
+    except ImportError:
+        pass
+    total = sum(timings.values())
+    return dict(timings, rows=rows, seconds=round(total, 2), rows_per_sec=round(rows / total, 2) if total else 0)
+
+
+SCENARIOS = {'reviews': bench_reviews, 'search': bench_search, 'export': bench_export}
+
+
+def previous_result(entry):
+    """The last history entry of the same scenario and parameters, or None"""
+    if not os.path.exists(HISTORY_FILE):
+        return None
+    previous = None
+    with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if row.get('scenario') == entry['scenario'] and row.get('params') == entry['params']:
+                previous = row
+    return previous
+
+
+def record(entry):
+    """Append entry to the history file and print it with the change of its headline metric"""
+    previous = previous_result(entry)
+    with open(HISTORY_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    metric = HEADLINE[entry['scenario']]
+    line = f"{entry['scenario']}: {metric} {entry['metrics'].get(metric)}"
+    if previous and previous['metrics'].get(metric):
+        change = (entry['metrics'][metric] - previous['metrics'][metric]) / previous['metrics'][metric] * 100
+        line += f" ({change:+.1f}% vs {previous.get('commit') or previous['time']})"
+    print(line)
+    print('  ' + ', '.join(f"{key}={value}" for key, value in entry['metrics'].items()))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against local 2GIS page fixtures")
+    parser.add_argument('scenarios', nargs='*', help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument('--firms', type=int, default=5, help="Fixture firms (search results)")
+    parser.add_argument('--reviews', type=int, default=200, help="Reviews per firm")
+    parser.add_argument('--per-page', type=int, default=12, help="Search results per page")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds added to every fixture server response")
+    parser.add_argument('--review-mode', choices=['batch', 'api', 'index', 'snapshot'], default='batch')
+    parser.add_argument('--prune-reviews', action='store_true', help="Empty review nodes once extracted")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main():
+    args = parse_args()
+    fixtures = Fixtures(firms=args.firms, reviews_per_firm=args.reviews, per_page=args.per_page)
+    params = {'firms': args.firms, 'reviews': args.reviews, 'per_page': args.per_page, 'latency': args.latency,
+              'review_mode': args.review_mode, 'prune_reviews': args.prune_reviews}
+    with FixtureServer(fixtures, latency=args.latency) as server, tempfile.TemporaryDirectory() as work_dir:
+        for scenario in args.scenarios or SCENARIOS:
+            metrics = SCENARIOS[scenario](args, server, work_dir)
+            metrics['peak_rss_mb'], metrics['children_peak_rss_mb'] = peak_rss_mb()
+            record({'time': datetime.datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+                    'scenario': scenario, 'params': params, 'metrics': metrics})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,355 @@
+import json
+import asyncio
+import itertools
+import logging
+from urllib.parse import unquote
+from urllib.request import urlopen
+import websockets
+import pathes
+import chrome_remote
+import review_extractor
+from job_ledger import place_key as firm_key
+from review_index import DeltaFilter
+from waits import PAGE_HELPERS_JS, ELEMENT_VISIBLE_JS, NETWORK_IDLE_MS
+
+# Clicks the element at the XPath arguments[0] like waits.CLICK_JS; false if it is not rendered
+CLICK_XPATH_JS = """
+    const element = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (!element || !element.getClientRects().length) return false;
+    element.scrollIntoView({block: 'center', behavior: 'instant'});
+    window.__p2gClickAt = performance.now();
+    element.click();
+    return true;
+"""
+
+TEXT_JS = """
+    const element = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    return element ? element.innerText.trim() : '';
+"""
+
+# Runtime.evaluate errors raised when a navigation swaps the document out from under a script;
+# the next evaluate runs in the new document, so they are retried rather than raised
+CONTEXT_LOST_ERRORS = ('Execution context was destroyed', 'Cannot find context')
+
+
+class CDPError(RuntimeError):
+    """A DevTools command failed or a script threw"""
+
+
+def wrap_script(script, args):
+    """
+    Turn an execute_script body into a Runtime.evaluate expression
+
+    The scripts in this repo read arguments[n] and end with return, so they run unchanged inside
+    (function(){...}).apply(null, args). Arguments must be JSON-serializable; there are no element handles.
+    """
+    return f"(function() {{\n{script}\n}}).apply(null, {json.dumps(list(args), ensure_ascii=False)})"
+
+
+class CDPConnection:
+    """
+    Browser-level DevTools websocket shared by all tabs
+
+    Commands are matched to their replies by id, so any number of tabs can have commands in
+    flight on the one connection while a single reader task dispatches replies and events.
+    """
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.ids = itertools.count(1)
+        self.pending = {}  # message id -> future
+        self.waiters = {}  # (session id, event) -> futures
+        self.reader = asyncio.get_running_loop().create_task(self.read_loop())
+
+    @classmethod
+    async def connect(cls, address):
+        """Connect to the browser behind host:port"""
+        def browser_url():
+            with urlopen(f'http://{address}/json/version', timeout=5) as response:
+                return json.loads(response.read().decode('utf-8'))['webSocketDebuggerUrl']
+        ws_url = await asyncio.get_running_loop().run_in_executor(None, browser_url)
+        return cls(await websockets.connect(ws_url, max_size=None, ping_interval=None))
+
+    async def send(self, method, params=None, session_id=None, timeout=30):
+        """Send a command and wait for its result"""
+        message_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[message_id] = future
+        message = {'id': message_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        await self.ws.send(json.dumps(message))
+        try:
+            reply = await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(message_id, None)
+        if 'error' in reply:
+            raise CDPError(f"{method} failed: {reply['error'].get('message')}")
+        return reply.get('result', {})
+
+    def expect(self, event, session_id=None):
+        """Future resolved with the params of the next event of this name; create it before triggering the event"""
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault((session_id, event), []).append(future)
+        return future
+
+    async def read_loop(self):
+        try:
+            async for raw in self.ws:
+                message = json.loads(raw)
+                if 'id' in message:
+                    future = self.pending.get(message['id'])
+                    if future and not future.done():
+                        future.set_result(message)
+                    continue
+                for future in self.waiters.pop((message.get('sessionId'), message.get('method')), []):
+                    if not future.done():
+                        future.set_result(message.get('params', {}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(CDPError("DevTools connection closed"))
+
+    async def new_tab(self, url='about:blank'):
+        """Open a tab with its own flattened session"""
+        target_id = (await self.send('Target.createTarget', {'url': url}))['targetId']
+        session_id = (await self.send('Target.attachToTarget', {'targetId': target_id, 'flatten': True}))['sessionId']
+        tab = CDPTab(self, target_id, session_id)
+        await tab.setup()
+        return tab
+
+    async def close(self):
+        await self.ws.close()
+        self.reader.cancel()
+
+
+class CDPTab:
+    """One tab driven over its DevTools session: navigate, evaluate, click and wait"""
+
+    def __init__(self, connection, target_id, session_id):
+        self.connection = connection
+        self.target_id = target_id
+        self.session_id = session_id
+
+    async def send(self, method, params=None, timeout=30):
+        return await self.connection.send(method, params, self.session_id, timeout)
+
+    async def setup(self):
+        """Enable page events and inject the network-idle helpers into every document"""
+        await self.send('Page.enable')
+        await self.send('Page.addScriptToEvaluateOnNewDocument', {'source': PAGE_HELPERS_JS})
+
+    async def evaluate(self, script, *args):
+        """Run an execute_script-style body with JSON arguments and return its value"""
+        result = await self.send('Runtime.evaluate', {'expression': wrap_script(script, args), 'returnByValue': True,
+                                                      'awaitPromise': True})
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            raise CDPError((details.get('exception') or {}).get('description') or details.get('text'))
+        return result.get('result', {}).get('value')
+
+    async def navigate(self, url, timeout=30):
+        """Load url and wait for its load event"""
+        loaded = self.connection.expect('Page.loadEventFired', self.session_id)
+        result = await self.send('Page.navigate', {'url': url})
+        if result.get('errorText'):
+            loaded.cancel()
+            raise CDPError(f"Navigation to {url} failed: {result['errorText']}")
+        await asyncio.wait_for(loaded, timeout)
+
+    async def click(self, xpath):
+        """Click the element at xpath; returns False if it is not rendered"""
+        return bool(await self.evaluate(CLICK_XPATH_JS, xpath))
+
+    async def text(self, xpath):
+        return await self.evaluate(TEXT_JS, xpath) or ''
+
+    async def wait(self, script, *args, timeout=10.0, poll=0.1):
+        """Poll script until it returns a truthy value; returns that value, or None on timeout"""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            try:
+                value = await self.evaluate(script, *args)
+            except CDPError as e:
+                if not any(message in str(e) for message in CONTEXT_LOST_ERRORS):
+                    raise
+                value = None
+            if value:
+                return value
+            if asyncio.get_running_loop().time() >= deadline:
+                return None
+            await asyncio.sleep(poll)
+
+    async def close(self):
+        try:
+            await self.connection.send('Target.closeTarget', {'targetId': self.target_id})
+        except CDPError:
+            pass
+
+
+class Parser2GISCdp:
+    """
+    Scrape place URLs from one event loop over Chrome's DevTools websocket, without chromedriver
+
+    Every tab runs its own coroutine, so while one waits on a page load or a 'Load More' batch
+    the others keep going. Uses the same XPaths and in-page review scripts as Parser2GIS.
+    """
+
+    def __init__(self, on_log=None, on_record=None, scrape_reviews=False, max_reviews=5, tabs=4,
+                 port=chrome_remote.DEFAULT_PORT, headless=True, new_reviews_only=False, review_index=None):
+        self.on_log = on_log
+        self.on_record = on_record
+        self.scrape_reviews = scrape_reviews
+        self.max_reviews = max_reviews
+        self.tabs = tabs
+        self.port = port
+        self.headless = headless
+        self.new_reviews_only = new_reviews_only
+        self.review_index = review_index
+        self.parsing_active = False
+
+    def log(self, message, level='info'):
+        """Log message to both internal logger and UI logger if provided"""
+        getattr(logging, level if level in ('info', 'warning', 'error') else 'info')(message)
+        if self.on_log:
+            self.on_log(message, level)
+
+    async def scrape_place(self, tab, url):
+        """Scrape one company page into a record, or None if url is not a company page"""
+        await tab.navigate(url)
+        if not await tab.wait(ELEMENT_VISIBLE_JS, pathes.title, timeout=10):
+            return None
+        await tab.click(pathes.cookie_banner)
+        title = await tab.text(pathes.title)
+        if not title:
+            return None
+
+        phone = ''
+        if await tab.wait(ELEMENT_VISIBLE_JS, pathes.phone_btn, timeout=5) and await tab.click(pathes.phone_btn):
+            if await tab.wait(ELEMENT_VISIBLE_JS, pathes.phone, timeout=3):
+                phone = await tab.text(pathes.phone)
+
+        record = {
+            'Название': title,
+            'Телефон': phone,
+            'Адрес': await tab.text(pathes.address),
+            'Ссылка': unquote(await tab.evaluate("return location.href;")),
+            'Широта': '',
+            'Долгота': '',
+        }
+        if self.scrape_reviews:
+            record['Отзывы'] = await self.scrape_reviews_of(tab, url)
+        return record
+
+    async def scrape_reviews_of(self, tab, url):
+        """Collect up to max_reviews reviews through the review observer and 'Load More' clicks"""
+        reviews = []
+        delta = DeltaFilter(self.review_index, firm_key(url)) if self.new_reviews_only and self.review_index else None
+        if not await tab.wait(ELEMENT_VISIBLE_JS, pathes.reviews_hyperlink, timeout=10):
+            return reviews
+        await tab.click(pathes.reviews_hyperlink)
+        await tab.wait(ELEMENT_VISIBLE_JS, pathes.any_reviewer_name, timeout=10)
+        await tab.evaluate(review_extractor.INSTALL_REVIEW_OBSERVER_JS, review_extractor.REVIEW_PATHS,
+                           pathes.reviews_main_block)
+
+        # Pages are loaded before extraction (one at a time with --new-only), like Parser2GIS.load_more_steps()
+        digits = ''.join(filter(str.isdigit, await tab.text(pathes.reviews_count)))
+        available = int(digits) if digits else None
+        max_clicks = 1 if delta else None
+        read = 0
+        await self.load_more(tab, self.max_reviews, available, max_clicks)
+        while len(reviews) < self.max_reviews and self.parsing_active:
+            result = await tab.evaluate(review_extractor.DRAIN_REVIEW_QUEUE_JS, review_extractor.REVIEW_PATHS)
+            if result is None:
+                break  # The reviews container was re-rendered or left
+            items = result['reviews']
+            read += len(items)
+            # Every truncated review of the batch is expanded in one pass
+            indexes = review_extractor.truncated_indexes(items)
+            texts = {}
+            if indexes and await tab.evaluate(review_extractor.EXPAND_REVIEWS_JS, review_extractor.REVIEW_PATHS,
+                                              pathes.reviews_main_block, indexes):
+                texts = (await tab.wait(review_extractor.EXPANDED_TEXTS_JS, False, timeout=2) or
+                         await tab.evaluate(review_extractor.EXPANDED_TEXTS_JS, True))
+            batch = review_extractor.merge_expanded(items, indexes, texts)
+            reviews.extend(delta.filter(batch) if delta else batch)
+            if (delta and delta.reached_known) or len(reviews) >= self.max_reviews:
+                break
+            if not await self.load_more(tab, read + self.max_reviews - len(reviews), available, max_clicks):
+                break
+        return reviews[:self.max_reviews]
+
+    async def load_more(self, tab, target, available=None, max_clicks=None):
+        """Click 'Load More' until target reviews are rendered, each click once the previous batch landed; returns the clicks that loaded reviews"""
+        goal = target if available is None else min(target, available)
+        loaded = len(await tab.evaluate(review_extractor.PROBE_REVIEW_INDEXES_JS, review_extractor.REVIEW_PATHS,
+                                        pathes.reviews_main_block, 1) or [])
+        clicks = 0
+        while loaded < goal and self.parsing_active and (max_clicks is None or clicks < max_clicks):
+            previous_count = await tab.evaluate(review_extractor.REVIEW_NODE_COUNT_JS, pathes.reviews_main_block)
+            if not await tab.evaluate(review_extractor.CLICK_LOAD_MORE_JS):
+                break
+            if await tab.wait(review_extractor.MORE_REVIEW_NODES_JS, pathes.reviews_main_block, previous_count,
+                              NETWORK_IDLE_MS, timeout=10) != 'more':
+                break
+            clicks += 1
+            loaded = len(await tab.evaluate(review_extractor.PROBE_REVIEW_INDEXES_JS, review_extractor.REVIEW_PATHS,
+                                            pathes.reviews_main_block, 1) or [])
+        return clicks
+
+    async def tab_worker(self, connection, queue, records):
+        tab = await connection.new_tab()
+        try:
+            while self.parsing_active:
+                try:
+                    url = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                try:
+                    record = await self.scrape_place(tab, url)
+                except Exception as e:
+                    self.log(f"Could not scrape {url}: {e}", "warning")
+                    continue
+                if not record:
+                    self.log(f"{url} is not a company page", "warning")
+                elif self.on_record:
+                    self.on_record(record)
+                else:
+                    records.append(record)
+        finally:
+            await tab.close()
+
+    async def run_async(self, urls):
+        queue = asyncio.Queue()
+        for url in urls:
+            queue.put_nowait(url)
+        records = []
+        connection = await CDPConnection.connect(f'127.0.0.1:{self.port}')
+        try:
+            await asyncio.gather(*(self.tab_worker(connection, queue, records)
+                                   for _ in range(min(self.tabs, queue.qsize()) or 1)))
+        finally:
+            await connection.close()
+        return records
+
+    def run(self, urls):
+        """
+        Scrape all URLs in tabs of the browser daemon, starting it if needed
+
+        Returns:
+            list: Records in completion order (empty when on_record consumes them)
+        """
+        self.parsing_active = True
+        process = chrome_remote.ensure_browser(self.port, self.headless)
+        try:
+            return asyncio.run(self.run_async(urls))
+        finally:
+            self.parsing_active = False
+            if process:
+                process.terminate()
+
+    def stop(self):
+        """Stop after the current place of every tab"""
+        self.parsing_active = False
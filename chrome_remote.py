@@ -0,0 +1,185 @@
+import os
+import re
+import json
+import time
+import shutil
+import socket
+import logging
+import platform
+import argparse
+import subprocess
+from urllib.request import urlopen
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+
+DEFAULT_PORT = 9333
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'parser_2gis')
+DRIVER_CACHE_FILE = os.path.join(CACHE_DIR, 'chromedriver.json')
+PROFILE_DIR = os.path.join(CACHE_DIR, 'chrome-profile')
+
+# Same performance flags as Parser2GIS.setup_driver
+CHROME_ARGS = [
+    '--disable-extensions',
+    '--disable-gpu',
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--blink-settings=imagesEnabled=false',
+    '--disable-infobars',
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+    '--disable-backgrounding-occluded-windows',
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--window-size=1200,800',
+]
+
+
+def find_chrome_executable():
+    """Find Chrome executable path based on operating system"""
+    system = platform.system()
+    if system == 'Windows':
+        paths = [
+            os.path.expanduser(r'~\AppData\Local\Google\Chrome\Application\chrome.exe'),
+            r'C:\Program Files\Google\Chrome\Application\chrome.exe',
+            r'C:\Program Files (x86)\Google\Chrome\Application\chrome.exe',
+        ]
+    elif system == 'Darwin':
+        paths = [
+            '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+            os.path.expanduser('~/Applications/Google Chrome.app/Contents/MacOS/Google Chrome'),
+        ]
+    else:
+        paths = ['/usr/bin/google-chrome', '/usr/bin/chromium-browser', '/usr/bin/chromium']
+
+    for path in paths:
+        if os.path.exists(path):
+            return path
+    return shutil.which('google-chrome') or shutil.which('chromium') or shutil.which('chrome') or 'chrome'
+
+
+def chrome_major_version(chrome_path=None):
+    """Return Chrome's major version as a string, or None if it cannot be determined offline"""
+    chrome_path = chrome_path or find_chrome_executable()
+    if platform.system() == 'Windows':
+        # chrome.exe --version prints nothing on Windows; the install folder is named after the version
+        folder = os.path.dirname(chrome_path)
+        versions = [name for name in os.listdir(folder) if re.match(r'^\d+\.', name)] if os.path.isdir(folder) else []
+        return max(versions, key=lambda v: [int(p) for p in v.split('.')]).split('.')[0] if versions else None
+    try:
+        output = subprocess.run([chrome_path, '--version'], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = re.search(r'(\d+)\.\d+', output)
+    return match.group(1) if match else None
+
+
+def load_driver_cache():
+    try:
+        with open(DRIVER_CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def resolve_chromedriver():
+    """
+    Return a chromedriver path for the installed Chrome
+
+    The path is cached per Chrome major version, so webdriver-manager (which needs the network)
+    only runs the first time or after a Chrome upgrade. Offline, any cached or PATH driver is used.
+    When Chrome's version cannot be read the resolved path is not cached, since it may not match
+    the next Chrome either.
+    """
+    cache = load_driver_cache()
+    version = chrome_major_version()
+    path = cache.get(version) if version else None
+    if path and os.path.exists(path):
+        return path
+
+    try:
+        from webdriver_manager.chrome import ChromeDriverManager
+        path = ChromeDriverManager().install()
+    except Exception as e:
+        # No network: fall back to whatever driver is already on disk
+        fallback = next((p for p in cache.values() if os.path.exists(p)), None) or shutil.which('chromedriver')
+        if not fallback:
+            raise
+        logging.warning(f"Could not resolve chromedriver online ({e}); using {fallback}")
+        return fallback
+
+    if not version:
+        return path
+    cache[version] = path
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(DRIVER_CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2)
+    return path
+
+
+def debugger_version(port=DEFAULT_PORT, timeout=0.5):
+    """Return the /json/version info of a browser listening on port, or None"""
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=timeout):
+            pass
+        with urlopen(f'http://127.0.0.1:{port}/json/version', timeout=timeout * 4) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def start_browser(port=DEFAULT_PORT, headless=True, chrome_path=None, timeout=20):
+    """Launch Chrome with remote debugging on port and wait until it accepts connections"""
+    args = [chrome_path or find_chrome_executable(), f'--remote-debugging-port={port}', f'--user-data-dir={PROFILE_DIR}', *CHROME_ARGS]
+    if headless:
+        args.append('--headless=new')
+    args.append('about:blank')
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if debugger_version(port):
+            return process
+        if process.poll() is not None:
+            raise RuntimeError(f"Chrome exited with code {process.returncode}")
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"Chrome did not open the remote-debugging port {port}")
+
+
+def ensure_browser(port=DEFAULT_PORT, headless=True):
+    """Start the browser daemon unless one is already listening; returns the new process or None"""
+    if debugger_version(port):
+        return None
+    return start_browser(port, headless)
+
+
+def attach_driver(port=DEFAULT_PORT):
+    """Create a WebDriver session on the browser listening on port"""
+    options = webdriver.ChromeOptions()
+    options.debugger_address = f'127.0.0.1:{port}'
+    return webdriver.Chrome(service=Service(resolve_chromedriver()), options=options)
+
+
+def run_daemon(port=DEFAULT_PORT, headless=True):
+    """Keep a warm browser running until it exits or Ctrl+C is pressed"""
+    resolve_chromedriver()  # Warm the driver cache so attaching never needs the network
+    process = ensure_browser(port, headless)
+    if process is None:
+        print(f"A browser is already listening on port {port}")
+        return
+    print(f"Browser daemon listening on 127.0.0.1:{port} (pid {process.pid}). Press Ctrl+C to stop.")
+    try:
+        process.wait()
+    except KeyboardInterrupt:
+        process.terminate()
+        process.wait(timeout=10)
+    print("Browser daemon stopped")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Long-lived Chrome that the parser, GUI and sandbox attach to with main.py --attach")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="Remote-debugging port")
+    parser.add_argument('--headed', action='store_true', help="Show the browser window")
+    args = parser.parse_args()
+    run_daemon(args.port, headless=not args.headed)
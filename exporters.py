@@ -0,0 +1,187 @@
+import re
+import json
+import datetime
+import itertools
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from output_writer import iter_rows, PLACE_COLUMNS, REVIEW_COLUMNS
+from job_ledger import place_key
+
+BATCH_SIZE = 50000  # Rows per Arrow record batch / Parquet row group
+EXCEL_MAX_ROWS = 1048576  # Rows per worksheet, header included
+EXCEL_MAX_CELL = 32767  # Characters per cell
+
+
+def excel_value(value):
+    """Cell value Excel accepts: nested values as JSON, control characters removed, long text cut"""
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, ensure_ascii=False)
+    if isinstance(value, str):
+        value = ILLEGAL_CHARACTERS_RE.sub('', value)[:EXCEL_MAX_CELL]
+    return value
+
+
+def write_sheets(workbook, title, columns, rows):
+    """
+    Append rows to write-only sheets named title, title_2, title_3, ... starting a new one at the row limit
+
+    Returns:
+        int: Number of rows written
+    """
+    count = 0
+    sheet = None
+    sheet_rows = EXCEL_MAX_ROWS
+    for row in rows:
+        if sheet_rows >= EXCEL_MAX_ROWS:
+            sheet_number = count // (EXCEL_MAX_ROWS - 1) + 1
+            sheet = workbook.create_sheet(title if sheet_number == 1 else f"{title}_{sheet_number}")
+            sheet.append(columns)
+            sheet_rows = 1
+        sheet.append([excel_value(row.get(column, '')) for column in columns])
+        sheet_rows += 1
+        count += 1
+    return count
+
+
+def export_excel(place_files, review_files, filename):
+    """
+    Build the Excel workbook from the streamed part files in openpyxl write-only mode
+
+    Rows go from the part files straight to the workbook, so memory does not grow with the
+    number of reviews. Sheets past Excel's row limit continue in Reviews_2, Reviews_3, ...
+
+    Args:
+        place_files: Place part files written by StreamWriter
+        review_files: Review part files written by StreamWriter
+        filename: Target .xlsx path
+
+    Returns:
+        int: Number of places exported
+    """
+    workbook = Workbook(write_only=True)
+    reviews = iter_rows(review_files)
+    first_review = next(reviews, None)
+    places = write_sheets(workbook, 'Sheet1' if first_review is None else 'Businesses', PLACE_COLUMNS, iter_rows(place_files))
+    if first_review is not None:
+        write_sheets(workbook, 'Reviews', REVIEW_COLUMNS, itertools.chain([first_review], reviews))
+    workbook.save(filename)
+    return places
+
+
+def to_rating(value):
+    """1-5 from '5 stars', '5 stars (counted spans)' or a number; None for 'Unknown rating'"""
+    match = re.search(r'\d+', str(value or ''))
+    return min(int(match.group()), 5) if match else None
+
+
+def to_likes(value):
+    match = re.search(r'\d+', str(value or ''))
+    return int(match.group()) if match else 0
+
+
+def to_timestamp(value):
+    """Review date (YYYY-MM-DD, or ISO 8601 from older runs), or None"""
+    try:
+        return datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(microsecond=0) if value else None
+    except ValueError:
+        return None
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def typed_place(row):
+    return {
+        'firm_id': place_key(row.get('Ссылка', '')),
+        'name': row.get('Название') or '',
+        'phone': row.get('Телефон') or '',
+        'address': row.get('Адрес') or '',
+        'url': row.get('Ссылка') or '',
+        'lat': to_float(row.get('Широта')),
+        'lon': to_float(row.get('Долгота')),
+    }
+
+
+def typed_review(row):
+    return {
+        'firm_id': row.get('firm_id') or '',
+        'business_name': row.get('business_name') or '',
+        'review_id': str(row.get('review_id') or ''),
+        'reviewer_name': row.get('reviewer_name') or '',
+        'rating': to_rating(row.get('rating')),
+        'likes': to_likes(row.get('likes')),
+        'date': to_timestamp(row.get('date')),
+        'text': row.get('text') or '',
+    }
+
+
+def arrow_schemas():
+    """Typed schemas of the place and review tables; firm ids are dictionary-encoded"""
+    import pyarrow as pa
+
+    firm_id = pa.dictionary(pa.int32(), pa.string())
+    places = pa.schema([
+        ('firm_id', firm_id), ('name', pa.string()), ('phone', pa.string()), ('address', pa.string()),
+        ('url', pa.string()), ('lat', pa.float64()), ('lon', pa.float64()),
+    ])
+    reviews = pa.schema([
+        ('firm_id', firm_id), ('business_name', pa.string()), ('review_id', pa.string()),
+        ('reviewer_name', pa.string()), ('rating', pa.int8()), ('likes', pa.int32()),
+        ('date', pa.timestamp('s', tz='UTC')), ('text', pa.string()),
+    ])
+    return places, reviews
+
+
+def iter_batches(rows, convert, schema, batch_size=BATCH_SIZE):
+    """Convert streamed rows into record batches of batch_size rows"""
+    import pyarrow as pa
+
+    batch = []
+    for row in rows:
+        batch.append(convert(row))
+        if len(batch) >= batch_size:
+            yield pa.RecordBatch.from_pylist(batch, schema=schema)
+            batch = []
+    if batch:
+        yield pa.RecordBatch.from_pylist(batch, schema=schema)
+
+
+def export_columnar(place_files, review_files, base_path, fmt='parquet'):
+    """
+    Write typed base_path_places and base_path_reviews tables as Parquet or an Arrow IPC stream (needs pyarrow)
+
+    Rows are converted in batches straight from the streamed part files, so memory stays
+    bounded by the batch size. Each batch becomes a Parquet row group. The Arrow output uses
+    the stream format (.arrows) because every batch carries its own firm id dictionary.
+
+    Returns:
+        list: Paths of the written files
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    place_schema, review_schema = arrow_schemas()
+    paths = []
+    for kind, files, convert, schema in (('places', place_files, typed_place, place_schema),
+                                         ('reviews', review_files, typed_review, review_schema)):
+        if not files:
+            continue
+        if fmt == 'parquet':
+            path = f"{base_path}_{kind}.parquet"
+            writer = pq.ParquetWriter(path, schema, compression='zstd')
+        else:
+            path = f"{base_path}_{kind}.arrows"
+            writer = pa.ipc.new_stream(path, schema)
+        with writer:
+            for batch in iter_batches(iter_rows(files), convert, schema):
+                if fmt == 'parquet':
+                    writer.write_table(pa.Table.from_batches([batch]))
+                else:
+                    writer.write_batch(batch)
+        paths.append(path)
+    return paths
+
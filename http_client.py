@@ -0,0 +1,217 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import api_payloads
+from api_payloads import firm_id_from_url
+from review_index import DeltaFilter
+
+CATALOG_URL = 'https://catalog.api.2gis.ru/3.0/items'
+CATALOG_BYID_URL = 'https://catalog.api.2gis.ru/3.0/items/byid'
+REVIEWS_URL = 'https://public-api.reviews.2gis.com/2.0/branches/{firm_id}/reviews'
+CATALOG_FIELDS = 'items.point,items.contact_groups,items.reviews,items.address'
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+
+
+class ChromeFallback:
+    """Scrape places with a single shared Chrome instance when the HTTP API cannot serve them"""
+
+    def __init__(self, scrape_reviews=False, max_reviews=5, on_log=None, review_mode='batch'):
+        self.scrape_reviews = scrape_reviews
+        self.max_reviews = max_reviews
+        self.review_mode = review_mode
+        self.on_log = on_log
+        self.parser = None
+        self.lock = threading.Lock()  # One browser, so places are scraped one at a time
+
+    def __call__(self, url):
+        from parser_engine import Parser2GIS
+
+        with self.lock:
+            if self.parser is None:
+                self.parser = Parser2GIS('', on_log=self.on_log, scrape_reviews=self.scrape_reviews, max_reviews=self.max_reviews,
+                                         review_mode=self.review_mode)
+                self.parser.open_browser()
+                self.parser.parsing_active = True
+            return self.parser.scrape_place(url)
+
+    def close(self):
+        """Quit the fallback browser if it was started"""
+        if self.parser:
+            self.parser.close_browser()
+            self.parser = None
+
+
+class Parser2GISHttp:
+    """Browserless engine that reads search results, firm cards and reviews from the 2GIS HTTP APIs"""
+
+    def __init__(self, search_query='', api_key=None, on_log=None, scrape_reviews=False, max_reviews=5,
+                 concurrency=20, timeout=15, page_size=10, fallback=None, on_record=None, new_reviews_only=False,
+                 review_index=None, ledger=None):
+        self.search_query = search_query
+        self.api_key = api_key or os.environ.get('DGIS_API_KEY', '')
+        self.on_log = on_log
+        self.scrape_reviews = scrape_reviews
+        self.max_reviews = max_reviews
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.page_size = page_size
+        self.fallback = fallback
+        self.on_record = on_record
+        self.new_reviews_only = new_reviews_only
+        self.review_index = review_index
+        self.ledger = ledger  # Places it records as done are skipped in search results
+        self.parsing_active = False
+        self.session = self.create_session()
+
+    def create_session(self):
+        """Create a keep-alive session whose connection pool matches the concurrency level"""
+        session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('GET',))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.concurrency, max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'User-Agent': USER_AGENT, 'Accept': 'application/json'})
+        return session
+
+    def log(self, message, level='info'):
+        """Log message to both internal logger and UI logger if provided"""
+        getattr(logging, level if level in ('info', 'warning', 'error') else 'info')(message)
+        if self.on_log:
+            self.on_log(message, level)
+
+    def get_json(self, url, params=None):
+        """GET a JSON document through the pooled session"""
+        params = dict(params or {})
+        if self.api_key:
+            params.setdefault('key', self.api_key)
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def search(self, query, page=1):
+        """
+        Fetch one page of search results
+
+        Returns:
+            tuple: (list of place dicts, total number of results)
+        """
+        data = self.get_json(CATALOG_URL, {'q': query, 'page': page, 'page_size': self.page_size, 'fields': CATALOG_FIELDS})
+        total = ((data or {}).get('result') or {}).get('total', 0)
+        return api_payloads.parse_firm_payload(data), total
+
+    def iter_search(self, query):
+        """Yield every place of a search query, page by page, except those the ledger has done"""
+        page = 1
+        while self.parsing_active:
+            places, total = self.search(query, page)
+            for place in places:
+                if not (self.ledger and self.ledger.is_done(place.get('Ссылка'))):
+                    yield place
+            if not places or page * self.page_size >= total:
+                break
+            page += 1
+
+    def fetch_firm(self, firm_id):
+        """Fetch a single firm card, or None if the API does not know it"""
+        places = api_payloads.parse_firm_payload(self.get_json(CATALOG_BYID_URL, {'id': firm_id, 'fields': CATALOG_FIELDS}))
+        return places[0] if places else None
+
+    def fetch_reviews(self, firm_id, max_reviews=None):
+        """
+        Fetch up to max_reviews reviews of a firm following the API's next_link pagination
+
+        With new_reviews_only only reviews missing from the review index are returned, and paging
+        stops at the first run of known ones (the API sorts by date, newest first).
+        """
+        max_reviews = max_reviews or self.max_reviews
+        delta = DeltaFilter(self.review_index, str(firm_id)) if self.new_reviews_only and self.review_index else None
+        reviews = []
+        url = REVIEWS_URL.format(firm_id=firm_id)
+        params = {'limit': min(max_reviews, 50), 'is_advertiser': 'false', 'fields': 'meta.branch_rating,meta.branch_reviews_count',
+                  'sort_by': 'date_created'}
+        while url and len(reviews) < max_reviews and self.parsing_active:
+            data = self.get_json(url, params)
+            page = api_payloads.parse_reviews_payload(data)
+            if not page:
+                break
+            reviews.extend(delta.filter(page) if delta else page)
+            if delta and delta.reached_known:
+                break
+            # next_link already carries the query string
+            url, params = ((data.get('meta') or {}).get('next_link'), None)
+        return reviews[:max_reviews]
+
+    def process_place(self, place):
+        """Complete a place with its reviews; falls back to Chrome if the API request fails"""
+        try:
+            record = dict(place)
+            record.setdefault('id', firm_id_from_url(record.get('Ссылка')))
+            if not record.get('Название') and record.get('id'):
+                record.update(self.fetch_firm(record['id']) or {})
+            if self.scrape_reviews and record.get('id'):
+                record['Отзывы'] = self.fetch_reviews(record['id'])
+            return record
+        except (requests.RequestException, ValueError) as e:
+            if not self.fallback or not place.get('Ссылка'):
+                raise
+            self.log(f"HTTP request failed for {place.get('Ссылка')}: {e}; falling back to Chrome", "warning")
+            return self.fallback(place['Ссылка'])
+
+    def run(self, places=None):
+        """
+        Process places concurrently over the shared session
+
+        Places are submitted through a window of twice the concurrency, so search pages are read
+        only as fast as places are processed and never queued in memory all at once.
+
+        Args:
+            places: Place dicts (at least 'id' or 'Ссылка'); defaults to the results of search_query
+
+        Returns:
+            list: Completed place records in completion order (empty when on_record consumes them)
+        """
+        self.parsing_active = True
+        records = []
+        processed = 0
+        try:
+            if places is None:
+                places = self.iter_search(self.search_query)
+            places = iter(places)
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                futures = {}
+                while True:
+                    while self.parsing_active and len(futures) < 2 * self.concurrency:
+                        place = next(places, None)
+                        if place is None:
+                            break
+                        futures[executor.submit(self.process_place, place)] = place
+                    if not futures:
+                        break
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        place = futures.pop(future)
+                        try:
+                            record = future.result()
+                        except Exception as e:
+                            self.log(f"Could not process {place.get('Название') or place.get('id')}: {e}", "warning")
+                            continue
+                        if record:
+                            processed += 1
+                            if self.on_record:
+                                self.on_record(record)
+                            else:
+                                records.append(record)
+                            self.log(f"Processed {record.get('Название', '')} ({processed} places)")
+        finally:
+            self.parsing_active = False
+            if self.fallback and hasattr(self.fallback, 'close'):
+                self.fallback.close()
+        return records
+
+    def stop(self):
+        """Stop issuing new requests"""
+        self.parsing_active = False
@@ -0,0 +1,125 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+from time import time
+
+LEDGER_PATH = os.path.join('output', 'jobs.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job TEXT PRIMARY KEY,
+    output_base TEXT,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS places (
+    job TEXT,
+    place_key TEXT,
+    url TEXT,
+    status TEXT,            -- in_progress, done or failed
+    review_offset INTEGER DEFAULT 0,
+    reviews TEXT,           -- JSON list of the reviews collected so far while in_progress
+    output_file TEXT,
+    error TEXT,
+    updated_at REAL,
+    PRIMARY KEY (job, place_key)
+);
+"""
+
+
+def place_key(url):
+    """Firm id of a 2gis link, so search, redirect and tracking variants of one place match; the URL otherwise"""
+    match = re.search(r'/firm/(\d+)', url or '')
+    return match.group(1) if match else (url or '').split('?')[0]
+
+
+class JobLedger:
+    """
+    Persistent record of a crawl in SQLite: finished places, the review offset of places in
+    progress and the output files holding them
+
+    Args:
+        job: Name of the crawl, e.g. the search query or the URL file
+        resume: Keep what a previous run of the same job recorded; otherwise it is cleared
+        path: SQLite file, shared by all jobs
+    """
+
+    def __init__(self, job, resume=False, path=LEDGER_PATH):
+        self.job = job
+        self.resume = resume
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Shared by the worker threads; every statement runs under the lock
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        if not resume:
+            with self.lock:
+                self.connection.execute('DELETE FROM places WHERE job = ?', (job,))
+                self.connection.execute('DELETE FROM jobs WHERE job = ?', (job,))
+
+    def execute(self, sql, params=()):
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def output_base(self, default):
+        """Output base path of this job: the one recorded by the run being resumed, or default"""
+        rows = self.execute('SELECT output_base FROM jobs WHERE job = ?', (self.job,))
+        if rows and rows[0][0]:
+            return rows[0][0]
+        self.execute('INSERT OR REPLACE INTO jobs (job, output_base, updated_at) VALUES (?, ?, ?)', (self.job, default, time()))
+        return default
+
+    def is_done(self, url):
+        rows = self.execute('SELECT 1 FROM places WHERE job = ? AND place_key = ? AND status = ?', (self.job, place_key(url), 'done'))
+        return bool(rows)
+
+    def pending(self, urls):
+        """Yield the URLs that are not done yet"""
+        for url in urls:
+            if not self.is_done(url):
+                yield url
+
+    def partial_reviews(self, url):
+        """Reviews saved for a place a previous run did not finish, or an empty list"""
+        rows = self.execute('SELECT reviews FROM places WHERE job = ? AND place_key = ? AND status != ?',
+                            (self.job, place_key(url), 'done'))
+        return json.loads(rows[0][0]) if rows and rows[0][0] else []
+
+    def save_progress(self, url, reviews):
+        """Checkpoint a place in progress with the reviews collected so far"""
+        self.execute(
+            'INSERT INTO places (job, place_key, url, status, review_offset, reviews, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (job, place_key) DO UPDATE SET status = excluded.status, review_offset = excluded.review_offset, '
+            'reviews = excluded.reviews, updated_at = excluded.updated_at WHERE places.status != ?',
+            (self.job, place_key(url), url, 'in_progress', len(reviews), json.dumps(reviews, ensure_ascii=False), time(), 'done'))
+
+    def mark_done(self, url, output_file=None):
+        """Record that a place is written; its checkpointed reviews are dropped"""
+        self.execute(
+            'INSERT INTO places (job, place_key, url, status, output_file, updated_at) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (job, place_key) DO UPDATE SET status = excluded.status, output_file = excluded.output_file, '
+            'reviews = NULL, error = NULL, updated_at = excluded.updated_at',
+            (self.job, place_key(url), url, 'done', output_file, time()))
+
+    def mark_failed(self, url, error):
+        self.execute(
+            'INSERT INTO places (job, place_key, url, status, error, updated_at) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (job, place_key) DO UPDATE SET status = excluded.status, error = excluded.error, '
+            'updated_at = excluded.updated_at WHERE places.status != ?',
+            (self.job, place_key(url), url, 'failed', str(error), time(), 'done'))
+
+    def done_places(self):
+        """(url, output_file) of every finished place of this job"""
+        return self.execute('SELECT url, output_file FROM places WHERE job = ? AND status = ? ORDER BY updated_at',
+                            (self.job, 'done'))
+
+    def counts(self):
+        """Number of places per status"""
+        return dict(self.execute('SELECT status, COUNT(*) FROM places WHERE job = ? GROUP BY status', (self.job,)))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
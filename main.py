@@ -1,13 +1,153 @@
-import tkinter as tk
+import argparse
 import logging
 import os
-from ui import ParserUI
+import sys
+
+
+def parse_args(argv=None):
+    import chrome_remote
+
+    parser = argparse.ArgumentParser(description="2GIS parser. Without --query or --urls the GUI is started.")
+    parser.add_argument('--query', help="Search query to crawl headless")
+    parser.add_argument('--urls', help="File with place URLs (one per line) to crawl headless")
+    parser.add_argument('--reviews', type=int, default=0, help="Reviews to scrape per place (0 disables reviews, -1 collects every review)")
+    parser.add_argument('--workers', type=int, default=0, help="Parallel headless Chrome workers (default: derived from CPU and RAM)")
+    parser.add_argument('--tabs', type=int, default=0, help="Interleave places across this many tabs of one Chrome instead of separate workers")
+    parser.add_argument('--engine', choices=['chrome', 'http', 'cdp'], default='chrome',
+                        help="Browser workers, the browserless HTTP engine or tabs driven over DevTools from one event loop")
+    parser.add_argument('--review-mode', choices=['batch', 'api', 'snapshot', 'index'], default='batch',
+                        help="How the Chrome engine reads reviews: observer batches, captured API payloads, "
+                             "lxml-parsed HTML snapshots or one lookup per field")
+    parser.add_argument('--profile', choices=['lean', 'full'], default='lean',
+                        help="lean aborts images, CSS, fonts and media; full loads everything (both report page weight)")
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl', help="Streamed output format")
+    parser.add_argument('--export', nargs='*', choices=['xlsx', 'parquet', 'arrow'], default=['xlsx'],
+                        help="Exports built from the streamed files at the end")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue the previous run of the same query or URL file: skip finished places, resume partial ones")
+    parser.add_argument('--new-only', action='store_true',
+                        help="Only reviews posted since earlier crawls; paging stops at the first run of known reviews")
+    parser.add_argument('--prune-reviews', action='store_true',
+                        help="Empty review nodes once extracted so deep review histories keep the tab's memory flat")
+    parser.add_argument('--profile-driver', action='store_true',
+                        help="Time every WebDriver command by call site; JSON reports go to logs/profile/")
+    archive = parser.add_mutually_exclusive_group()
+    archive.add_argument('--record', metavar='PATH',
+                         help="Save every response of the Chrome crawl or sandbox to this traffic archive (HAR entries as JSONL)")
+    archive.add_argument('--replay', metavar='PATH',
+                         help="Serve the Chrome crawl or sandbox from a recorded traffic archive instead of the network")
+    parser.add_argument('--sandbox', action='store_true', help="Start the interactive sandbox")
+    parser.add_argument('--daemon', action='store_true',
+                        help="Keep a warm headless Chrome running for --attach")
+    parser.add_argument('--attach', type=int, nargs='?', const=chrome_remote.DEFAULT_PORT, metavar='PORT',
+                        help="Attach the GUI, the sandbox, the search browser and --tabs to the --daemon browser "
+                             "instead of launching Chrome (--workers always launch their own)")
+    return parser.parse_args(argv)
+
+
+def search_urls(query, resource_profile='lean', ledger=None, traffic_archive=None, chrome_port=None):
+    """Yield the place links of a search from a dedicated headless browser (or a tab of the daemon)"""
+    from parser_engine import Parser2GIS
+
+    searcher = Parser2GIS(query, headless=True, resource_profile=resource_profile, traffic_archive=traffic_archive,
+                          chrome_port=chrome_port)
+    searcher.open_browser()
+    searcher.parsing_active = True
+    try:
+        for url in searcher.iter_place_urls(searcher.search_url()):
+            if ledger and ledger.is_done(url):
+                continue
+            yield url
+    finally:
+        searcher.parsing_active = False
+        searcher.close_browser()
+
+
+def run_crawl(args):
+    """Crawl places without the GUI and save them like the GUI does"""
+    from parser_engine import Parser2GIS
+    from job_ledger import JobLedger
+    from review_index import ReviewIndex
+
+    # -1 pages through the whole review history
+    max_reviews = sys.maxsize if args.reviews < 0 else args.reviews
+    scrape_reviews = max_reviews > 0
+
+    urls = []
+    if args.urls:
+        with open(args.urls, 'r', encoding='utf-8') as f:
+            urls = [line.strip() for line in f if line.strip()]
+
+    # Finished places, review checkpoints and the output files of this job
+    job = args.query or os.path.splitext(os.path.basename(args.urls))[0]
+    ledger = JobLedger(job, resume=args.resume)
+    if args.resume:
+        logging.info(f"Resuming {job}: {ledger.counts()}")
+        urls = list(ledger.pending(urls))
+
+    # Written reviews are fingerprinted so later --new-only runs can stop at them
+    review_index = ReviewIndex()
+
+    # Responses recorded to, or replayed from, a traffic archive (Chrome engine only)
+    traffic_archive = None
+    if args.record or args.replay:
+        from traffic_archive import TrafficArchive
+        traffic_archive = TrafficArchive(args.record or args.replay, 'record' if args.record else 'replay')
+
+    # Streams the records to disk and exports them at the end
+    collector = Parser2GIS(job, scrape_reviews=scrape_reviews, output_format=args.format, export_formats=args.export,
+                           ledger=ledger, review_index=review_index)
+    if args.resume:
+        collector.open_writer()  # Reopen the previous files so the export covers the whole job
+
+    try:
+        if args.engine == 'http':
+            from http_client import Parser2GISHttp, ChromeFallback
+            engine = Parser2GISHttp(args.query or '', scrape_reviews=scrape_reviews, max_reviews=max_reviews,
+                                    concurrency=args.workers or 20, on_record=collector.add_record,
+                                    new_reviews_only=args.new_only, review_index=review_index, ledger=ledger,
+                                    fallback=ChromeFallback(scrape_reviews=scrape_reviews, max_reviews=max_reviews,
+                                                            review_mode=args.review_mode))
+            engine.run([{'Ссылка': url} for url in urls] if urls or args.urls else None)
+        elif args.engine == 'cdp':
+            from cdp_async import Parser2GISCdp
+            engine = Parser2GISCdp(on_record=collector.add_record, scrape_reviews=scrape_reviews, max_reviews=max_reviews,
+                                   tabs=args.tabs or 4, new_reviews_only=args.new_only, review_index=review_index)
+            engine.run(urls if args.urls else list(search_urls(args.query, args.profile, ledger, chrome_port=args.attach)))
+        else:
+            if not args.urls:
+                # Workers start on the first page while later pages are still being walked
+                urls = search_urls(args.query, args.profile, ledger, traffic_archive, args.attach)
+            from worker_pool import BrowserWorkerPool, TabPool
+            if args.tabs > 1:
+                pool = TabPool(tabs=args.tabs, on_record=collector.add_record, scrape_reviews=scrape_reviews,
+                               max_reviews=max_reviews, review_mode=args.review_mode, resource_profile=args.profile, ledger=ledger,
+                               new_reviews_only=args.new_only, review_index=review_index,
+                               profile_driver=args.profile_driver, traffic_archive=traffic_archive,
+                               prune_reviews=args.prune_reviews, chrome_port=args.attach)
+            else:
+                pool = BrowserWorkerPool(workers=args.workers or None, on_record=collector.add_record,
+                                         scrape_reviews=scrape_reviews, max_reviews=max_reviews, review_mode=args.review_mode,
+                                         resource_profile=args.profile, ledger=ledger,
+                                         new_reviews_only=args.new_only, review_index=review_index,
+                                         profile_driver=args.profile_driver, traffic_archive=traffic_archive,
+                                         prune_reviews=args.prune_reviews)
+            pool.run(urls)
+    finally:
+        # Also after a crash: everything streamed so far is exported
+        filename = collector.save_data()
+        if traffic_archive:
+            traffic_archive.close()
+    return filename
+
 
 def main():
+    args = parse_args()
+
     # Create logs directory if it doesn't exist
     os.makedirs("logs", exist_ok=True)
     os.makedirs("output", exist_ok=True)
-    
+
     # Configure basic logging
     logging.basicConfig(
         level=logging.INFO,
@@ -16,11 +156,27 @@ def main():
             logging.StreamHandler(),  # Console handler
         ]
     )
-    
+
+    if args.daemon:
+        import chrome_remote
+        chrome_remote.run_daemon()
+        return
+
+    if args.sandbox:
+        from parser_engine import sandbox
+        sandbox(record_path=args.record, replay_path=args.replay, chrome_port=args.attach)
+        return
+
+    if args.query or args.urls:
+        run_crawl(args)
+        return
+
     # Create the GUI
+    import tkinter as tk
+    from ui import ParserUI
     root = tk.Tk()
-    app = ParserUI(root)
+    app = ParserUI(root, chrome_port=args.attach)
     root.mainloop()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,156 @@
+import os
+import csv
+import json
+import glob
+import threading
+from time import monotonic
+from job_ledger import place_key
+
+PLACE_COLUMNS = ['Название', 'Телефон', 'Адрес', 'Ссылка', 'Широта', 'Долгота']
+REVIEW_COLUMNS = ['firm_id', 'business_name', 'reviewer_name', 'rating', 'text', 'likes', 'date', 'review_id',
+                  'overall_rating', 'total_ratings']
+
+FSYNC_INTERVAL = 5.0  # Seconds between fsyncs; a crash loses at most this much
+MAX_FILE_BYTES = 64 * 1024 * 1024
+
+
+class RotatingFile:
+    """Append-only JSONL or CSV file that rolls over to a new part when it grows past max_bytes"""
+
+    def __init__(self, base_path, fmt='jsonl', columns=None, max_bytes=MAX_FILE_BYTES):
+        self.base_path = base_path
+        self.fmt = fmt
+        self.columns = columns
+        self.max_bytes = max_bytes
+        self.file = None
+        self.csv_writer = None
+        # A resumed run keeps appending to the last part of the previous one
+        self.paths = sorted(glob.glob(f"{glob.escape(base_path)}.[0-9][0-9][0-9].{fmt}"))
+        self.part = max(0, len(self.paths) - 1)
+
+    def path_for(self, part):
+        return f"{self.base_path}.{part:03d}.{self.fmt}"
+
+    def open_part(self):
+        path = self.path_for(self.part)
+        self.file = open(path, 'a', encoding='utf-8', newline='')
+        if path not in self.paths:
+            self.paths.append(path)
+        if self.fmt == 'jsonl' and self.file.tell() > 0:
+            self.file.write('\n')  # Terminate a line torn by a crash; blank lines are skipped on read
+        if self.fmt == 'csv':
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=self.columns, extrasaction='ignore')
+            if self.file.tell() == 0:
+                self.csv_writer.writeheader()
+
+    def write(self, row):
+        if self.file is None:
+            self.open_part()
+        elif self.file.tell() >= self.max_bytes:
+            self.sync()
+            self.file.close()
+            self.part += 1
+            self.open_part()
+
+        if self.fmt == 'csv':
+            self.csv_writer.writerow({key: value if isinstance(value, (str, int, float)) or value is None
+                                      else json.dumps(value, ensure_ascii=False) for key, value in row.items()})
+        else:
+            self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    def flush(self):
+        if self.file:
+            self.file.flush()
+
+    def sync(self):
+        if self.file:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+
+class StreamWriter:
+    """
+    Append every place and its reviews to disk as they arrive
+
+    Places and reviews go to separate files (base_places.000.jsonl, base_reviews.000.jsonl, ...).
+    Each record is flushed to the OS immediately and fsynced every fsync_interval seconds, so a
+    crash or a killed GUI keeps everything written before it. The final Excel/Parquet export is
+    a separate pass over these files (see exporters.py).
+    """
+
+    def __init__(self, base_path, fmt='jsonl', place_columns=None, fsync_interval=FSYNC_INTERVAL,
+                 max_bytes=MAX_FILE_BYTES):
+        if fmt not in ('jsonl', 'csv'):
+            raise ValueError(f"Unsupported output format: {fmt}")
+        self.base_path = base_path
+        self.fmt = fmt
+        self.place_columns = [c for c in (place_columns or PLACE_COLUMNS) if c != 'Отзывы']
+        self.fsync_interval = fsync_interval
+        self.places = RotatingFile(f"{base_path}_places", fmt, self.place_columns, max_bytes)
+        self.reviews = RotatingFile(f"{base_path}_reviews", fmt, REVIEW_COLUMNS, max_bytes)
+        self.last_sync = monotonic()
+        self.lock = threading.Lock()
+        self.place_count = 0
+        self.review_count = 0
+        self.closed = False
+
+    def write_record(self, record):
+        """
+        Append a place record; its 'Отзывы' list (or JSON string) goes to the reviews file
+
+        Args:
+            record: Dict keyed by column name as built by Parser2GIS.place_steps()
+        """
+        reviews = record.get('Отзывы') or []
+        if isinstance(reviews, str):
+            reviews = json.loads(reviews)
+        firm_id = place_key(record.get('Ссылка', ''))
+        with self.lock:
+            self.places.write({column: record.get(column, '') for column in self.place_columns})
+            for review in reviews:
+                self.reviews.write(dict(review, firm_id=firm_id, business_name=record.get('Название', '')))
+            self.place_count += 1
+            self.review_count += len(reviews)
+            self.places.flush()
+            self.reviews.flush()
+            if monotonic() - self.last_sync >= self.fsync_interval:
+                self.places.sync()
+                self.reviews.sync()
+                self.last_sync = monotonic()
+
+    def close(self):
+        """Fsync and close all files"""
+        with self.lock:
+            if not self.closed:
+                self.places.close()
+                self.reviews.close()
+                self.closed = True
+
+    def place_files(self):
+        return list(self.places.paths)
+
+    def review_files(self):
+        return list(self.reviews.paths)
+
+
+def iter_rows(paths):
+    """Read rows back from JSONL or CSV part files one at a time"""
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            if path.endswith('.csv'):
+                yield from csv.DictReader(f)
+                continue
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # Line torn by a crash
@@ -1,14 +1,13 @@
 import os
+import re
 import logging
 import datetime
 import json
-import pandas as pd
 import functools
-from time import sleep
+from time import monotonic
 from urllib.parse import unquote
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -16,27 +15,94 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.remote.webelement import WebElement
 import pathes
+import chrome_remote
+import resource_blocker
+import review_extractor
+import api_payloads
+import exporters
+from output_writer import StreamWriter
+from job_ledger import JobLedger, place_key as firm_key
+from review_index import ReviewIndex, DeltaFilter
+from selector_registry import SelectorRegistry
+from profiler import DriverProfiler, profiled_sleep as sleep
+from waits import (Wait, run_steps, wait_until, install_page_helpers, ELEMENT_VISIBLE_JS, NAVIGATE_JS, NAVIGATION_DONE_JS,
+                   NETWORK_IDLE_JS, NETWORK_IDLE_MS, CLICK_JS, LOCATION_CHANGED_JS)
+
+# Links of the firm cards matched by arguments[0] (pathes.main_block), without query strings
+CARD_LINKS_JS = """
+    const cards = document.evaluate(arguments[0], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const links = [];
+    for (let i = 0; i < cards.snapshotLength; i++) {
+        const link = cards.snapshotItem(i).querySelector('a[href*="/firm/"]');
+        if (link) links.push(link.href.split('?')[0]);
+    }
+    return links;
+"""
+
+DOM_SIZE_JS = "return document.getElementsByTagName('*').length;"
+
+PRUNED_PAGES_PER_CYCLE = 5  # 'Load More' pages between extractions when extracted reviews are pruned
+
+# Truthy once the first card link differs from arguments[1], i.e. the next results page has rendered
+FIRST_CARD_CHANGED_JS = """
+    const card = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    const link = card && card.querySelector('a[href*="/firm/"]');
+    return !!link && link.href.split('?')[0] !== arguments[1];
+"""
 
 class Parser2GIS:
-    def __init__(self, search_query, on_log=None, on_status_change=None, scrape_reviews=False, max_reviews=5, direct_url=None, on_review_update=None):
+    def __init__(self, search_query, on_log=None, on_status_change=None, scrape_reviews=False, max_reviews=5, direct_url=None, on_review_update=None,
+                 review_mode='batch', headless=False, chrome_port=None, resource_profile='full',
+                 allowed_resources=None, output_format='jsonl', export_formats=('xlsx',), ledger=None, resume=False,
+                 new_reviews_only=False, review_index=None, profile_driver=False, traffic_archive=None,
+                 prune_reviews=False):
         self.search_query = search_query
         self.on_log = on_log
         self.on_status_change = on_status_change
-        self.scrape_reviews = scrape_reviews
+        self.reviews_enabled = scrape_reviews  # Kept apart from the scrape_reviews() method
+        # 'batch' (one script call per cycle), 'api' (captured 2GIS API payloads, DOM as fallback),
+        # 'snapshot' (one outerHTML per cycle, parsed with lxml in a process pool) or 'index' (one lookup per field)
+        self.review_mode = review_mode
+        self.api_review_ids = set()
         self.max_reviews = max_reviews
         self.direct_url = direct_url
         self.on_review_update = on_review_update
+        self.headless = headless
+        # Attach to the browser daemon listening on this port instead of launching Chrome; None launches one
+        self.chrome_port = chrome_port
+        self.attached = False
+        self.owned_handles = []  # Tabs this session opened in an attached browser
+        # 'full' or 'lean' (see resource_blocker.PROFILES); allowed_resources overrides the profile's allow-list
+        self.resource_profile = resource_profile
+        self.allowed_resources = allowed_resources if allowed_resources is not None else resource_blocker.PROFILES[resource_profile]
+        self.resource_blocker = None
+        self.selectors = None  # Cached reviews container and selector hit/miss counts, set by open_browser()
         self.driver = None
         self.parsing_active = False
         self.reviews_active = True  # Control flag just for reviews
         self.page_count = 0
         self.output_filename = None
 
-        # Data storage
+        # Data storage: records are streamed to output/ as they arrive ('jsonl' or 'csv')
+        # and exported to export_formats ('xlsx', 'parquet', 'arrow') by save_data()
         self.columns = ['Название', 'Телефон', 'Адрес', 'Ссылка', 'Широта', 'Долгота']
-        if self.scrape_reviews:
+        if self.reviews_enabled:
             self.columns.append('Отзывы')
-        self.data = {column: [] for column in self.columns}
+        self.output_format = output_format
+        self.export_formats = export_formats
+        self.writer = None
+        # Checkpoints finished places and review progress; start() creates one unless it is shared by a pool
+        self.ledger = ledger
+        self.resume = resume
+        # Fingerprints of written reviews; with new_reviews_only paging stops at the first run of known reviews
+        self.new_reviews_only = new_reviews_only
+        self.review_index = review_index
+        # Times every WebDriver command by call site; reports go to logs/profile/
+        self.profiler = DriverProfiler(on_log=on_log) if profile_driver else None
+        # traffic_archive.TrafficArchive every response is recorded to, or replayed from instead of the network
+        self.traffic_archive = traffic_archive
+        # Empty review nodes once extracted and page in a few batches per cycle, so deep histories keep a flat heap
+        self.prune_reviews = prune_reviews
         
     def stop_reviews(self):
         """Stop only the review scraping process"""
@@ -105,10 +171,11 @@ class Parser2GIS:
                 sleep(wait_time)
     
     def clean_memory(self, force=False):
-        """Clean memory and trigger GC"""
+        """Clean memory and trigger GC every third search page"""
         if (self.page_count % 3 == 0) or force:
             self.log("Running garbage collection", "info")
-            self.driver.execute_script('if(window.gc) { window.gc(); }')
+            # window.gc only exists with --expose-gc; DevTools can always collect
+            self.driver.execute_cdp_cmd('HeapProfiler.collectGarbage', {})
             
             # Clear browser console logs
             self.driver.execute_cdp_cmd('Log.clear', {})
@@ -117,7 +184,16 @@ class Parser2GIS:
             self.driver.execute_script('localStorage.clear(); sessionStorage.clear();')
     
     def setup_driver(self):
-        """Set up optimized Chrome driver"""
+        """Set up optimized Chrome driver, or attach to the browser daemon on chrome_port when one was asked for"""
+        if self.chrome_port:
+            if chrome_remote.debugger_version(self.chrome_port):
+                self.attached = True
+                # The daemon was started with its own flags (chrome_remote.CHROME_ARGS)
+                self.log(f"Attaching to the browser on port {self.chrome_port}; headless mode and the Chrome "
+                         f"options of this session do not apply", "warning")
+                return chrome_remote.attach_driver(self.chrome_port)
+            self.log(f"No browser answers on port {self.chrome_port}; launching Chrome", "warning")
+
         options = webdriver.ChromeOptions()
         
         # Performance optimizations
@@ -128,6 +204,12 @@ class Parser2GIS:
         options.add_argument('--blink-settings=imagesEnabled=false')
         options.add_argument('--disable-infobars')
         options.add_argument('--disable-browser-side-navigation')
+        # Keep background tabs running at full speed so several tabs can be interleaved
+        options.add_argument('--disable-background-timer-throttling')
+        options.add_argument('--disable-renderer-backgrounding')
+        options.add_argument('--disable-backgrounding-occluded-windows')
+        if self.headless:
+            options.add_argument('--headless=new')
         
         # Disable unnecessary services
         prefs = {
@@ -141,7 +223,7 @@ class Parser2GIS:
         }
         options.add_experimental_option('prefs', prefs)
         
-        return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+        return webdriver.Chrome(service=Service(chrome_remote.resolve_chromedriver()), options=options)
     
     def setup_network_interception(self):
         """Set up network interception to block unnecessary requests"""
@@ -155,43 +237,127 @@ class Parser2GIS:
             ]
         })
         
-        # Add API monitoring
-        self.driver.execute_script("""
-            window.api2gisResponses = [];
-            (function() {
-                const originalFetch = window.fetch;
-                window.fetch = function() {
-                    const promise = originalFetch.apply(this, arguments);
-                    if (arguments[0] && arguments[0].includes('api.2gis')) {
-                        promise.then(response => {
-                            if (response.ok) {
-                                response.clone().json().then(data => {
-                                    window.api2gisResponses.push(data);
-                                }).catch(() => {});
-                            }
-                        });
-                    }
-                    return promise;
-                };
-            })();
-        """)
+        # Capture 2GIS API responses in every document, including after navigation
+        api_payloads.install_api_hook(self.driver)
+        
+        # Network-idle tracking for waits; no CSS animations or CSS smooth scrolling to wait out
+        install_page_helpers(self.driver)
     
+    def extract_api_reviews(self):
+        """Map captured reviews API payloads into review records, skipping reviews already returned"""
+        entries = api_payloads.drain_api_responses(self.driver, api_payloads.REVIEWS_URL_PATTERN)
+        _, reviews = api_payloads.map_payloads(entries)
+        new_reviews = []
+        for review in reviews:
+            if review['review_id'] not in self.api_review_ids:
+                self.api_review_ids.add(review['review_id'])
+                new_reviews.append(review)
+        return new_reviews
+
+    def extract_firm_from_api(self):
+        """Return the record of the open firm from captured catalog API payloads, or None"""
+        entries = api_payloads.drain_api_responses(self.driver, api_payloads.FIRMS_URL_PATTERN)
+        firms, _ = api_payloads.map_payloads(entries)
+        # The page also loads similar places and ads, so only the firm of the current URL counts
+        firm_id = api_payloads.firm_id_from_url(self.driver.current_url)
+        return next((firm for firm in firms if firm_id and firm['id'] == firm_id), None)
+
+    def visible_review_steps(self, start_index):
+        """
+        Step generator returning the reviews not collected yet, using the configured review mode,
+        and the div index after the last review node read from the page (at least start_index)
+
+        The snapshot mode reads the review nodes from start_index on as one HTML string and waits
+        for snapshot_parser to parse it in its process pool, so a TabPool drives the other tabs
+        meanwhile.
+        """
+        if self.review_mode == 'api':
+            api_reviews = self.extract_api_reviews()
+            # Keep the DOM cursor in step so the fallback never re-reads reviews the API already returned
+            _, items = review_extractor.drain_new_reviews(self.driver)
+            if api_reviews:
+                return api_reviews, review_extractor.next_review_index(items, start_index)
+            # The first page can be server-rendered without an API call, so fall back to the DOM
+        elif self.review_mode == 'batch':
+            # Only the nodes the observer queued since the previous drain are read
+            _, items = review_extractor.drain_new_reviews(self.driver)
+        elif self.review_mode == 'snapshot':
+            import snapshot_parser
+
+            markup = self.driver.execute_script(snapshot_parser.REVIEWS_SNAPSHOT_JS, pathes.reviews_main_block, start_index)
+            if not markup:
+                return [], start_index
+            items = yield Wait(future=snapshot_parser.submit(markup, start_index), timeout=30)
+            if items is None:
+                self.log(f"Review snapshot from index {start_index} was not parsed in time", "warning")
+                return [], start_index
+        else:
+            # Legacy mode: one lookup per field, only at the indexes the probe found to hold a review
+            items = []
+            for i in review_extractor.probe_review_indexes(self.driver, start_index):
+                if not self.parsing_active:
+                    break
+                try:
+                    item = review_extractor.extract_review_at(self.driver, i, self.selectors)
+                    if item:
+                        items.append(item)
+                except Exception as e:
+                    self.log(f"Error extracting review at index {i}: {e}", "warning")
+
+        for item in items:
+            self.log(f"Processing review at index {item['index']} with reviewer: {item['name']}", "info")
+        return (yield from self.review_record_steps(items)), review_extractor.next_review_index(items, start_index)
+
+    def review_record_steps(self, items):
+        """Expand every truncated review of a batch at once, then convert the batch into review records"""
+        indexes = review_extractor.truncated_indexes(items)
+        texts = {}
+        try:
+            if review_extractor.click_read_more(self.driver, indexes):
+                texts = (yield Wait(review_extractor.EXPANDED_TEXTS_JS, False, timeout=2)) or \
+                    self.driver.execute_script(review_extractor.EXPANDED_TEXTS_JS, True)
+        except Exception as e:
+            self.log(f"Error expanding truncated reviews: {e}", "warning")
+        return review_extractor.merge_expanded(items, indexes, texts, on_error=lambda message: self.log(message, "warning"))
+
+    def load_more_steps(self, target, available=None, max_clicks=None):
+        """review_extractor.load_more_steps() on this tab, stopping with the parser or the review scraping"""
+        return review_extractor.load_more_steps(self.driver, target, available, max_clicks, on_log=self.log,
+                                                active=lambda: self.parsing_active and self.reviews_active)
+
     def scrape_reviews(self, max_reviews=None, place_name=""):
         """Scrape reviews for the current item"""
+        return run_steps(self.driver, self.review_steps(max_reviews, place_name))
+
+    def review_steps(self, max_reviews=None, place_name="", resume_reviews=None, place_key=None):
+        """
+        Step generator behind scrape_reviews(); yields a Wait wherever the page has to catch up
+
+        resume_reviews are reviews a previous run already collected for this place: the same
+        number of reviews is skipped on the page and the rest is appended to them. With a
+        place_key the progress is checkpointed in the ledger after every batch.
+        """
         max_reviews = max_reviews or self.max_reviews
-        reviews = []
+        reviews = list(resume_reviews or [])
+        skip = len(reviews)
+        delta = None
+        if self.new_reviews_only and self.review_index:
+            delta = DeltaFilter(self.review_index, firm_key(place_key or self.driver.current_url))
         self.reviews_active = True  # Reset at the start of each place
+        self.api_review_ids = set()
     
         try:
             # Try to click on the reviews section/tab
-            reviews_link = self.wait_for_element(pathes.reviews_hyperlink)
-            if not reviews_link:
+            if not (yield Wait(ELEMENT_VISIBLE_JS, pathes.reviews_hyperlink, timeout=10)):
                 self.log("No reviews section found or not clickable", "warning")
                 return reviews
     
-            reviews_link.click()
+            self.driver.find_element(By.XPATH, pathes.reviews_hyperlink).click()
             self.log("Opened reviews section", "info")
-            sleep(1.5)  # Wait for reviews to load
+            # Wait for the first review to render
+            yield Wait(ELEMENT_VISIBLE_JS, pathes.any_reviewer_name, timeout=10)
+            if self.review_mode in ('batch', 'api'):
+                review_extractor.install_review_observer(self.driver)
             
             # Get overall rating and total rating count
             try:
@@ -203,7 +369,6 @@ class Parser2GIS:
                 total_rating_text = total_rating_element.text.strip()
     
                 # Extract numeric count from text like "123 оценок"
-                import re
                 total_rating_count = "0"
                 if match := re.search(r'(\d+)', total_rating_text):
                     total_rating_count = match.group(1)
@@ -228,99 +393,50 @@ class Parser2GIS:
                 self.log(f"Could not extract overall rating details: {e}", "warning")
                 overall_rating = "0"
                 total_rating_count = "0"
+
+            # Number of reviews, shown on the reviews tab link (digits may be split by spaces); caps the paging
+            available_reviews = None
+            try:
+                digits = re.sub(r'\D', '', self.driver.find_element(By.XPATH, pathes.reviews_count).text)
+                available_reviews = int(digits) if digits else None
+            except Exception:
+                pass
     
-            # Loop to scrape reviews
+            # Page in everything the target needs, then extract it in one batch; with --new-only
+            # one page at a time so paging stops at the first known reviews, and with pruning a
+            # few pages per cycle so extracted reviews are emptied before the next ones load
+            # Div index after the last review node read from this tab: where the next probe or snapshot
+            # starts and, with pruning, the boundary below which nodes are emptied
             review_index = 1
-            load_more_attempts = 0
-            max_load_more_attempts = 15  # Maximum times to try clicking "Load More"
+            read = 0  # Review nodes extracted so far, including skipped and known ones
+            max_clicks = 1 if delta else PRUNED_PAGES_PER_CYCLE if self.prune_reviews else None
+            yield from self.load_more_steps(max_reviews, available_reviews, max_clicks)
+            load_more_errors = 0
+            max_load_more_errors = 3
+            cycle = 0
     
             # Continue until we reach max_reviews or run out of reviews to load
-            while len(reviews) < max_reviews and self.parsing_active and self.reviews_active and load_more_attempts < max_load_more_attempts:
+            while len(reviews) < max_reviews and self.parsing_active and self.reviews_active and load_more_errors < max_load_more_errors:
                 # Notify UI of progress
                 if self.on_review_update:
                     self.on_review_update(place_name, len(reviews), max_reviews)
 
                 self.log(f"Extracted a total of {len(reviews)} reviews", "info")
                
-                visible_reviews = []
-                current_review_index = review_index
-
                 # Try to extract visible reviews
-                for i in range(current_review_index, current_review_index + 30):  # Try a reasonable range
-                    if not self.parsing_active:
-                        break
-
-                    try:
-                        # Check if reviewer name element exists
-                        try:
-                            reviewer_name_element = self.driver.find_element(By.XPATH, pathes.get_reviewer_name(i))
-                        except NoSuchElementException:
-                            continue  # Skip this index
-                        
-                        # Get reviewer name
-                        reviewer_name = reviewer_name_element.text.strip()
-                        if not reviewer_name:
-                            continue
-
-                        self.log(f"Processing review at index {i} with reviewer: {reviewer_name}", "info")
-
-                        # Get star rating
-                        try:
-                            stars_container = self.driver.find_element(By.XPATH, pathes.get_review_stars_container(i))
-                            star_count = pathes.count_stars_in_container(self.driver, stars_container)
-                            stars_text = f"{star_count} stars"
-                        except Exception as star_error:
-                            self.log(f"Error counting stars: {star_error}", "warning")
-                            stars_text = "Unknown rating"
-                        # Get review text and expand if truncated
-                        try:
-                            review_text_element = self.driver.find_element(By.XPATH, pathes.get_review_text(i))
-                            review_text = review_text_element.text.strip()
-
-                            # Check if text is truncated (has "Читать целиком" or similar)
-                            if "..." in review_text or "еще" in review_text.lower() or "целиком" in review_text.lower():
-                                try:
-                                    # Try to click the "read more" element if it exists
-                                    read_more_elements = self.driver.find_elements(By.XPATH, f"//span[contains(@class, '_17ww69i')]")
-                                    for element in read_more_elements:
-                                        if element.is_displayed() and element.location['y'] > review_text_element.location['y'] and element.location['y'] < review_text_element.location['y'] + 200:
-                                            element.click()
-                                            sleep(0.5)
-                                            # Get updated text after expanding
-                                            review_text = self.driver.find_element(By.XPATH, pathes.get_review_text(i)).text.strip()
-                                            break
-                                except:
-                                    self.log(f"Could not expand review text for review {i}", "warning")
-                        except NoSuchElementException:
-                            review_text = "[No review text found]"
-
-                        # Get likes count
-                        likes = "0"
-                        try:
-                            likes_element = self.driver.find_element(By.XPATH, pathes.get_review_likes(i))
-                            likes = likes_element.text.strip()
-                            if not likes:
-                                likes = "0"
-                        except:
-                            pass
-                        
-                        # Create review data and add to list
-                        review_data = {
-                            "reviewer_name": reviewer_name,
-                            "rating": stars_text,
-                            "text": review_text,
-                            "likes": likes
-                        }
-                        
-                        # Add overall metrics to the first review only
-                        if len(reviews) == 0:
-                            review_data["overall_rating"] = overall_rating
-                            review_data["total_ratings"] = total_rating_count
-                        
-                        visible_reviews.append(review_data)
-                        
-                    except Exception as e:
-                        self.log(f"Error extracting review at index {i}: {e}", "warning")
+                # The next index-mode probe or snapshot starts after the last review node read, whatever is dropped below
+                cycle_start = review_index
+                visible_reviews, review_index = yield from self.visible_review_steps(review_index)
+                read += len(visible_reviews)
+                if skip and visible_reviews:
+                    # Already collected by the run being resumed
+                    visible_reviews, skip = visible_reviews[skip:], max(0, skip - len(visible_reviews))
+                if delta and visible_reviews:
+                    visible_reviews = delta.filter(visible_reviews)
+                # Add overall metrics to the first review only
+                if visible_reviews and len(reviews) == 0:
+                    visible_reviews[0]["overall_rating"] = overall_rating
+                    visible_reviews[0]["total_ratings"] = total_rating_count
 
                 # When adding reviews to the collection, check if we should stop
                 if visible_reviews:
@@ -332,74 +448,48 @@ class Parser2GIS:
                             # We've reached our target or review scraping was stopped
                             break
 
-                    # Update review index to start after the last review we processed
-                    review_index += len(visible_reviews) + 1
+                    self.checkpoint_reviews(place_key, reviews)
+
+                # Every node before review_index has been read; report what the tab holds afterwards
+                cycle += 1
+                try:
+                    pruned = review_extractor.prune_reviews(self.driver, review_index) if self.prune_reviews else 0
+                    heap_mb, dom_size = self.page_memory()
+                    self.log(f"Review cycle {cycle}: JS heap {heap_mb} MB, {dom_size} DOM elements, {pruned} reviews pruned", "info")
+                except Exception as e:
+                    self.log(f"Could not prune reviews or read page memory: {e}", "warning")
+
+                if delta and delta.reached_known:
+                    self.log(f"Reached reviews collected by an earlier crawl, {len(reviews)} new", "info")
+                    break
 
                 # Check if we should continue loading more
                 if not self.reviews_active:
                     self.log("Review scraping stopped by user", "warning")
                     break
 
-                # If we haven't reached the target number of reviews yet, try to load more
+                # If we haven't reached the target number of reviews yet, page in the rest
                 if len(reviews) < max_reviews:
-                    # Try to find and click the "Load More" button
                     try:
-                        # Method 1: Try to find the button by its class
-                        load_more_buttons = self.driver.find_elements(By.XPATH, "//button[contains(@class, '_kuel4no')]")
-
-                        if load_more_buttons and len(load_more_buttons) > 0 and load_more_buttons[0].is_displayed():
-                            # Scroll to the button to ensure it's in view
-                            self.driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", load_more_buttons[0])
-                            sleep(0.5)
-
-                            # Click the button
-                            load_more_buttons[0].click()
-                            self.log("Clicked 'Load More' button", "info")
-                            load_more_attempts += 1
-
-                            # Wait for new reviews to load
-                            sleep(2)
-                        else:
-                            # Method 2: Try alternative approach with button text
-                            load_more_by_text = self.driver.execute_script("""
-                                // Try to find any button that looks like "load more"
-                                const buttons = Array.from(document.querySelectorAll('button'));
-                                const loadMoreButton = buttons.find(btn => {
-                                    const text = btn.textContent.toLowerCase();
-                                    return text.includes('загрузить') || 
-                                           text.includes('ещё') || 
-                                           text.includes('еще') ||
-                                           text.includes('показать');
-                                });
-
-                                if (loadMoreButton) {
-                                    // Scroll to button
-                                    loadMoreButton.scrollIntoView({behavior: 'smooth', block: 'center'});
-                                    // Click it
-                                    setTimeout(() => loadMoreButton.click(), 500);
-                                    return true;
-                                }
-                                return false;
-                            """)
-
-                            if load_more_by_text:
-                                self.log("Clicked 'Load More' button via JavaScript", "info")
-                                load_more_attempts += 1
-                                sleep(2)
-                            else:
-                                self.log("No 'Load More' button found - all reviews may be loaded", "info")
-                                break
+                        clicks = yield from self.load_more_steps(read + skip + max_reviews - len(reviews), available_reviews, max_clicks)
+                        # Part of the last batch can land after it was read; only stop once nothing is left unread
+                        if not clicks and not (review_index > cycle_start and
+                                               review_extractor.probe_review_indexes(self.driver, review_index)):
+                            break
                     except Exception as e:
                         self.log(f"Error finding or clicking 'Load More' button: {e}", "warning")
                         # Try scrolling to the bottom as a fallback
                         self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                        sleep(1)
-                        load_more_attempts += 1
+                        yield Wait(NETWORK_IDLE_JS, NETWORK_IDLE_MS, timeout=2)
+                        load_more_errors += 1
                 else:
                     self.log(f"Reached target of {max_reviews} reviews", "info")
                     break
                 
             self.log(f"Extracted a total of {len(reviews)} reviews", "info")
+            if self.selectors:  # Only set once open_browser() or share_browser() ran
+                self.selectors.sync_page_stats()
+                self.log(f"Selector stats: {self.selectors.stats()}", "info")
 
         except Exception as e:
             self.log(f"Error in review scraping: {e}", "error")
@@ -407,63 +497,325 @@ class Parser2GIS:
 
         # Return to main screen
         try:
+            previous_url = self.driver.current_url
             self.driver.back()
-            sleep(1)
-        except:
+            # The wait can fail while the previous page replaces this one; the reviews are kept regardless
+            yield Wait(LOCATION_CHANGED_JS, previous_url, timeout=5)
+        except Exception:
             pass
 
         return reviews
     
+    def checkpoint_reviews(self, place_key, reviews):
+        """Save the reviews collected so far for a place, so a resumed run continues from there"""
+        if self.ledger and place_key:
+            try:
+                self.ledger.save_progress(place_key, reviews)
+            except Exception as e:
+                self.log(f"Could not checkpoint reviews: {e}", "warning")
+
+    def open_writer(self):
+        """Start the streaming writer for this run under output/"""
+        os.makedirs("output", exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        base_path = f"output/{self.search_query}_{timestamp}"
+        if self.ledger:
+            base_path = self.ledger.output_base(base_path)  # A resumed job appends to its previous files
+        self.writer = StreamWriter(base_path, self.output_format, self.columns)
+        self.log(f"Streaming records to {self.writer.base_path}_*.{self.output_format}")
+
     def save_data(self):
-        """Save collected data to Excel file"""
-        if not self.data or all(len(v) == 0 for v in self.data.values()):
+        """Close the streamed files and export them to Excel and/or typed Parquet/Arrow tables"""
+        if not self.writer or not (self.writer.place_count or self.writer.place_files()):
             self.log("No data to save", "warning")
             return None
+        self.writer.close()
+        
+        filename = None
+        try:
+            if 'xlsx' in self.export_formats:
+                filename = f"{self.writer.base_path}.xlsx"
+                self.log(f"Saving data to {filename}")
+                exporters.export_excel(self.writer.place_files(), self.writer.review_files(), filename)
+            for fmt in ('parquet', 'arrow'):
+                if fmt in self.export_formats:
+                    paths = exporters.export_columnar(self.writer.place_files(), self.writer.review_files(),
+                                                      self.writer.base_path, fmt)
+                    filename = filename or (paths[0] if paths else None)
+        except Exception as e:
+            # The streamed files are complete either way
+            self.log(f"Export failed, data is kept in {self.writer.base_path}_*.{self.output_format}: {e}", "error")
+            return self.writer.place_files()[0]
             
-        # Ensure all arrays are the same length
-        max_length = max(len(values) for values in self.data.values())
-        for column in self.columns:
-            while len(self.data[column]) < max_length:
-                self.data[column].append('')
+        self.log(f"Data saved successfully: {self.writer.place_count} records")
+        return filename
+    
+    def open_browser(self):
+        """Start the optimized Chrome driver with network interception"""
+        self.driver = self.setup_driver()
+        if self.profiler:
+            self.driver = self.profiler.wrap(self.driver)
+        if self.attached:
+            # Work in a tab of our own so several sessions can share the daemon
+            self.driver.switch_to.new_window('tab')
+            self.owned_handles = [self.driver.current_window_handle]
+            self.log(f"Attached to browser on port {self.chrome_port}")
+        else:
+            self.driver.set_window_size(1200, 800)
+        self.selectors = SelectorRegistry(self.driver, on_log=self.log)
+        self.setup_network_interception()
+        self.start_resource_blocker()
+
+    def share_browser(self, owner):
+        """
+        Drive another tab of owner's browser
+
+        The driver, resource blocker and profiler are owner's, so only owner closes them; the review
+        state and the cached reviews container stay per parser, i.e. per tab.
+        """
+        self.driver = owner.driver
+        self.attached = owner.attached
+        self.resource_blocker = owner.resource_blocker
+        self.profiler = owner.profiler
+        self.selectors = SelectorRegistry(self.driver, on_log=self.log)
+
+    def start_resource_blocker(self):
+        """Open the DevTools connection that blocks resources and counts page weight for the current tab"""
+        try:
+            if self.resource_blocker is None:
+                self.resource_blocker = resource_blocker.ResourceBlocker(resource_blocker.debugger_address(self.driver),
+                                                                         self.allowed_resources, self.traffic_archive)
+            self.resource_blocker.watch(self.driver.current_window_handle)
+        except Exception as e:
+            self.log(f"Resource blocking unavailable: {e}", "warning")
+
+    def report_page_weight(self, place_name, started):
+        """Log what the current tab loaded and blocked since the last report and append it to logs/page_weight.jsonl"""
+        if not self.resource_blocker:
+            return None
+        report = self.resource_blocker.take_report(self.driver.current_window_handle)
+        if report is None:
+            return None
+        report.update({'place': place_name, 'profile': self.resource_profile, 'seconds': round(monotonic() - started, 2)})
+        blocked = ', '.join(f"{kind} {count}" for kind, count in sorted(report['blocked_by_type'].items()))
+        self.log(f"Page weight for {place_name} [{self.resource_profile}]: {report['requests']} requests, "
+                 f"{report['bytes'] / 1024:.0f} KB in {report['seconds']}s; blocked {report['blocked']}"
+                 + (f" ({blocked})" if blocked else ""))
+        try:
+            os.makedirs('logs', exist_ok=True)
+            with open(os.path.join('logs', 'page_weight.jsonl'), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(report, ensure_ascii=False) + '\n')
+        except OSError as e:
+            self.log(f"Could not write page weight report: {e}", "warning")
+        return report
+
+    def close_browser(self):
+        """Quit the browser, or only close this session's tabs if it belongs to the daemon"""
+        if not self.driver:
+            return
+        if self.profiler:
+            self.profiler.end_run()
+        if self.resource_blocker:
+            self.resource_blocker.close()
+            self.resource_blocker = None
+        try:
+            if self.attached:
+                for handle in self.owned_handles:
+                    try:
+                        self.driver.switch_to.window(handle)
+                        self.driver.close()
+                    except Exception:
+                        pass  # Tab already gone
+        finally:
+            # Ends the chromedriver session; an attached browser keeps running
+            self.driver.quit()
+            self.driver = None
+            self.owned_handles = []
+    
+    def scrape_place(self, url=None):
+        """
+        Scrape the company page at url, or the page already open
+
+        Returns:
+            dict: Record keyed by column name with the reviews as a list, or None if this is not a company page
+        """
+        return run_steps(self.driver, self.place_steps(url))
+
+    def place_steps(self, url=None):
+        """Step generator behind scrape_place(); only touches the current tab, so several can be interleaved"""
+        started = monotonic()
+        if self.resource_blocker and url:
+            self.resource_blocker.take_report(self.driver.current_window_handle)  # Drop what the previous place left
+        if url:
+            self.driver.execute_script(NAVIGATE_JS, url)
+            yield Wait(NAVIGATION_DONE_JS, timeout=30)
+            yield Wait(ELEMENT_VISIBLE_JS, pathes.title, timeout=10)
+            if self.element_click(self.driver, pathes.cookie_banner):
+                self.log("Cookies accepted")
         
-        # Create output folder if it doesn't exist
-        os.makedirs("output", exist_ok=True)
+        title = self.get_element_text(pathes.title)
+        if not title:
+            return None
+        self.log(f"Detected company page: {title}")
+        place_key = url or unquote(self.driver.current_url)  # Checkpoints are stored under the requested URL
         
-        # Generate filename with timestamp
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"output/{self.search_query}_{timestamp}.xlsx"
+        # Extract company details, from the captured catalog payload when available
+        firm = self.extract_firm_from_api() if self.review_mode == 'api' else None
+        phone = firm['Телефон'] if firm else ''
+        if not firm:
+            try:
+                if (yield Wait(ELEMENT_VISIBLE_JS, pathes.phone_btn, timeout=5)):
+                    self.driver.find_element(By.XPATH, pathes.phone_btn).click()
+                    yield Wait(ELEMENT_VISIBLE_JS, pathes.phone, timeout=3)
+                    phone = self.get_element_text(pathes.phone)
+            except Exception:
+                pass
         
-        self.log(f"Saving data to {filename}")
+        record = {
+            'Название': title,
+            'Телефон': phone,
+            'Адрес': firm['Адрес'] if firm else self.get_element_text(pathes.address),
+            'Ссылка': unquote(self.driver.current_url),
+            'Широта': firm['Широта'] if firm else '',
+            'Долгота': firm['Долгота'] if firm else '',
+        }
         
-        # For Excel output, create a separate sheet for reviews if applicable
-        if 'Отзывы' in self.data and any(self.data['Отзывы']):
-            with pd.ExcelWriter(filename) as writer:
-                # Write main data
-                main_df = pd.DataFrame({col: self.data[col] for col in self.columns if col != 'Отзывы'})
-                main_df.to_excel(writer, sheet_name='Businesses', index=False)
-                
-                # Process reviews and write to another sheet
-                reviews_data = []
-                for i, business_name in enumerate(self.data['Название']):
-                    if i < len(self.data['Отзывы']) and self.data['Отзывы'][i]:
-                        try:
-                            business_reviews = json.loads(self.data['Отзывы'][i])
-                            for review in business_reviews:
-                                review['business_name'] = business_name
-                                reviews_data.append(review)
-                        except:
-                            pass
-                
-                if reviews_data:
-                    reviews_df = pd.DataFrame(reviews_data)
-                    reviews_df.to_excel(writer, sheet_name='Reviews', index=False)
-        else:
-            # Just save the main data
-            pd.DataFrame(self.data).to_excel(filename, index=False)
-            
-        self.log(f"Data saved successfully: {len(self.data['Название'])} records")
-        return filename
+        # Scrape reviews if configured
+        if self.reviews_enabled:
+            self.log(f"Scraping reviews for {title}")
+            resume_reviews = self.ledger.partial_reviews(place_key) if self.ledger else None
+            if resume_reviews:
+                self.log(f"Resuming {title} after {len(resume_reviews)} saved reviews")
+            record['Отзывы'] = yield from self.review_steps(place_name=title, resume_reviews=resume_reviews,
+                                                            place_key=place_key)
+            if record['Отзывы']:
+                self.log(f"Scraped {len(record['Отзывы'])} reviews")
+        self.report_page_weight(title, started)
+        if self.profiler:
+            self.profiler.end_place(title)
+        return record
     
+    def add_record(self, record):
+        """Append a place record and its reviews to the output files and mark the place done"""
+        if self.writer is None:
+            self.open_writer()
+        self.writer.write_record(record)
+        if self.review_index and record.get('Отзывы'):
+            self.review_index.add(firm_key(record.get('Ссылка', '')), record['Отзывы'])
+        if self.ledger:
+            self.ledger.mark_done(record.get('Ссылка', ''), self.writer.place_files()[-1])
+    
+    def page_memory(self):
+        """(JS heap in use in MB, DOM element count) of the current tab"""
+        heap = self.driver.execute_cdp_cmd('Runtime.getHeapUsage', {})
+        return round(heap['usedSize'] / (1024 * 1024), 1), self.driver.execute_script(DOM_SIZE_JS)
+
+    def search_url(self):
+        """URL of the search results for search_query (or the direct URL)"""
+        return self.direct_url or f'https://2gis.ru/almaty/search/{self.search_query}'
+
+    def read_items_count(self):
+        """Number of search results from the results header, or 0 if it is not shown"""
+        digits = ''.join(ch for ch in self.get_element_text(pathes.items_count) if ch.isdigit())
+        return int(digits) if digits else 0
+
+    def iter_place_urls(self, url=None):
+        """
+        Yield the link of every search result, page by page, following next_page_btn
+
+        Only one page of links is held at a time, so the first link is available as soon as the
+        first page renders. Callers may switch tabs between items; the search tab is restored
+        before paging.
+
+        Args:
+            url: Search URL to open first; by default the results already open in the current tab are used
+        """
+        if url:
+            self.driver.get(url)
+            if self.element_click(self.driver, pathes.cookie_banner):
+                self.log("Cookies accepted")
+        search_handle = self.driver.current_window_handle
+
+        if not wait_until(self.driver, ELEMENT_VISIBLE_JS, pathes.main_block, timeout=15):
+            self.log("No search results found", "warning")
+            return
+        total = self.read_items_count()
+        self.log(f"Search results: {total or 'unknown number of'} places")
+
+        seen = set()
+        page = 1
+        self.page_count = page
+        while self.parsing_active:
+            links = self.driver.execute_script(CARD_LINKS_JS, pathes.main_block) or []
+            self.log(f"Page {page}: {len(links)} places")
+            for link in links:
+                if link not in seen:
+                    seen.add(link)
+                    yield link
+                if not self.parsing_active:
+                    return
+            if not links or (total and len(seen) >= total):
+                break
+
+            self.driver.switch_to.window(search_handle)
+            next_btn = self.wait_for_element(pathes.next_page_btn, timeout=5)
+            if not next_btn:
+                self.log("No next page button, last page reached")
+                break
+            self.driver.execute_script(CLICK_JS, next_btn)
+            if not wait_until(self.driver, FIRST_CARD_CHANGED_JS, pathes.main_block, links[0], timeout=15):
+                self.log(f"Page {page + 1} did not load", "warning")
+                break
+            page += 1
+            self.page_count = page
+            try:
+                self.clean_memory()
+            except Exception as e:
+                self.log(f"Could not clean memory: {e}", "warning")
+
+    def iter_places(self, url=None):
+        """
+        Yield the record of every place of the search as soon as it is scraped
+
+        The results stay open in their own tab for paging while places are opened in a second tab.
+
+        Args:
+            url: Search URL to open first; by default the results already open in the current tab are used
+        """
+        search_handle = self.driver.current_window_handle
+        self.driver.switch_to.new_window('tab')
+        place_handle = self.driver.current_window_handle
+        if self.attached:
+            self.owned_handles.append(place_handle)
+        self.setup_network_interception()
+        self.start_resource_blocker()
+        self.driver.switch_to.window(search_handle)
+
+        try:
+            for link in self.iter_place_urls(url):
+                if self.ledger and self.ledger.is_done(link):
+                    self.log(f"Skipping {link}, already done")
+                    continue
+                self.driver.switch_to.window(place_handle)
+                try:
+                    record = self.scrape_place(link)
+                except Exception as e:
+                    self.log(f"Error processing {link}: {e}", "warning")
+                    continue
+                if record:
+                    yield record
+                else:
+                    self.log(f"{link} is not a company page", "warning")
+        finally:
+            try:
+                self.driver.switch_to.window(place_handle)
+                self.driver.close()
+                self.driver.switch_to.window(search_handle)
+                if place_handle in self.owned_handles:
+                    self.owned_handles.remove(place_handle)
+            except Exception:
+                pass  # Browser already gone
+
     def start(self):
         """Start the parsing process"""
         if self.parsing_active:
@@ -472,23 +824,23 @@ class Parser2GIS:
             
         self.parsing_active = True
         self.reviews_active = True
-        self.data = {column: [] for column in self.columns}
+        self.writer = None
+        if self.ledger is None:
+            self.ledger = JobLedger(self.direct_url or self.search_query, resume=self.resume)
+            if self.resume:
+                self.log(f"Resuming job: {self.ledger.counts()}")
+        if self.review_index is None:
+            self.review_index = ReviewIndex()
         
         # Determine URL based on inputs
+        url = self.search_url()
         if self.direct_url:
-            url = self.direct_url
             self.log(f"Starting parser with direct URL: {url}")
         else:
             self.log(f"Starting parser with query: {self.search_query}")
-            url = f'https://2gis.ru/almaty/search/{self.search_query}'
         
         try:
-            # Set up optimized Chrome driver
-            self.driver = self.setup_driver()
-            self.driver.set_window_size(1200, 800)
-            
-            # Set up network interception
-            self.setup_network_interception()
+            self.open_browser()
             
             # Navigate to URL
             self.driver.get(url)
@@ -500,78 +852,33 @@ class Parser2GIS:
             
             # If using direct URL, we might be on a company page already
             if self.direct_url:
-                # Try to detect if this is a company page
                 try:
-                    title = self.get_element_text(pathes.title)
-                    if title:
-                        self.log(f"Detected company page: {title}")
-                        
-                        # Extract company details
-                        phone = ''
-                        try:
-                            phone_btn = self.wait_for_element(pathes.phone_btn, timeout=5)
-                            if phone_btn:
-                                phone_btn.click()
-                                sleep(1.0)
-                                phone = self.get_element_text(pathes.phone)
-                        except:
-                            pass
-                        
-                        address = self.get_element_text(pathes.address)
-                        link = unquote(self.driver.current_url)
-                        
-                        # Store basic data
-                        self.data['Название'].append(title)
-                        self.data['Телефон'].append(phone)
-                        self.data['Адрес'].append(address)
-                        self.data['Ссылка'].append(link)
-                        self.data['Широта'].append('')
-                        self.data['Долгота'].append('')
-                        
-                        # Scrape reviews if configured
-                        if self.scrape_reviews:
-                            self.log(f"Scraping reviews for {title}")
-                            reviews = self.scrape_reviews(place_name=title)
-                            if reviews:
-                                reviews_data = json.dumps(reviews, ensure_ascii=False)
-                                self.data['Отзывы'].append(reviews_data)
-                                self.log(f"Scraped {len(reviews)} reviews")
-                            else:
-                                self.data['Отзывы'].append('')
-                        
-                        # Skip search results processing
+                    record = self.scrape_place()
+                    if record:
+                        self.add_record(record)
                         self.log("Direct URL processing complete")
                         self.output_filename = self.save_data()
                         return
                 except Exception as e:
                     self.log(f"Error processing direct URL as company page: {e}", "warning")
-                        # Go back to results
-                    self.driver.back()
-                    sleep(1.0)
-                except Exception as e:
-                    self.log(f"Error processing direct URL as company page: {e}", "warning")
-                    
-                # Go to next page (if applicable)
-                page, pages = 0, 1  # Define default values for page and pages
-                while self.parsing_active and page < pages - 1:
-                    self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                    next_btn = self.wait_for_element(pathes.next_page_btn, timeout=5)
-                    if next_btn:
-                        next_btn.click()
-                        self.log(f"Moving to page {page+2}")
-                        sleep(2.0)  # Increased wait time for page to load
-                        page += 1
-                    else:
-                        self.log("Could not find next page button", "warning")
-                        break
+            
+            # Search results: records arrive while later pages are still being walked
+            for record in self.iter_places():
+                self.add_record(record)
+                self.set_status(f"Parsed {self.writer.place_count} places")
+            self.output_filename = self.save_data()
         
         except Exception as e:
             self.log(f"Error occurred: {e}", "error")
+            # Export what was streamed before the failure
+            self.output_filename = self.save_data()
 
         finally:
             if self.driver:
-                self.driver.quit()
+                self.close_browser()
                 self.log("Browser closed")
+            if self.writer:
+                self.writer.close()
 
             self.parsing_active = False
             self.reviews_active = False
@@ -585,8 +892,14 @@ class Parser2GIS:
             return True
         return False
     
-def sandbox():
-    """Sandbox environment for testing parser functionality and XPath expressions"""
+def sandbox(record_path=None, replay_path=None, chrome_port=None):
+    """
+    Sandbox environment for testing parser functionality and XPath expressions
+
+    With record_path every response is saved to that traffic archive; with replay_path the
+    pages are served from one instead of the network. With chrome_port the sandbox attaches
+    to the browser daemon listening there.
+    """
     print("=== 2GIS Parser Sandbox ===")
     print("This is a testing environment for parser functionality.")
     
@@ -605,13 +918,35 @@ def sandbox():
     print(f"Opening browser with URL: {test_url}")
     
     # Set up driver with visualizations enabled for testing
-    options = webdriver.ChromeOptions()
-    options.add_argument('--disable-extensions')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--no-sandbox')
-    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-    driver.set_window_size(1200, 800)
+    attached = bool(chrome_port and chrome_remote.debugger_version(chrome_port))
+    if chrome_port and not attached:
+        print(f"No browser answers on port {chrome_port}; launching Chrome")
+    if attached:
+        # Reuse the warm browser daemon; the sandbox gets its own tab
+        driver = chrome_remote.attach_driver(chrome_port)
+        driver.switch_to.new_window('tab')
+        print(f"Attached to browser on port {chrome_port}")
+    else:
+        options = webdriver.ChromeOptions()
+        options.add_argument('--disable-extensions')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--no-sandbox')
+        driver = webdriver.Chrome(service=Service(chrome_remote.resolve_chromedriver()), options=options)
+        driver.set_window_size(1200, 800)
+    install_page_helpers(driver)  # Network-idle tracking used when waiting for 'Load More'
+
+    archive = None
+    blocker = None
+    if record_path or replay_path:
+        from traffic_archive import TrafficArchive
+        archive = TrafficArchive(record_path or replay_path, 'record' if record_path else 'replay')
+        blocker = resource_blocker.ResourceBlocker(resource_blocker.debugger_address(driver), None, archive)
+        blocker.watch(driver.current_window_handle)
+        if replay_path:
+            print(f"Replaying {archive.count} recorded responses from {replay_path}")
+        else:
+            print(f"Recording responses to {record_path}")
     
     try:
         # Navigate to URL
@@ -718,7 +1053,7 @@ def sandbox():
                         print(f"Found reviews link with count: {reviews_count_text}")
                         reviews_link.click()
                         print("Navigated to reviews tab")
-                        sleep(1.5)
+                        wait_until(driver, ELEMENT_VISIBLE_JS, pathes.any_reviewer_name, timeout=10)
                         
                         # Extract expected review count from text (e.g. "123 отзыва")
                         import re
@@ -731,140 +1066,43 @@ def sandbox():
                         max_reviews = int(input(f"How many reviews to extract? (max available: {expected_reviews}, default: 10): ") or "10")
                         max_reviews = min(max_reviews, expected_reviews) if expected_reviews > 0 else max_reviews
                         
-                        # Track already processed reviews to avoid duplicates
-                        processed_reviews = set()
-                        all_reviews = []
-                        review_index = 1
+                        # Only reviews missing from earlier sandbox runs (they stop the paging once a run of them shows up)
+                        review_index = ReviewIndex()
+                        delta = None
+                        if input("Only reviews not saved by an earlier run? (y/n): ").lower() == 'y':
+                            delta = DeltaFilter(review_index, firm_key(driver.current_url))
                         
-                        # Set a maximum number of load more attempts to prevent infinite loops
-                        load_more_attempts = 0
-                        max_load_more_attempts = 15
+                        # The observer queues review nodes as they are inserted, so each drain only returns new reviews
+                        review_extractor.install_review_observer(driver)
+                        all_reviews = []
                         
-                        while len(all_reviews) < max_reviews and load_more_attempts < max_load_more_attempts:
-                            print(f"\nExtraction cycle {load_more_attempts + 1}")
-                            
-                            # Extract current batch of reviews
-                            new_reviews = []
-                            
-                            # Try a range of indices to find visible reviews
-                            for i in range(review_index, review_index + 50):
-                                try:
-                                    # First verify the reviewer name element exists
-                                    try:
-                                        reviewer_name_element = driver.find_element(By.XPATH, pathes.get_reviewer_name(i))
-                                    except NoSuchElementException:
-                                        continue  # Skip this index
-                                    
-                                    # Get reviewer name
-                                    reviewer_name = reviewer_name_element.text.strip()
-                                    if not reviewer_name:
-                                        continue
-                                    
-                                    # Create a unique identifier for this review to avoid duplicates
-                                    review_id = f"{reviewer_name}_{i}"
-                                    if review_id in processed_reviews:
-                                        continue
-                                        
-                                    print(f"Processing review at index {i} with reviewer: {reviewer_name}")
-                                    
-                                    # Get star rating
-                                    try:
-                                        stars_container = driver.find_element(By.XPATH, pathes.get_review_stars_container(i))
-
-                                        # Just count the spans to determine rating
-                                        spans = stars_container.find_elements(By.TAG_NAME, "span")
-                                        star_count = len(spans)
-
-                                        print(f"  Found {star_count} spans in stars container")
-
-                                        # Limit to 5 stars
-                                        if star_count > 5:
-                                            star_count = 5
-
-                                        stars_text = f"{star_count} stars"
-
-                                        # If no spans, try alternative approach
-                                        if star_count == 0:
-                                            star_count = driver.execute_script("""
-                                                const container = arguments[0];
-                                                const svgPaths = container.querySelectorAll('svg path');
-                                                let goldFillCount = 0;
-
-                                                for (const path of svgPaths) {
-                                                    const fill = path.getAttribute('fill');
-                                                    if (fill && (fill.includes('ffb') || fill.includes('FF') || fill.includes('gold'))) {
-                                                        goldFillCount++;
-                                                    }
-                                                }
-
-                                                return goldFillCount || 5;
-                                            """, stars_container)
-                                            stars_text = f"{star_count} stars (SVG method)"
-                                    except Exception as e:
-                                        print(f"  Error counting stars: {e}")
-                                        stars_text = "Unknown rating"
-                                    
-                                    # Get review text and check if we need to expand it
-                                    try:
-                                        review_text_element = driver.find_element(By.XPATH, pathes.get_review_text(i))
-                                        review_text = review_text_element.text.strip()
-                                        
-                                        # Check if text is truncated and needs expansion
-                                        # Look for read more button below this review
-                                        try:
-                                            read_more_elements = driver.find_elements(By.XPATH, f"//span[contains(@class, '_17ww69i')]")
-                                            for element in read_more_elements:
-                                                if element.is_displayed() and element.location['y'] > review_text_element.location['y'] and element.location['y'] < review_text_element.location['y'] + 200:
-                                                    print(f"  Expanding truncated review {i}...")
-                                                    element.click()
-                                                    sleep(0.5)
-                                                    # Get updated text after expanding
-                                                    review_text = driver.find_element(By.XPATH, pathes.get_review_text(i)).text.strip()
-                                                    break
-                                        except:
-                                            print(f"  Could not expand review text for review {i}")
-                                    except NoSuchElementException:
-                                        review_text = "[No review text found]"
-                                    
-                                    # Get likes count
-                                    likes = "0"
-                                    try:
-                                        likes_element = driver.find_element(By.XPATH, pathes.get_review_likes(i))
-                                        likes = likes_element.text.strip()
-                                        if not likes:
-                                            likes = "0"
-                                    except:
-                                        pass
-                                    
-                                    # Create review data
-                                    review_data = {
-                                        "reviewer_name": reviewer_name,
-                                        "rating": stars_text,
-                                        "text": review_text,
-                                        "likes": likes,
-                                        "index": i
-                                    }
-                                    # Add overall metrics to the first review only
-                                    if len(all_reviews) == 0 and len(new_reviews) == 0:
-                                        review_data["overall_rating"] = overall_rating
-                                        review_data["total_ratings"] = total_ratings
-
-                                    new_reviews.append(review_data)
-                                    processed_reviews.add(review_id)
-                                    
-                                except Exception as e:
-                                    print(f"Error extracting review at index {i}: {e}")
+                        # Page in what the target needs, then extract it in one batch (one page at a time with the delta)
+                        max_clicks = 1 if delta else None
+                        run_steps(driver, review_extractor.load_more_steps(driver, max_reviews, expected_reviews or None, max_clicks, on_log=print))
+                        read = 0  # Review nodes drained so far
+                        cycle = 0
+
+                        while len(all_reviews) < max_reviews:
+                            cycle += 1
+                            print(f"\nExtraction cycle {cycle}")
                             
+                            # Extract reviews inserted since the last cycle
+                            _, items = review_extractor.drain_new_reviews(driver)
+                            read += len(items)
+                            for item in items:
+                                print(f"Processing review at index {item['index']} with reviewer: {item['name']}")
+                            new_reviews = review_extractor.build_review_records(driver, items, on_error=lambda message: print(f"  {message}"))
+                            if delta and new_reviews:
+                                new_reviews = delta.filter(new_reviews)
+                            if new_reviews and not all_reviews:
+                                # Add overall metrics to the first review only
+                                new_reviews[0]["overall_rating"] = overall_rating
+                                new_reviews[0]["total_ratings"] = total_ratings
+
                             # Add new reviews to our collection
                             if new_reviews:
                                 all_reviews.extend(new_reviews)
                                 print(f"Extracted {len(new_reviews)} reviews in this batch, {len(all_reviews)} total")
-                                
-                                # Update the review index to start after the highest index we've processed
-                                if new_reviews:
-                                    highest_index = max(r["index"] for r in new_reviews)
-                                    review_index = highest_index + 1
-                                    print(f"Next review index will be {review_index}")
                             else:
                                 print("No new reviews found in current view")
                             
@@ -872,69 +1110,14 @@ def sandbox():
                             if len(all_reviews) >= max_reviews:
                                 print(f"Reached target of {max_reviews} reviews")
                                 break
+                            if delta and delta.reached_known:
+                                print(f"Reached reviews saved by an earlier run ({delta.skipped} known skipped)")
+                                break
                             
-                            # Try to find and click the "Load More" button
-                            try:
-                                # First try to find by class
-                                load_more_buttons = driver.find_elements(By.XPATH, "//button[contains(@class, '_kuel4no')]")
-                                
-                                if load_more_buttons and len(load_more_buttons) > 0 and load_more_buttons[0].is_displayed():
-                                    # Scroll to button
-                                    driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", load_more_buttons[0])
-                                    sleep(0.5)
-                                    
-                                    # Highlight button before clicking
-                                    driver.execute_script("arguments[0].style.border='3px solid red';", load_more_buttons[0])
-                                    sleep(0.5)
-                                    
-                                    # Click the button
-                                    load_more_buttons[0].click()
-                                    print("Clicked 'Load More' button")
-                                    load_more_attempts += 1
-                                    
-                                    # Wait for new reviews to load
-                                    sleep(2)
-                                else:
-                                    # Try alternative approach with button text
-                                    load_more_by_text = driver.execute_script("""
-                                        // Try to find any button that looks like "load more"
-                                        const buttons = Array.from(document.querySelectorAll('button'));
-                                        const loadMoreButton = buttons.find(btn => {
-                                            const text = btn.textContent.toLowerCase();
-                                            return text.includes('загрузить') || 
-                                                   text.includes('ещё') || 
-                                                   text.includes('еще') ||
-                                                   text.includes('показать');
-                                        });
-                                        
-                                        if (loadMoreButton) {
-                                            // Highlight the button we found
-                                            loadMoreButton.style.border = '3px solid red';
-                                            // Scroll it into view
-                                            loadMoreButton.scrollIntoView({behavior: 'smooth', block: 'center'});
-                                            // Click it
-                                            setTimeout(() => loadMoreButton.click(), 500);
-                                            return true;
-                                        }
-                                        return false;
-                                    """)
-                                    
-                                    if load_more_by_text:
-                                        print("'Load More' button clicked via JavaScript")
-                                        load_more_attempts += 1
-                                        sleep(2)
-                                    else:
-                                        print("No 'Load More' button found - all reviews may be loaded")
-                                        break
-                            except Exception as e:
-                                print(f"Error finding or clicking 'Load More' button: {e}")
-                                # Try scrolling to the bottom as a fallback
-                                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                                sleep(2)
-                                load_more_attempts += 1
-                                if load_more_attempts >= max_load_more_attempts:
-                                    print(f"Reached maximum load attempts ({max_load_more_attempts})")
-                                    break
+                            # Page in the rest
+                            if not run_steps(driver, review_extractor.load_more_steps(driver, read + max_reviews - len(all_reviews),
+                                                                                      expected_reviews or None, max_clicks, on_log=print)):
+                                break
                                 
                         # Display and save results
                         if all_reviews:
@@ -969,6 +1152,7 @@ def sandbox():
                                         'reviews': all_reviews,
                                         'extraction_date': datetime.now().isoformat()
                                     }, f, ensure_ascii=False, indent=2)
+                                review_index.add(firm_key(driver.current_url), all_reviews)
                                 
                                 print(f"Reviews saved to {filename}")
                         else:
@@ -1254,7 +1438,7 @@ def sandbox():
                     search_url = f"https://2gis.ru/almaty/search/{search_term}"
                     driver.get(search_url)
                     print(f"Navigated to search results for: {search_term}")
-                    sleep(2)
+                    wait_until(driver, ELEMENT_VISIBLE_JS, pathes.main_block, timeout=15)
                     
                     # Ask how many places to process from results
                     places_count = int(input("How many places to process from search results? (default: 5): ").strip() or "5")
@@ -1270,11 +1454,20 @@ def sandbox():
                             try:
                                 # Get place name for reference
                                 place_name = card.find_element(By.XPATH, ".//span[contains(@class, '_tvxwjf')]").text
-                                places_to_process.append({
-                                    "name": place_name,
-                                    "element": card,
-                                    "type": "element"
-                                })
+                                # Cards with a firm link are opened by URL, so they can be tracked for resume
+                                links = card.find_elements(By.XPATH, ".//a[contains(@href, '/firm/')]")
+                                if links:
+                                    places_to_process.append({
+                                        "name": place_name,
+                                        "url": links[0].get_attribute('href'),
+                                        "type": "url"
+                                    })
+                                else:
+                                    places_to_process.append({
+                                        "name": place_name,
+                                        "element": card,
+                                        "type": "element"
+                                    })
                                 print(f"Added place: {place_name}")
                             except Exception as e:
                                 print(f"Could not process card {i+1}: {e}")
@@ -1314,6 +1507,47 @@ def sandbox():
                 # All reviews combined for final output
                 all_places_reviews = []
                 
+                # The ledger remembers finished places (and their JSON files) and review progress
+                job = f"sandbox:{search_term if input_type == '1' else file_path}"
+                resume = input("Resume the previous run of this job? (y/n): ").lower() == 'y'
+                ledger = JobLedger(job, resume=resume)
+                if resume:
+                    for done_url, done_file in ledger.done_places():
+                        try:
+                            with open(done_file, 'r', encoding='utf-8') as f:
+                                all_places_reviews.append(json.load(f))
+                        except (OSError, TypeError, ValueError):
+                            print(f"Could not read back {done_file} for {done_url}")
+                    skipped = [place for place in places_to_process if place["type"] == "url" and ledger.is_done(place["url"])]
+                    places_to_process = [place for place in places_to_process if place not in skipped]
+                    print(f"Resuming: {len(all_places_reviews)} places read back, {len(skipped)} skipped")
+                
+                # Places loaded from a file can be spread over parallel headless browsers
+                url_places = [place for place in places_to_process if place["type"] == "url"]
+                workers = 1
+                if len(url_places) > 1:
+                    from worker_pool import BrowserWorkerPool, default_worker_count
+                    try:
+                        workers = int(input(f"Parallel browser workers (default: 1, suggested: {default_worker_count()}): ").strip() or "1")
+                    except ValueError:
+                        workers = 1
+                if workers > 1:
+                    pool = BrowserWorkerPool(workers=workers, scrape_reviews=True, max_reviews=max_reviews_per_place, ledger=ledger)
+                    for place_idx, record in enumerate(pool.run([place["url"] for place in url_places])):
+                        place_details = {
+                            "name": record['Название'],
+                            "url": record['Ссылка'],
+                            "reviews": record.get('Отзывы') or []
+                        }
+                        all_places_reviews.append(place_details)
+                        print(f"Collected {len(place_details['reviews'])} reviews for {place_details['name']}")
+                        
+                        place_filename = f"reviews_output/{timestamp}_{place_idx+1}_{place_details['name'].replace(' ', '_')[:30]}.json"
+                        with open(place_filename, 'w', encoding='utf-8') as f:
+                            json.dump(place_details, f, ensure_ascii=False, indent=2)
+                        ledger.mark_done(record['Ссылка'], place_filename)
+                    places_to_process = [place for place in places_to_process if place["type"] != "url"]
+                
                 # Process each place
                 for place_idx, place in enumerate(places_to_process):
                     print(f"\n[{place_idx+1}/{len(places_to_process)}] Processing place: {place['name']}")
@@ -1323,11 +1557,10 @@ def sandbox():
                         if place["type"] == "element":
                             # Click on the element to open place page
                             place["element"].click()
-                            sleep(2)
                         else:
                             # Navigate to URL
                             driver.get(place["url"])
-                            sleep(2)
+                        wait_until(driver, ELEMENT_VISIBLE_JS, pathes.title, timeout=10)
                         
                         # Try to get more accurate place name from page
                         try:
@@ -1352,7 +1585,7 @@ def sandbox():
                             print(f"Found reviews link with count: {reviews_count_text}")
                             reviews_link.click()
                             print("Navigated to reviews tab")
-                            sleep(1.5)
+                            wait_until(driver, ELEMENT_VISIBLE_JS, pathes.any_reviewer_name, timeout=10)
                             
                             # Get overall rating and total ratings count
                             try:
@@ -1381,167 +1614,48 @@ def sandbox():
                             print(f"Will attempt to extract up to {reviews_to_extract} reviews")
                             
                             # Extract reviews using the same logic as in option 3
-                            processed_reviews = set()
-                            reviews = []
-                            review_index = 1
-                            load_more_attempts = 0
-                            max_load_more_attempts = 20  # Increased for better coverage
+                            review_extractor.install_review_observer(driver)
+                            place_key = place.get("url") or driver.current_url
+                            reviews = ledger.partial_reviews(place_key)
+                            skip = len(reviews)  # Already collected by the run being resumed
+                            if skip:
+                                print(f"Resuming after {skip} saved reviews")
+                            # Page in what the target needs (saved reviews included), then extract it in one batch
+                            run_steps(driver, review_extractor.load_more_steps(driver, reviews_to_extract, expected_reviews or None,
+                                                                               on_log=lambda message: print(f"    {message}")))
+                            read = 0  # Review nodes drained so far, skipped ones included
+                            cycle = 0
                             
-                            while len(reviews) < reviews_to_extract and load_more_attempts < max_load_more_attempts:
-                                print(f"  Extraction cycle {load_more_attempts + 1}, {len(reviews)}/{reviews_to_extract} reviews so far")
-                                
-                                # Extract current batch of reviews
-                                new_reviews = []
+                            while len(reviews) < reviews_to_extract:
+                                cycle += 1
+                                print(f"  Extraction cycle {cycle}, {len(reviews)}/{reviews_to_extract} reviews so far")
                                 
-                                # Process reviews in the current view
-                                for i in range(review_index, review_index + 50):
-                                    if len(reviews) + len(new_reviews) >= reviews_to_extract:
-                                        break  # We have enough reviews
-                                        
-                                    try:
-                                        # Check if reviewer name element exists
-                                        try:
-                                            reviewer_name_element = driver.find_element(By.XPATH, pathes.get_reviewer_name(i))
-                                        except NoSuchElementException:
-                                            continue  # Skip this index
-                                        
-                                        # Get reviewer name
-                                        reviewer_name = reviewer_name_element.text.strip()
-                                        if not reviewer_name:
-                                            continue
-                                        
-                                        # Create unique ID to avoid duplicates
-                                        review_id = f"{reviewer_name}_{i}"
-                                        if review_id in processed_reviews:
-                                            continue
-                                            
-                                        print(f"    Processing review {i} by {reviewer_name}")
-                                        
-                                        # Extract star rating
-                                        try:
-                                            stars_container = driver.find_element(By.XPATH, pathes.get_review_stars_container(i))
-                                            star_count = pathes.count_stars_in_container(driver, stars_container)
-                                            stars_text = f"{star_count} stars"
-                                        except Exception as e:
-                                            print(f"    Error counting stars: {e}")
-                                            stars_text = "Unknown rating"
-                                        
-                                        # Extract review text and expand if needed
-                                        try:
-                                            review_text_element = driver.find_element(By.XPATH, pathes.get_review_text(i))
-                                            review_text = review_text_element.text.strip()
-                                            
-                                            # Check for truncated text
-                                            if "..." in review_text or "еще" in review_text.lower() or "целиком" in review_text.lower():
-                                                try:
-                                                    # Find and click "read more" if available
-                                                    read_more_elements = driver.find_elements(By.XPATH, "//span[contains(@class, '_17ww69i')]")
-                                                    for element in read_more_elements:
-                                                        if element.is_displayed() and element.location['y'] > review_text_element.location['y'] and element.location['y'] < review_text_element.location['y'] + 200:
-                                                            element.click()
-                                                            sleep(0.5)
-                                                            # Get updated text
-                                                            review_text = driver.find_element(By.XPATH, pathes.get_review_text(i)).text.strip()
-                                                            break
-                                                except:
-                                                    print(f"    Could not expand truncated text")
-                                        except:
-                                            review_text = "[No review text found]"
-                                            
-                                        # Get likes count
-                                        likes = "0"
-                                        try:
-                                            likes_element = driver.find_element(By.XPATH, pathes.get_review_likes(i))
-                                            likes = likes_element.text.strip()
-                                            if not likes:
-                                                likes = "0"
-                                        except:
-                                            pass
-                                            
-                                        # Create review data object
-                                        review_data = {
-                                            "reviewer_name": reviewer_name,
-                                            "rating": stars_text,
-                                            "text": review_text,
-                                            "likes": likes,
-                                            "index": i
-                                        }
-                                        
-                                        new_reviews.append(review_data)
-                                        processed_reviews.add(review_id)
-                                        
-                                    except Exception as e:
-                                        print(f"    Error processing review {i}: {e}")
+                                # Extract reviews inserted since the last cycle
+                                _, items = review_extractor.drain_new_reviews(driver)
+                                read += len(items)
+                                if skip:
+                                    items, skip = items[skip:], max(0, skip - len(items))
+                                items = items[:reviews_to_extract - len(reviews)]
+                                for item in items:
+                                    print(f"    Processing review {item['index']} by {item['name']}")
+                                new_reviews = review_extractor.build_review_records(driver, items, on_error=lambda message: print(f"    {message}"))
                                 
                                 # Add new reviews to our collection
                                 if new_reviews:
                                     reviews.extend(new_reviews)
+                                    ledger.save_progress(place_key, reviews)
                                     print(f"    Added {len(new_reviews)} reviews, total: {len(reviews)}/{reviews_to_extract}")
-                                    
-                                    # Update index for next batch
-                                    if new_reviews:
-                                        highest_index = max(r["index"] for r in new_reviews)
-                                        review_index = highest_index + 1
                                 
                                 # Check if we have enough reviews
                                 if len(reviews) >= reviews_to_extract:
                                     print(f"    Reached target of {reviews_to_extract} reviews")
                                     break
                                     
-                                # Try to click "Load More" if needed
-                                try:
-                                    # Try to find the button by class or text
-                                    load_more_clicked = False
-                                    
-                                    # Method 1: Try by class
-                                    load_more_buttons = driver.find_elements(By.XPATH, "//button[contains(@class, '_kuel4no')]")
-                                    if load_more_buttons and len(load_more_buttons) > 0 and load_more_buttons[0].is_displayed():
-                                        driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", load_more_buttons[0])
-                                        sleep(0.5)
-                                        load_more_buttons[0].click()
-                                        load_more_clicked = True
-                                    
-                                    # Method 2: Try by text content
-                                    if not load_more_clicked:
-                                        load_more_by_text = driver.execute_script("""
-                                            const buttons = Array.from(document.querySelectorAll('button'));
-                                            const loadMoreBtn = buttons.find(btn => {
-                                                const text = btn.textContent.toLowerCase();
-                                                return text.includes('загрузить') || 
-                                                       text.includes('ещё') || 
-                                                       text.includes('еще') ||
-                                                       text.includes('показать');
-                                            });
-                                            
-                                            if (loadMoreBtn) {
-                                                loadMoreBtn.scrollIntoView({behavior: 'smooth', block: 'center'});
-                                                setTimeout(() => loadMoreBtn.click(), 500);
-                                                return true;
-                                            }
-                                            return false;
-                                        """)
-                                        
-                                        if load_more_by_text:
-                                            load_more_clicked = True
-                                    
-                                    if load_more_clicked:
-                                        print("    Clicked 'Load More' button")
-                                        load_more_attempts += 1
-                                        sleep(2)  # Wait for new reviews to load
-                                    else:
-                                        print("    No 'Load More' button found - all reviews may be loaded")
-                                        break
-                                        
-                                except Exception as e:
-                                    print(f"    Error clicking 'Load More': {e}")
-                                    # Try scrolling to bottom as fallback
-                                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                                    sleep(1)
-                                    load_more_attempts += 1
-                                    
-                                    if load_more_attempts >= max_load_more_attempts:
-                                        print(f"    Reached maximum load attempts ({max_load_more_attempts})")
-                                        break
+                                # Page in the rest
+                                if not run_steps(driver, review_extractor.load_more_steps(driver, read + skip + reviews_to_extract - len(reviews),
+                                                                                          expected_reviews or None,
+                                                                                          on_log=lambda message: print(f"    {message}"))):
+                                    break
                             
                             # Store collected reviews
                             place_details["reviews"] = reviews
@@ -1553,6 +1667,7 @@ def sandbox():
                             place_filename = f"reviews_output/{timestamp}_{place_idx+1}_{place['name'].replace(' ', '_')[:30]}.json"
                             with open(place_filename, 'w', encoding='utf-8') as f:
                                 json.dump(place_details, f, ensure_ascii=False, indent=2)
+                            ledger.mark_done(place_key, place_filename)
                                 
                             print(f"Saved reviews to {place_filename}")
                             
@@ -1561,8 +1676,11 @@ def sandbox():
                         
                         # Navigate back to search results if we're processing elements
                         if place["type"] == "element" and place_idx < len(places_to_process) - 1:
+                            previous_url = driver.current_url
                             driver.back()
-                            sleep(2)  # Wait for search results to reload
+                            # Wait for the search results to come back
+                            wait_until(driver, LOCATION_CHANGED_JS, previous_url, timeout=5)
+                            wait_until(driver, ELEMENT_VISIBLE_JS, pathes.main_block, timeout=10)
                             
                             # Re-extract place cards if needed
                             if place_idx < len(places_to_process) - 1 and places_to_process[place_idx+1]["type"] == "element":
@@ -1593,7 +1711,7 @@ def sandbox():
                         excel_filename = f"reviews_output/{timestamp}_all_reviews.xlsx"
                         
                         try:
-                            # Create a pandas DataFrame for all reviews
+                            # One flat row per review, with its place's details
                             all_reviews_flat = []
                             for place in all_places_reviews:
                                 place_name = place["name"]
@@ -1613,10 +1731,12 @@ def sandbox():
                                         "likes": review.get("likes", "0")
                                     })
                             
-                            # Create DataFrame and save to Excel
-                            import pandas as pd
-                            df = pd.DataFrame(all_reviews_flat)
-                            df.to_excel(excel_filename, index=False)
+                            # Stream the rows into a write-only workbook, splitting past Excel's row limit
+                            from openpyxl import Workbook
+                            workbook = Workbook(write_only=True)
+                            exporters.write_sheets(workbook, 'Reviews', list(all_reviews_flat[0]) if all_reviews_flat else [],
+                                                   all_reviews_flat)
+                            workbook.save(excel_filename)
                             
                             print(f"Reviews exported to Excel: {excel_filename}")
                         except Exception as e:
@@ -1632,8 +1752,13 @@ def sandbox():
         print(f"Sandbox error: {e}")
     
     finally:
+        if blocker:
+            blocker.close()
+            archive.close()
         # Always close the browser
         if input("Close browser? (y/n): ").lower() != 'n':
+            if attached:
+                driver.close()  # Only the sandbox tab; the daemon keeps running
             driver.quit()
             print("Browser closed")
         else:
@@ -1,13 +1,23 @@
+from selenium.webdriver.common.by import By
+
 # Common prefix for most XPaths
 COMMON_PREFIX = '/html/body/div[2]/div/div/div[1]/div[1]/div[3]/div[2]/div/div/div/div/div[2]/div[2]/div/div[1]/div/div/div/div/div[2]'
 TITLE_PREFIX = '/html/body/div[2]/div/div/div[1]/div[1]/div[3]/div[2]/div/div/div/div/div[2]/div[2]/div/div[1]/div/div/div/div/div[1]'
 
 
+# Paths inside a single review node (relative to a child of reviews_main_block)
+REVIEW_STARS_REL = 'div[1]/div/div[2]/div/div[1]'
+REVIEWER_NAME_REL = 'div[1]/div/div[1]/div[2]/span/span[1]/span'
+REVIEW_TEXT_REL = 'div[4]/div[1]/a'
+REVIEW_LIKES_REL = 'div[4]/div[2]/div/div[1]/button/div[3]'
+REVIEW_DATE_REL = 'div[1]/div/div[1]/div[2]/div'  # '5 июня 2023, отредактирован' under the reviewer name
+READ_MORE_CLASS = '_17ww69i'
+
 # Base paths with replaceable div index pattern
-BASE_REVIEW_STARS_PATH = f'{COMMON_PREFIX}/div[2]/div[{{index}}]/div[1]/div/div[2]/div/div[1]'
-BASE_REVIEWER_NAME_PATH = f'{COMMON_PREFIX}/div[2]/div[{{index}}]/div[1]/div/div[1]/div[2]/span/span[1]/span'
-BASE_REVIEW_TEXT_PATH = f'{COMMON_PREFIX}/div[2]/div[{{index}}]/div[4]/div[1]/a'
-BASE_REVIEW_LIKES_PATH = f'{COMMON_PREFIX}/div[2]/div[{{index}}]/div[4]/div[2]/div/div[1]/button/div[3]'
+BASE_REVIEW_STARS_PATH = f'{COMMON_PREFIX}/div[2]/div[{{index}}]/{REVIEW_STARS_REL}'
+BASE_REVIEWER_NAME_PATH = f'{COMMON_PREFIX}/div[2]/div[{{index}}]/{REVIEWER_NAME_REL}'
+BASE_REVIEW_TEXT_PATH = f'{COMMON_PREFIX}/div[2]/div[{{index}}]/{REVIEW_TEXT_REL}'
+BASE_REVIEW_LIKES_PATH = f'{COMMON_PREFIX}/div[2]/div[{{index}}]/{REVIEW_LIKES_REL}'
 
 # /html/body/div[2]/div/div/div[1]/div[1]/div[3]/div[2]/div/div/div/div/div[2]/div[2]/div/div[1]/div/div/div/div/div[2]/div[2]/div[4]
 # /html/body/div[2]/div/div/div[1]/div[1]/div[3]/div[2]/div/div/div/div/div[2]/div[2]/div/div[1]/div/div/div/div/div[2]/div[2]/div[4]
@@ -27,6 +37,7 @@ reviews_count = f'{COMMON_PREFIX}/div[1]/div[2]/div/div/div[1]/div[3]/h2/a/span'
 #/html/body/div[2]/div/div/div[1]/div[1]/div[3]/div[2]/div/div/div/div/div[2]/div[2]/div/div[1]/div/div/div/div/div[2]/div[1]/div[2]/div/div/div[1]/div[3]/h2/a/span path for review count
 detail_main_block = '/html/body/div[2]/div/div/div[1]/div[1]/div[3]/div[2]/div/div/div/div/div[2]/div[2]/div/div[1]/div/div/div/div'
 reviews_main_block = '/html/body/div[2]/div/div/div[1]/div[1]/div[3]/div[2]/div/div/div/div/div[2]/div[2]/div/div[1]/div/div/div/div/div[2]/div[2]'
+any_reviewer_name = f'{reviews_main_block}/div/{REVIEWER_NAME_REL}'
 reviews_total_rating_count = '/html/body/div[2]/div/div/div[1]/div[1]/div[3]/div[2]/div/div/div/div/div[2]/div[2]/div/div[1]/div/div/div/div/div[2]/div[2]/div[2]/div[1]/div[2]'
 review_overall_rating = '/html/body/div[2]/div/div/div[1]/div[1]/div[3]/div[2]/div/div/div/div/div[2]/div[2]/div/div[1]/div/div/div/div/div[2]/div[2]/div[2]/div[1]/div[1]'
 
@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import time
+import bisect
+import logging
+import datetime
+import itertools
+import threading
+from collections import Counter
+
+# Upper bounds of the latency histogram buckets in milliseconds; the last bucket is open-ended
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Driver and element properties that are WebDriver commands rather than cached values
+COMMAND_PROPERTIES = ('text', 'tag_name', 'size', 'location', 'rect', 'current_url', 'current_window_handle',
+                      'window_handles', 'title', 'page_source')
+
+PROFILE_DIR = os.path.join('logs', 'profile')
+
+# The profiler of the current thread; profiled_sleep() reports to it
+ACTIVE = threading.local()
+
+RUN_IDS = itertools.count(1)  # Tells apart the reports of worker threads started in the same second
+
+
+def call_site():
+    """file:line function of the first caller outside this module and selenium"""
+    frame = sys._getframe(2)
+    while frame and (frame.f_code.co_filename == __file__ or f'{os.sep}selenium{os.sep}' in frame.f_code.co_filename):
+        frame = frame.f_back
+    if frame is None:
+        return '?'
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+def new_entry():
+    return {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'histogram': [0] * (len(BUCKETS_MS) + 1), 'errors': Counter()}
+
+
+class CommandStats:
+    """Latency histograms and error counts keyed by 'call site -> command'"""
+
+    def __init__(self):
+        self.entries = {}
+        self.sleep_ms = Counter()  # call site -> milliseconds slept
+        self.started = time.monotonic()
+
+    def add(self, key, elapsed_ms, error=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = new_entry()
+        entry['count'] += 1
+        entry['total_ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+        entry['histogram'][bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+        if error is not None:
+            entry['errors'][type(error).__name__] += 1
+
+    def report(self):
+        """JSON-ready report, call sites sorted by total time"""
+        commands = sorted(self.entries.items(), key=lambda item: item[1]['total_ms'], reverse=True)
+        return {
+            'wall_ms': round((time.monotonic() - self.started) * 1000, 1),
+            'commands': sum(entry['count'] for entry in self.entries.values()),
+            'command_ms': round(sum(entry['total_ms'] for entry in self.entries.values()), 1),
+            'errors': sum(sum(entry['errors'].values()) for entry in self.entries.values()),
+            'sleep_ms': round(sum(self.sleep_ms.values()), 1),
+            'buckets_ms': list(BUCKETS_MS),
+            'call_sites': [dict(site=key, count=entry['count'], total_ms=round(entry['total_ms'], 1),
+                                mean_ms=round(entry['total_ms'] / entry['count'], 2), max_ms=round(entry['max_ms'], 1),
+                                histogram=entry['histogram'], errors=dict(entry['errors']))
+                           for key, entry in commands],
+            'sleeps': [dict(site=site, total_ms=round(ms, 1)) for site, ms in self.sleep_ms.most_common()],
+        }
+
+
+class DriverProfiler:
+    """
+    Count every WebDriver command by call site
+
+    wrap() returns a proxy of the driver whose methods, and those of the elements they return,
+    are timed. Exceptions are counted before they propagate, so the ones later swallowed by bare
+    except blocks still show up. Stats are kept per place (end_place) and per run (end_run).
+    """
+
+    def __init__(self, on_log=None, report_dir=PROFILE_DIR):
+        self.on_log = on_log
+        self.report_dir = report_dir
+        self.place = CommandStats()
+        self.run = CommandStats()
+        self.run_started = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{next(RUN_IDS)}"
+
+    def log(self, message, level='info'):
+        getattr(logging, level if level in ('info', 'warning', 'error') else 'info')(message)
+        if self.on_log:
+            self.on_log(message, level)
+
+    def wrap(self, driver):
+        """Profile driver; profiled_sleep() calls in this thread are counted too"""
+        ACTIVE.profiler = self
+        return ProfiledObject(driver, self)
+
+    def record(self, command, site, elapsed_ms, error=None):
+        key = f"{site} -> {command}"
+        self.place.add(key, elapsed_ms, error)
+        self.run.add(key, elapsed_ms, error)
+
+    def record_sleep(self, site, seconds):
+        self.place.sleep_ms[site] += seconds * 1000
+        self.run.sleep_ms[site] += seconds * 1000
+
+    def summary(self, report, top=5):
+        """One log line: totals and the slowest call sites"""
+        hot = ', '.join(f"{site['site']} {site['total_ms']:.0f}ms/{site['count']}" for site in report['call_sites'][:top])
+        return (f"{report['commands']} commands in {report['command_ms']:.0f}ms, {report['errors']} errors, "
+                f"slept {report['sleep_ms']:.0f}ms of {report['wall_ms']:.0f}ms; hottest: {hot}")
+
+    def end_place(self, place_name):
+        """Append the report of the place just finished to places_<run>.jsonl and start a new one"""
+        report = self.place.report()
+        report['place'] = place_name
+        self.place = CommandStats()
+        self.log(f"Profile of {place_name}: {self.summary(report, top=3)}")
+        try:
+            os.makedirs(self.report_dir, exist_ok=True)
+            with open(os.path.join(self.report_dir, f"places_{self.run_started}.jsonl"), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(report, ensure_ascii=False) + '\n')
+        except OSError as e:
+            self.log(f"Could not write place profile: {e}", "warning")
+        return report
+
+    def end_run(self):
+        """Write the report of the whole run to run_<run>.json; returns its path"""
+        report = self.run.report()
+        self.log(f"Run profile: {self.summary(report)}")
+        path = os.path.join(self.report_dir, f"run_{self.run_started}.json")
+        try:
+            os.makedirs(self.report_dir, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            self.log(f"Could not write run profile: {e}", "warning")
+            return None
+        if getattr(ACTIVE, 'profiler', None) is self:
+            ACTIVE.profiler = None
+        return path
+
+
+def unwrap(value):
+    """The real driver/element behind a proxy, also inside argument lists"""
+    if isinstance(value, ProfiledObject):
+        return value._target
+    if isinstance(value, (list, tuple)):
+        return type(value)(unwrap(item) for item in value)
+    return value
+
+
+def wrap_result(value, profiler):
+    """Elements returned by a command are profiled too"""
+    if hasattr(value, 'find_element') and not isinstance(value, ProfiledObject):
+        return ProfiledObject(value, profiler)
+    if isinstance(value, list) and value and hasattr(value[0], 'find_element'):
+        return [ProfiledObject(item, profiler) for item in value]
+    return value
+
+
+class ProfiledObject:
+    """Timing proxy of a WebDriver or WebElement"""
+
+    def __init__(self, target, profiler):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_profiler', profiler)
+
+    def __getattr__(self, name):
+        target = self._target
+        if name in COMMAND_PROPERTIES:
+            return self._timed(name, lambda: getattr(target, name))
+        attribute = getattr(target, name)
+        if not callable(attribute) or name.startswith('_'):
+            return attribute
+
+        def command(*args, **kwargs):
+            return self._timed(name, lambda: attribute(*unwrap(args), **{k: unwrap(v) for k, v in kwargs.items()}))
+        return command
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def __eq__(self, other):
+        return self._target == unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def _timed(self, name, call):
+        site = call_site()
+        started = time.perf_counter()
+        try:
+            result = call()
+        except Exception as e:
+            self._profiler.record(name, site, (time.perf_counter() - started) * 1000, e)
+            raise
+        self._profiler.record(name, site, (time.perf_counter() - started) * 1000)
+        return wrap_result(result, self._profiler)
+
+
+def profiled_sleep(seconds):
+    """time.sleep that reports to the profiler of the current thread, if any"""
+    profiler = getattr(ACTIVE, 'profiler', None)
+    if profiler is not None:
+        profiler.record_sleep(call_site(), seconds)
+    time.sleep(seconds)
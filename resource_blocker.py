@@ -0,0 +1,220 @@
+import json
+import logging
+import itertools
+import threading
+from collections import Counter
+from urllib.request import urlopen
+import websocket
+
+# Resource types the extraction needs: the SPA document, its scripts and the API calls they make
+DEFAULT_ALLOWED_TYPES = ('Document', 'Script', 'XHR', 'Fetch', 'Preflight', 'Other')
+
+# 'full' loads everything (only byte accounting), 'lean' aborts every type outside the allow-list
+PROFILES = {
+    'full': None,
+    'lean': DEFAULT_ALLOWED_TYPES,
+}
+
+
+def debugger_address(driver):
+    """Return the host:port of the DevTools endpoint behind a Chrome WebDriver session"""
+    return (driver.capabilities.get('goog:chromeOptions') or {}).get('debuggerAddress')
+
+
+def target_id(handle):
+    """Window handles are DevTools target ids (older chromedrivers prefix them with CDwindow-)"""
+    return handle.replace('CDwindow-', '')
+
+
+class ResourceBlocker:
+    """
+    Second DevTools connection to the browser that aborts unneeded requests and counts page weight
+
+    chromedriver's execute_cdp_cmd cannot receive events, so Fetch.requestPaused is handled here
+    over the browser websocket. Each watched tab gets its own flattened session and counters.
+    With a traffic_archive.TrafficArchive every response is recorded to it ('record') or every
+    request is answered from it without touching the network ('replay').
+    """
+
+    def __init__(self, address, allowed_types=DEFAULT_ALLOWED_TYPES, archive=None):
+        self.allowed_types = set(allowed_types) if allowed_types is not None else None
+        self.archive = archive
+        with urlopen(f'http://{address}/json/version', timeout=5) as response:
+            ws_url = json.loads(response.read().decode('utf-8'))['webSocketDebuggerUrl']
+        self.ws = websocket.create_connection(ws_url, enable_multithread=True, suppress_origin=True)
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.sessions = {}  # window handle -> session id
+        self.stats = {}  # session id -> counters
+        self.request_types = {}  # (session id, network request id) -> resource type
+        self.lock = threading.Lock()
+        self.active = True
+        self.reader = threading.Thread(target=self.read_loop, daemon=True)
+        self.reader.start()
+
+    @staticmethod
+    def new_stats():
+        return {'requests': Counter(), 'bytes': Counter(), 'blocked': Counter(), 'replay': Counter()}
+
+    def send(self, method, params=None, session_id=None, callback=None):
+        """Send a command without waiting for its reply; callback, if any, gets the reply on the reader thread"""
+        message_id = next(self.ids)
+        if callback:
+            self.pending[message_id] = callback
+        message = {'id': message_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        self.ws.send(json.dumps(message))
+        return message_id
+
+    def call(self, method, params=None, session_id=None, timeout=10):
+        """Send a command and wait for its result"""
+        done = threading.Event()
+        reply = {}
+        message_id = next(self.ids)
+        self.pending[message_id] = (done, reply)
+        message = {'id': message_id, 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        self.ws.send(json.dumps(message))
+        if not done.wait(timeout):
+            self.pending.pop(message_id, None)
+            raise TimeoutError(f"No reply to {method}")
+        if 'error' in reply:
+            raise RuntimeError(f"{method} failed: {reply['error'].get('message')}")
+        return reply.get('result', {})
+
+    def read_loop(self):
+        while self.active:
+            try:
+                message = json.loads(self.ws.recv())
+            except Exception:
+                break  # Connection closed
+            if 'id' in message:
+                waiter = self.pending.pop(message['id'], None)
+                if callable(waiter):
+                    try:
+                        waiter(message)
+                    except Exception as e:
+                        logging.warning(f"Resource blocker failed on a reply: {e}")
+                    continue
+                done, reply = waiter or (None, None)
+                if done:
+                    reply.update(message)
+                    done.set()
+                continue
+            try:
+                self.handle_event(message.get('method'), message.get('params', {}), message.get('sessionId'))
+            except Exception as e:
+                logging.warning(f"Resource blocker failed on {message.get('method')}: {e}")
+
+    def handle_event(self, method, params, session_id):
+        stats = self.stats.get(session_id)
+        if stats is None:
+            return
+        if method == 'Fetch.requestPaused':
+            if 'responseStatusCode' in params or 'responseErrorReason' in params:
+                self.record_response(params, session_id)
+                return
+            resource_type = params.get('resourceType', 'Other')
+            if self.allowed_types is not None and resource_type not in self.allowed_types:
+                with self.lock:
+                    stats['blocked'][resource_type] += 1
+                self.send('Fetch.failRequest', {'requestId': params['requestId'], 'errorReason': 'BlockedByClient'}, session_id)
+            elif self.archive and self.archive.mode == 'replay':
+                self.replay_request(params, session_id, stats)
+            else:
+                self.send('Fetch.continueRequest', {'requestId': params['requestId']}, session_id)
+        elif method == 'Network.requestWillBeSent':
+            self.request_types[(session_id, params['requestId'])] = params.get('type', 'Other')
+        elif method == 'Network.loadingFinished':
+            resource_type = self.request_types.pop((session_id, params['requestId']), 'Other')
+            with self.lock:
+                stats['requests'][resource_type] += 1
+                stats['bytes'][resource_type] += int(params.get('encodedDataLength', 0))
+        elif method == 'Network.loadingFailed':
+            self.request_types.pop((session_id, params['requestId']), None)
+
+    def record_response(self, params, session_id):
+        """Response stage of a recorded request: store the response, then let it through"""
+        request_id = params['requestId']
+        status = params.get('responseStatusCode')
+        if status is None or not self.archive:
+            self.send('Fetch.continueRequest', {'requestId': request_id}, session_id)
+            return
+
+        def store(reply):
+            try:
+                result = reply.get('result') or {}  # Redirects and empty responses have no body
+                request = params['request']
+                self.archive.add(request['method'], request['url'], request.get('postData'), status,
+                                 params.get('responseStatusText', ''), params.get('responseHeaders') or [],
+                                 result.get('body', ''), result.get('base64Encoded', False))
+            finally:
+                self.send('Fetch.continueRequest', {'requestId': request_id}, session_id)
+
+        self.send('Fetch.getResponseBody', {'requestId': request_id}, session_id, callback=store)
+
+    def replay_request(self, params, session_id, stats):
+        """Answer a request from the archive, or fail it as offline if it was never recorded"""
+        request = params['request']
+        entry = self.archive.lookup(request['method'], request['url'], request.get('postData'))
+        with self.lock:
+            stats['replay']['hit' if entry else 'miss'] += 1
+        if entry is None:
+            logging.debug(f"Not in the traffic archive: {request['method']} {request['url']}")
+            self.send('Fetch.failRequest', {'requestId': params['requestId'], 'errorReason': 'InternetDisconnected'}, session_id)
+            return
+        self.send('Fetch.fulfillRequest', dict(self.archive.fulfill_params(entry), requestId=params['requestId']), session_id)
+
+    def watch(self, handle):
+        """Start blocking and counting for a tab, given its WebDriver window handle"""
+        if handle in self.sessions:
+            return
+        session_id = self.call('Target.attachToTarget', {'targetId': target_id(handle), 'flatten': True})['sessionId']
+        self.stats[session_id] = self.new_stats()
+        self.sessions[handle] = session_id
+        self.call('Network.enable', {}, session_id)
+        patterns = []
+        if self.allowed_types is not None or (self.archive and self.archive.mode == 'replay'):
+            patterns.append({'urlPattern': '*', 'requestStage': 'Request'})
+        if self.archive and self.archive.mode == 'record':
+            patterns.append({'urlPattern': '*', 'requestStage': 'Response'})
+        if patterns:
+            self.call('Fetch.enable', {'patterns': patterns}, session_id)
+
+    def take_report(self, handle):
+        """
+        Return and reset the counters of a tab
+
+        Returns:
+            dict: requests, bytes and blocked totals plus per-type breakdowns, or None if the tab is not watched
+        """
+        session_id = self.sessions.get(handle)
+        if session_id is None:
+            return None
+        with self.lock:
+            stats, self.stats[session_id] = self.stats[session_id], self.new_stats()
+        return {
+            'requests': sum(stats['requests'].values()),
+            'bytes': sum(stats['bytes'].values()),
+            'blocked': sum(stats['blocked'].values()),
+            'bytes_by_type': dict(stats['bytes']),
+            'blocked_by_type': dict(stats['blocked']),
+            'replayed': stats['replay']['hit'],
+            'replay_misses': stats['replay']['miss'],
+        }
+
+    def close(self):
+        """Release paused requests and close the connection"""
+        for session_id in self.sessions.values():
+            try:
+                if self.allowed_types is not None or self.archive:
+                    self.send('Fetch.disable', {}, session_id)
+            except Exception:
+                pass
+        self.active = False
+        try:
+            self.ws.close()
+        except Exception:
+            pass
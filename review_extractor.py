@@ -0,0 +1,428 @@
+import re
+import sys
+from datetime import date, timedelta
+import pathes
+from selector_registry import SelectorRegistry
+from waits import Wait, wait_until, NETWORK_SETTLED_HELPER_JS, NETWORK_IDLE_MS
+
+REVIEWS_PAGE_SIZE = 50  # Reviews added by one 'Load More' click on 2gis.ru
+
+# Relative paths passed into the in-page scripts
+REVIEW_PATHS = {
+    'name': pathes.REVIEWER_NAME_REL,
+    'stars': pathes.REVIEW_STARS_REL,
+    'text': pathes.REVIEW_TEXT_REL,
+    'likes': pathes.REVIEW_LIKES_REL,
+    'date': pathes.REVIEW_DATE_REL,
+    'read_more': pathes.READ_MORE_CLASS,
+}
+
+# Shared helpers for every in-page review script.
+# Indexes are 1-based positions among the div children of reviews_main_block,
+# the same numbering as div[{index}] in pathes.py.
+# track() counts hits and misses per selector for SelectorRegistry.sync_page_stats().
+REVIEW_HELPERS_JS = """
+    const paths = arguments[0];
+    const selectorStats = window.__p2gSelectorStats = window.__p2gSelectorStats || {};
+    function track(name, found) {
+        const stats = selectorStats[name] || (selectorStats[name] = {hit: 0, miss: 0});
+        if (found) stats.hit++; else stats.miss++;
+        return found;
+    }
+    function first(node, xpath) {
+        return document.evaluate(xpath, node, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    }
+    function reviewNodes(container) {
+        return Array.from(container.children).filter(child => child.tagName === 'DIV');
+    }
+    function extractReview(node, index) {
+        const nameNode = track('name', first(node, paths.name));
+        if (!nameNode) return null;
+        const name = nameNode.innerText.trim();
+        if (!name) return null;
+
+        const starsNode = track('stars', first(node, paths.stars));
+        const stars = starsNode ? Math.min(starsNode.querySelectorAll('span').length, 5) : null;
+
+        const textNode = track('text', first(node, paths.text));
+        const text = textNode ? textNode.innerText.trim() : null;
+        const lowered = (text || '').toLowerCase();
+        const truncated = !!node.querySelector(`span[class*='${paths.read_more}']`) ||
+            (text || '').includes('...') || lowered.includes('еще') || lowered.includes('целиком');
+
+        const likesNode = track('likes', first(node, paths.likes));
+        const likes = likesNode ? likesNode.innerText.trim() : '';
+
+        const dateNode = track('date', first(node, paths.date));
+        const date = dateNode ? dateNode.innerText.trim() : '';
+
+        return {index: index, name: name, stars: stars, text: text, likes: likes, date: date, truncated: truncated};
+    }
+"""
+
+# Div indexes from arguments[2] onwards whose node holds a reviewer name, i.e. the real reviews
+# without the rating summary, headers or the 'Load More' wrapper. Reviews emptied by
+# PRUNE_REVIEWS_JS still count.
+PROBE_REVIEW_INDEXES_JS = REVIEW_HELPERS_JS + """
+    const container = track('container', first(document, arguments[1]));
+    if (!container) return [];
+    const startIndex = arguments[2] || 1;
+    const indexes = [];
+    reviewNodes(container).forEach((node, i) => {
+        if (i + 1 >= startIndex && (node.dataset.p2gPruned || first(node, paths.name))) indexes.push(i + 1);
+    });
+    return indexes;
+"""
+
+# Empties the review nodes before the div index arguments[2] so the page stops holding their subtrees.
+# The nodes themselves stay as empty placeholders, so div indexes, child counts and the position of
+# the 'Load More' button are unchanged. Returns the number of nodes emptied.
+PRUNE_REVIEWS_JS = REVIEW_HELPERS_JS + """
+    const container = first(document, arguments[1]);
+    if (!container) return 0;
+    let pruned = 0;
+    reviewNodes(container).slice(0, arguments[2] - 1).forEach(node => {
+        if (node.dataset.p2gPruned || !first(node, paths.name)) return;
+        node.replaceChildren();
+        node.dataset.p2gPruned = '1';
+        pruned++;
+    });
+    return pruned;
+"""
+
+# Installs a MutationObserver on reviews_main_block that queues review nodes as they are inserted.
+# The queue is seeded with the nodes already rendered so the first drain returns them too.
+INSTALL_REVIEW_OBSERVER_JS = REVIEW_HELPERS_JS + """
+    const container = track('container', first(document, arguments[1]));
+    if (!container) return -1;
+    const existing = window.__p2gReviewCursor;
+    if (existing && existing.container === container) return existing.queue.length;
+    if (existing) existing.observer.disconnect();
+
+    const seen = existing ? existing.seen : new WeakSet();
+    const state = {container: container, queue: reviewNodes(container).filter(node => !seen.has(node)), seen: seen};
+    state.observer = new MutationObserver(mutations => {
+        for (const mutation of mutations) {
+            for (const node of mutation.addedNodes) {
+                if (node.nodeType === 1 && node.tagName === 'DIV' && node.parentNode === container) {
+                    state.queue.push(node);
+                }
+            }
+        }
+    });
+    state.observer.observe(container, {childList: true});
+    window.__p2gReviewCursor = state;
+    return state.queue.length;
+"""
+
+# Returns only the reviews inserted since the previous drain and empties the queue.
+# Returns null when the observer is gone (navigation or the container was re-rendered).
+DRAIN_REVIEW_QUEUE_JS = REVIEW_HELPERS_JS + """
+    const state = window.__p2gReviewCursor;
+    if (!state || !state.container.isConnected) return null;
+    const batch = state.queue.splice(0);
+    const reviews = [];
+    if (batch.length) {
+        const positions = new Map(reviewNodes(state.container).map((node, i) => [node, i + 1]));
+        for (const node of batch) {
+            if (state.seen.has(node) || !positions.has(node)) continue;
+            const review = extractReview(node, positions.get(node));
+            if (review) {
+                state.seen.add(node);
+                reviews.push(review);
+            }
+        }
+    }
+    return {added: batch.length, reviews: reviews};
+"""
+
+REVIEW_NODE_COUNT_JS = """
+    const container = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    return container ? container.children.length : 0;
+"""
+
+# Result of a 'Load More' click: 'more' once the container at arguments[0] has more children than
+# arguments[1], 'settled' once the network went idle for arguments[2] ms without any, null while still waiting
+MORE_REVIEW_NODES_JS = NETWORK_SETTLED_HELPER_JS + """
+    const container = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (container && container.children.length > arguments[1]) return 'more';
+    return networkSettled(arguments[2]) ? 'settled' : null;
+"""
+
+
+# Clicks the visible 'read more' span of every review node at the indexes in arguments[2] at once and
+# remembers each text as rendered before the click; returns the number of clicks
+EXPAND_REVIEWS_JS = REVIEW_HELPERS_JS + """
+    const container = track('container', first(document, arguments[1]));
+    const pending = window.__p2gExpanding = {};
+    if (!container) return 0;
+    const nodes = reviewNodes(container);
+    let clicked = 0;
+    for (const index of arguments[2]) {
+        const node = nodes[index - 1];
+        if (!node) continue;
+        const textNode = first(node, paths.text);
+        const readMore = Array.from(node.querySelectorAll(`span[class*='${paths.read_more}']`))
+            .find(span => span.offsetParent !== null);
+        if (!textNode || !track('read_more', readMore)) continue;
+        pending[index] = {node: textNode, before: textNode.innerText.trim()};
+        readMore.click();
+        clicked++;
+    }
+    return clicked;
+"""
+
+# Texts of the reviews clicked by EXPAND_REVIEWS_JS as {index: text} once every one has changed,
+# null while some are still expanding; with arguments[0] true the texts changed so far are returned
+EXPANDED_TEXTS_JS = """
+    const pending = window.__p2gExpanding || {};
+    const texts = {};
+    let waiting = 0;
+    for (const [index, entry] of Object.entries(pending)) {
+        const text = entry.node.innerText.trim();
+        if (text && text !== entry.before) texts[index] = text; else waiting++;
+    }
+    return waiting && !arguments[0] ? null : texts;
+"""
+
+# Clicks the 'Load More' button, found by its class or else by its text; false when there is none
+CLICK_LOAD_MORE_JS = """
+    const buttons = Array.from(document.querySelectorAll('button'));
+    const button = buttons.find(btn => btn.className.includes('_kuel4no')) || buttons.find(btn => {
+        const text = btn.textContent.toLowerCase();
+        return text.includes('загрузить') || text.includes('ещё') || text.includes('еще') || text.includes('показать');
+    });
+    if (!button) return false;
+    button.scrollIntoView({block: 'center', behavior: 'instant'});
+    window.__p2gClickAt = performance.now();
+    button.click();
+    return true;
+"""
+
+MONTHS = {'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4, 'мая': 5, 'июня': 6,
+          'июля': 7, 'августа': 8, 'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12}
+REVIEW_DATE_PATTERN = re.compile(r'(\d{1,2})\s+([а-яё]+)(?:\s+(\d{4}))?')
+ISO_DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def review_date(text, today=None):
+    """
+    ISO date of a review date as the page prints it or as the API's date_created gives it
+
+    Args:
+        text: '5 июня 2023', '5 июня' (current year), 'сегодня' or 'вчера', optionally with ', отредактирован',
+            or an ISO 8601 timestamp
+        today: Reference date for the relative forms; defaults to date.today()
+
+    Returns:
+        str: 'YYYY-MM-DD', or '' if the text is not a date
+    """
+    if match := ISO_DATE_PATTERN.match(text or ''):
+        return match.group()
+    lowered = (text or '').lower()
+    today = today or date.today()
+    if 'сегодня' in lowered:
+        return today.isoformat()
+    if 'вчера' in lowered:
+        return (today - timedelta(days=1)).isoformat()
+    match = REVIEW_DATE_PATTERN.search(lowered)
+    if not match or match.group(2) not in MONTHS:
+        return ''
+    month, day = MONTHS[match.group(2)], int(match.group(1))
+    year = int(match.group(3)) if match.group(3) else today.year - ((month, day) > (today.month, today.day))
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return ''
+
+
+def to_review_record(item):
+    """
+    Convert a raw review into the parser's review dict
+
+    Every engine and review mode goes through here, so the output files hold one schema: reviews
+    from the in-page scripts, snapshot_parser and api_payloads.parse_reviews_payload() alike.
+    """
+    stars = item.get('stars')
+    return {
+        "reviewer_name": item['name'],
+        "rating": f"{stars} stars" if stars is not None else "Unknown rating",
+        "text": item['text'] if item.get('text') is not None else "[No review text found]",
+        "likes": str(item.get('likes') or "0"),
+        "date": review_date(item.get('date')),
+        "review_id": str(item.get('review_id') or '')
+    }
+
+
+def probe_review_indexes(driver, start_index=1):
+    """Indexes of the rendered review nodes from start_index onwards, in one script call"""
+    return driver.execute_script(PROBE_REVIEW_INDEXES_JS, REVIEW_PATHS, pathes.reviews_main_block, start_index) or []
+
+
+def load_more_clicks(target, loaded, available=None, page_size=REVIEWS_PAGE_SIZE):
+    """
+    Number of 'Load More' clicks needed to have target reviews rendered
+
+    Args:
+        target: Reviews wanted on the page
+        loaded: Reviews rendered now
+        available: The firm's review count, which caps target when known
+        page_size: Reviews added per click
+
+    Returns:
+        int: Clicks still needed
+    """
+    if available is not None:
+        target = min(target, available)
+    return max(0, -(-(target - loaded) // page_size))
+
+
+def prune_reviews(driver, before_index):
+    """Empty the extracted review nodes before before_index; returns the number emptied"""
+    return driver.execute_script(PRUNE_REVIEWS_JS, REVIEW_PATHS, pathes.reviews_main_block, before_index) or 0
+
+
+def load_more_steps(driver, target, available=None, max_clicks=None, on_log=None, active=None):
+    """
+    Step generator that pages reviews in with 'Load More' before they are extracted
+
+    The clicks needed for target rendered reviews are worked out from the firm's review count
+    and the page size, then made back to back, each one once the previous batch has landed.
+    There is no depth limit: paging ends at the target, when the button is gone, when a click
+    brings nothing or when active() turns false.
+
+    Args:
+        driver: The WebDriver instance
+        target: Review nodes wanted on the page
+        available: The firm's review count, if known
+        max_clicks: Stop after this many clicks (one batch at a time for --new-only)
+        on_log: Called with progress messages
+        active: Returns False to stop paging
+
+    Returns:
+        int: Clicks that loaded new reviews
+    """
+    log = on_log or (lambda message: None)
+    goal = target if available is None else min(target, available)
+    loaded = len(probe_review_indexes(driver))
+    planned = load_more_clicks(goal, loaded)
+    if max_clicks is not None:
+        planned = min(planned, max_clicks)
+    if planned:
+        pages = f"{planned} more" if goal < sys.maxsize else "all remaining"  # sys.maxsize is --reviews -1
+        log(f"Loading {pages} review pages ({loaded} reviews rendered)")
+    clicks = 0
+    while loaded < goal and (active is None or active()):
+        if max_clicks is not None and clicks >= max_clicks:
+            break
+        previous_count = driver.execute_script(REVIEW_NODE_COUNT_JS, pathes.reviews_main_block)
+        if not driver.execute_script(CLICK_LOAD_MORE_JS):
+            log("No 'Load More' button found - all reviews may be loaded")
+            break
+        result = yield Wait(MORE_REVIEW_NODES_JS, pathes.reviews_main_block, previous_count, NETWORK_IDLE_MS, timeout=10)
+        if result != 'more':
+            log("No new reviews appeared after 'Load More' - all reviews may be loaded")
+            break
+        clicks += 1
+        loaded = len(probe_review_indexes(driver))
+    if clicks:
+        log(f"Clicked 'Load More' {clicks} times, {loaded} reviews rendered")
+    return clicks
+
+
+def install_review_observer(driver):
+    """Start queuing inserted review nodes; returns the number already queued or -1 if the container is missing"""
+    return driver.execute_script(INSTALL_REVIEW_OBSERVER_JS, REVIEW_PATHS, pathes.reviews_main_block)
+
+
+def drain_new_reviews(driver):
+    """
+    Extract only the reviews inserted since the last drain
+
+    Args:
+        driver: The WebDriver instance
+
+    Returns:
+        tuple: (number of nodes added, list of raw review dicts), reinstalling the observer if it was lost
+    """
+    result = driver.execute_script(DRAIN_REVIEW_QUEUE_JS, REVIEW_PATHS)
+    if result is None:
+        if install_review_observer(driver) < 0:
+            return 0, []
+        result = driver.execute_script(DRAIN_REVIEW_QUEUE_JS, REVIEW_PATHS)
+    return result['added'], result['reviews']
+
+
+def next_review_index(items, start_index=1):
+    """Div index after the last review node in items, or start_index if they end before it"""
+    return max([start_index] + [item['index'] + 1 for item in items])
+
+
+def truncated_indexes(items):
+    """Indexes of the raw review dicts whose text was cut short"""
+    return [item['index'] for item in items if item['truncated'] and item.get('text')]
+
+
+def click_read_more(driver, indexes):
+    """Click the 'read more' span of every review at indexes in one script call; returns the number clicked"""
+    if not indexes:
+        return 0
+    return driver.execute_script(EXPAND_REVIEWS_JS, REVIEW_PATHS, pathes.reviews_main_block, list(indexes)) or 0
+
+
+def merge_expanded(items, indexes, texts, on_error=None):
+    """Put the EXPANDED_TEXTS_JS texts into items and convert them into review records"""
+    texts = {int(index): text for index, text in (texts or {}).items()}
+    missing = [index for index in indexes if index not in texts]
+    if missing and on_error:
+        on_error(f"Could not expand review text for reviews {', '.join(map(str, missing))}")
+    for item in items:
+        item['text'] = texts.get(item['index']) or item['text']
+    return [to_review_record(item) for item in items]
+
+
+def build_review_records(driver, items, on_error=None, timeout=2.0):
+    """
+    Expand truncated texts and convert raw review dicts into review records
+
+    Every truncated review of the batch is clicked in one pass and the expansions are awaited
+    together, for at most timeout seconds.
+    """
+    indexes = truncated_indexes(items)
+    texts = {}
+    try:
+        if click_read_more(driver, indexes):
+            texts = wait_until(driver, EXPANDED_TEXTS_JS, False, timeout=timeout) or driver.execute_script(EXPANDED_TEXTS_JS, True)
+    except Exception:
+        pass
+    return merge_expanded(items, indexes, texts, on_error)
+
+
+def extract_review_at(driver, index, selectors=None):
+    """Extract a single review with one relative lookup per field, or None if the index is not a review"""
+    selectors = selectors or SelectorRegistry(driver)
+    node = selectors.review_node(index)
+    if node is None:
+        return None
+    name_element = selectors.find(node, 'name')
+    reviewer_name = name_element.text.strip() if name_element is not None else ''
+    if not reviewer_name:
+        return None
+
+    stars_container = selectors.find(node, 'stars')
+    stars = pathes.count_stars_in_container(driver, stars_container) if stars_container is not None else None
+
+    truncated = False
+    text_element = selectors.find(node, 'text')
+    review_text = text_element.text.strip() if text_element is not None else None
+    if review_text:
+        truncated = "..." in review_text or "еще" in review_text.lower() or "целиком" in review_text.lower()
+
+    likes_element = selectors.find(node, 'likes')
+    likes = likes_element.text.strip() if likes_element is not None else ""
+
+    date_element = selectors.find(node, 'date')
+    review_date_text = date_element.text.strip() if date_element is not None else ""
+
+    return {"index": index, "name": reviewer_name, "stars": stars, "text": review_text, "likes": likes,
+            "date": review_date_text, "truncated": truncated}
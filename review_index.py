@@ -0,0 +1,89 @@
+import os
+import hashlib
+import sqlite3
+import threading
+from time import time
+
+INDEX_PATH = os.path.join('output', 'review_index.sqlite')
+
+# Consecutive known reviews after which the rest of the list is assumed to be known too
+KNOWN_RUN_STOP = 5
+
+
+def fingerprint(review):
+    """SHA-1 of author, text and day; the API's date_created is cut to the YYYY-MM-DD the page shows"""
+    author, text, day = (str(review.get(field) or '').strip() for field in ('reviewer_name', 'text', 'date'))
+    key = '|'.join((author, text, day[:10]))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class ReviewIndex:
+    """Persistent set of review fingerprints per firm, used to fetch only reviews posted since the last crawl"""
+
+    def __init__(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS reviews (firm TEXT, fingerprint TEXT, seen_at REAL, '
+                                'PRIMARY KEY (firm, fingerprint)) WITHOUT ROWID')
+        self.lock = threading.Lock()
+
+    def known(self, firm, fingerprints):
+        """Subset of fingerprints already recorded for firm"""
+        fingerprints = list(fingerprints)
+        if not fingerprints:
+            return set()
+        placeholders = ','.join('?' * len(fingerprints))
+        with self.lock:
+            rows = self.connection.execute(f'SELECT fingerprint FROM reviews WHERE firm = ? AND fingerprint IN ({placeholders})',
+                                           [firm, *fingerprints]).fetchall()
+        return {row[0] for row in rows}
+
+    def add(self, firm, reviews):
+        """Record the reviews of a firm once they are written"""
+        now = time()
+        with self.lock:
+            self.connection.executemany('INSERT OR IGNORE INTO reviews (firm, fingerprint, seen_at) VALUES (?, ?, ?)',
+                                        [(firm, fingerprint(review), now) for review in reviews])
+
+    def count(self, firm):
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM reviews WHERE firm = ?', (firm,)).fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class DeltaFilter:
+    """
+    Filter the reviews of one firm down to the unknown ones, newest first
+
+    Once stop_after known reviews have been seen in a row, reached_known is set and the caller
+    stops paging: everything further down the list was collected by an earlier crawl.
+    """
+
+    def __init__(self, index, firm, stop_after=KNOWN_RUN_STOP):
+        self.index = index
+        self.firm = firm
+        self.stop_after = stop_after
+        self.known_run = 0
+        self.skipped = 0
+        self.reached_known = False
+
+    def filter(self, reviews):
+        """Return the unknown reviews of this batch, in order"""
+        known = self.index.known(self.firm, (fingerprint(review) for review in reviews))
+        new_reviews = []
+        for review in reviews:
+            if fingerprint(review) in known:
+                self.known_run += 1
+                self.skipped += 1
+                if self.known_run >= self.stop_after:
+                    self.reached_known = True
+                    break
+            else:
+                self.known_run = 0
+                new_reviews.append(review)
+        return new_reviews
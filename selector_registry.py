@@ -0,0 +1,119 @@
+import logging
+from collections import Counter
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException
+from selenium.webdriver.common.by import By
+import pathes
+
+# Selectors relative to one review node (a div child of the reviews container)
+REVIEW_SELECTORS = {
+    'name': pathes.REVIEWER_NAME_REL,
+    'stars': pathes.REVIEW_STARS_REL,
+    'text': pathes.REVIEW_TEXT_REL,
+    'likes': pathes.REVIEW_LIKES_REL,
+    'date': pathes.REVIEW_DATE_REL,
+    'read_more': f".//span[contains(@class, '{pathes.READ_MORE_CLASS}')]",
+}
+
+# Selectors that must match on every review; optional ones (likes, date, read_more) are often absent
+REQUIRED_SELECTORS = ('container', 'name', 'stars', 'text')
+
+BROKEN_AFTER = 20  # Misses without a single hit before a selector is reported as broken
+
+# Counters filled by the in-page review scripts (see review_extractor.REVIEW_HELPERS_JS); read and reset
+TAKE_PAGE_STATS_JS = """
+    const stats = window.__p2gSelectorStats || {};
+    window.__p2gSelectorStats = {};
+    return stats;
+"""
+
+
+class SelectorRegistry:
+    """
+    Resolve the reviews container once and look review fields up relative to it
+
+    The container element is cached until it goes stale (navigation or a re-render), so a
+    per-review lookup evaluates a short relative XPath from the review node instead of a
+    20-level absolute one from /html/body. Every lookup is counted per selector; a required
+    selector that keeps missing is reported once.
+    """
+
+    def __init__(self, driver, on_log=None):
+        self.driver = driver
+        self.on_log = on_log
+        self.cached_container = None
+        self.hits = Counter()
+        self.misses = Counter()
+        self.reported = set()
+
+    def log(self, message, level='info'):
+        getattr(logging, level if level in ('info', 'warning', 'error') else 'info')(message)
+        if self.on_log:
+            self.on_log(message, level)
+
+    def record(self, name, hit):
+        """Count a lookup and report the selector once if it never matches"""
+        if hit:
+            self.hits[name] += 1
+            return
+        self.misses[name] += 1
+        if (name in REQUIRED_SELECTORS and name not in self.reported and not self.hits[name]
+                and self.misses[name] >= BROKEN_AFTER):
+            self.reported.add(name)
+            xpath = pathes.reviews_main_block if name == 'container' else REVIEW_SELECTORS.get(name)
+            self.log(f"Selector '{name}' ({xpath}) matched nothing in {self.misses[name]} lookups; "
+                     f"the page layout may have changed", "warning")
+
+    def container(self):
+        """The reviews container element, resolved once per page"""
+        if self.cached_container is not None:
+            try:
+                self.cached_container.tag_name  # Raises once the element is detached or its tab is not current
+                return self.cached_container
+            except Exception:
+                self.cached_container = None
+        try:
+            self.cached_container = self.driver.find_element(By.XPATH, pathes.reviews_main_block)
+        except NoSuchElementException:
+            self.record('container', False)
+            return None
+        self.record('container', True)
+        return self.cached_container
+
+    def review_node(self, index):
+        """The review node at the 1-based div index, or None"""
+        container = self.container()
+        if container is None:
+            return None
+        try:
+            return container.find_element(By.XPATH, f'./div[{index}]')
+        except StaleElementReferenceException:
+            self.cached_container = None
+            container = self.container()
+            return container.find_element(By.XPATH, f'./div[{index}]') if container is not None else None
+        except NoSuchElementException:
+            return None
+
+    def find(self, node, name):
+        """Element of the named selector inside a review node, or None"""
+        try:
+            element = node.find_element(By.XPATH, REVIEW_SELECTORS[name])
+        except NoSuchElementException:
+            element = None
+        self.record(name, element is not None)
+        return element
+
+    def sync_page_stats(self):
+        """Merge the counters of the in-page review scripts into this registry"""
+        try:
+            stats = self.driver.execute_script(TAKE_PAGE_STATS_JS) or {}
+        except Exception:
+            return
+        for name, counts in stats.items():
+            self.hits[name] += counts.get('hit', 0)
+            if counts.get('miss'):
+                self.misses[name] += counts['miss'] - 1
+                self.record(name, False)
+
+    def stats(self):
+        """{selector: {'hit': n, 'miss': n}} for every selector looked up so far"""
+        return {name: {'hit': self.hits[name], 'miss': self.misses[name]} for name in sorted(set(self.hits) | set(self.misses))}
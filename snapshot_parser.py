@@ -0,0 +1,90 @@
+import os
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree, html
+import pathes
+
+# outerHTML of the div children of the container at arguments[0] from the 1-based index arguments[1] on,
+# wrapped in one <div> so a single string crosses the WebDriver connection
+REVIEWS_SNAPSHOT_JS = """
+    const container = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    if (!container) return null;
+    const nodes = Array.from(container.children).filter(child => child.tagName === 'DIV').slice((arguments[1] || 1) - 1);
+    return '<div>' + nodes.map(node => node.outerHTML).join('') + '</div>';
+"""
+
+# The pathes.py selectors, compiled once per process
+REVIEW_NODES = etree.XPath('./div')
+REVIEWER_NAME = etree.XPath(pathes.REVIEWER_NAME_REL)
+REVIEW_STARS = etree.XPath(pathes.REVIEW_STARS_REL)
+REVIEW_TEXT = etree.XPath(pathes.REVIEW_TEXT_REL)
+REVIEW_LIKES = etree.XPath(pathes.REVIEW_LIKES_REL)
+REVIEW_DATE = etree.XPath(pathes.REVIEW_DATE_REL)
+READ_MORE = etree.XPath(f".//span[contains(@class, '{pathes.READ_MORE_CLASS}')]")
+STAR_SPANS = etree.XPath('count(.//span)')
+
+pool = None
+
+
+def first_text(xpath, node):
+    found = xpath(node)
+    return found[0].text_content().strip() if found else None
+
+
+def parse_review(node, index):
+    """Same dict as extractReview() in review_extractor.REVIEW_HELPERS_JS, or None if node is not a review"""
+    name = first_text(REVIEWER_NAME, node)
+    if not name:
+        return None
+    stars = REVIEW_STARS(node)
+    text = first_text(REVIEW_TEXT, node)
+    lowered = (text or '').lower()
+    truncated = bool(READ_MORE(node)) or '...' in (text or '') or 'еще' in lowered or 'целиком' in lowered
+    return {
+        'index': index,
+        'name': name,
+        'stars': min(int(STAR_SPANS(stars[0])), 5) if stars else None,
+        'text': text,
+        'likes': first_text(REVIEW_LIKES, node) or '',
+        'date': first_text(REVIEW_DATE, node) or '',
+        'truncated': truncated,
+    }
+
+
+def parse_reviews(markup, start_index=1):
+    """
+    Parse a REVIEWS_SNAPSHOT_JS snapshot
+
+    Args:
+        markup: The wrapped outerHTML of the review nodes
+        start_index: Container index of the first node in the snapshot
+
+    Returns:
+        list: Raw review dicts with index, name, stars, text, likes, date and truncated keys
+    """
+    root = html.fragment_fromstring(markup)
+    reviews = []
+    for offset, node in enumerate(REVIEW_NODES(root)):
+        review = parse_review(node, start_index + offset)
+        if review:
+            reviews.append(review)
+    return reviews
+
+
+def submit(markup, start_index=1):
+    """Parse a snapshot in the shared process pool; returns a Future of parse_reviews()"""
+    global pool
+    if pool is None:
+        pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) // 2))
+    return pool.submit(parse_reviews, markup, start_index)
+
+
+def shutdown():
+    """Stop the worker processes; the next submit() starts a new pool"""
+    global pool
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+        pool = None
+
+
+atexit.register(shutdown)
@@ -0,0 +1,38 @@
+import api_payloads
+import review_extractor
+
+FIRM = {'id': '70000001012345678_abc', 'name': 'Кафе', 'address_name': 'Абая, 1', 'point': {'lat': 43.2, 'lon': 76.9},
+        'reviews': {'general_rating': 4.6, 'general_review_count': 120}}
+
+
+def test_catalog_url_with_reviews_field_maps_to_firm():
+    url = 'https://catalog.api.2gis.ru/3.0/items/byid?id=70000001012345678&fields=items.point,items.reviews&key=k'
+    firms, reviews = api_payloads.map_payloads([{'url': url, 'data': {'result': {'items': [FIRM]}}}])
+    assert reviews == []
+    assert [firm['id'] for firm in firms] == ['70000001012345678']
+    assert firms[0]['reviews_count'] == 120
+
+
+def test_reviews_url_maps_to_reviews():
+    url = 'https://public-api.reviews.2gis.com/2.0/branches/70000001012345678/reviews?limit=50&is_advertiser=false'
+    data = {'reviews': [{'id': 7, 'user': {'name': 'Ann'}, 'rating': 5, 'text': 'Good', 'likes_count': 2,
+                         'date_created': '2024-01-02', 'object': {'id': '70000001012345678'}}]}
+    firms, reviews = api_payloads.map_payloads([{'url': url, 'data': data}])
+    assert firms == []
+    assert reviews[0]['review_id'] == '7' and reviews[0]['date'] == '2024-01-02'
+
+
+def test_firm_id_from_url():
+    assert api_payloads.firm_id_from_url('https://2gis.ru/almaty/firm/70000001012345678?m=1') == '70000001012345678'
+    assert api_payloads.firm_id_from_url('https://2gis.ru/almaty/search/кафе') is None
+
+
+def test_api_and_page_reviews_share_one_schema():
+    api = api_payloads.parse_reviews_payload({'reviews': [
+        {'id': 7, 'user': {'name': 'Ann'}, 'rating': 4, 'text': 'Good', 'likes_count': 2, 'date_created': '2024-01-02T10:11:12+05:00'},
+        {'id': 8, 'user': {'name': 'Bob'}, 'rating': None, 'text': '', 'likes_count': None, 'date_created': None}]})
+    page = review_extractor.to_review_record({'index': 3, 'name': 'Ann', 'stars': 4, 'text': 'Good', 'likes': '2',
+                                              'date': '2 января 2024', 'truncated': False})
+    assert api[0] == dict(page, review_id='7')
+    assert api[1] == {'reviewer_name': 'Bob', 'rating': 'Unknown rating', 'text': '[No review text found]', 'likes': '0',
+                      'date': '', 'review_id': '8'}
@@ -0,0 +1,58 @@
+import json
+import asyncio
+import pytest
+import websockets
+from cdp_async import CDPConnection, CDPError
+
+
+async def serve(replies, test):
+    """Run test(connection) against a fake browser endpoint answering Runtime.evaluate from replies"""
+    evaluated = []
+
+    async def browser(ws):
+        async for raw in ws:
+            message = json.loads(raw)
+            reply = {'id': message['id'], 'sessionId': message.get('sessionId')}
+            if message['method'] == 'Runtime.evaluate':
+                evaluated.append(message['params']['expression'])
+                reply.update(replies.pop(0) if replies else {'result': {'result': {'value': None}}})
+            elif message['method'] == 'Target.createTarget':
+                reply['result'] = {'targetId': 'T1'}
+            elif message['method'] == 'Target.attachToTarget':
+                reply['result'] = {'sessionId': 'S1'}
+            else:
+                reply['result'] = {}
+            await ws.send(json.dumps(reply))
+
+    async with websockets.serve(browser, '127.0.0.1', 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        connection = CDPConnection(await websockets.connect(f'ws://127.0.0.1:{port}', ping_interval=None))
+        try:
+            tab = await connection.new_tab()
+            return await test(tab), evaluated
+        finally:
+            await connection.close()
+
+
+def test_wait_retries_while_navigation_replaces_the_context():
+    replies = [
+        {'error': {'code': -32000, 'message': 'Execution context was destroyed.'}},
+        {'error': {'code': -32000, 'message': 'Cannot find context with specified id'}},
+        {'result': {'result': {'value': False}}},
+        {'result': {'result': {'value': 'ready'}}},
+    ]
+    value, evaluated = asyncio.run(serve(replies, lambda tab: tab.wait('return 1;', timeout=5, poll=0.01)))
+    assert value == 'ready'
+    assert len(evaluated) == 4
+
+
+def test_wait_times_out_if_the_context_never_comes_back():
+    replies = [{'error': {'message': 'Execution context was destroyed.'}}] * 1000
+    value, _ = asyncio.run(serve(replies, lambda tab: tab.wait('return 1;', timeout=0.2, poll=0.01)))
+    assert value is None
+
+
+def test_wait_raises_other_script_errors():
+    replies = [{'result': {'result': {}, 'exceptionDetails': {'exception': {'description': 'TypeError: x is null'}}}}]
+    with pytest.raises(CDPError, match='TypeError'):
+        asyncio.run(serve(replies, lambda tab: tab.wait('return x.y;', timeout=5, poll=0.01)))
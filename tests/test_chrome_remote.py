@@ -0,0 +1,46 @@
+import json
+import chrome_remote
+import parser_engine
+from parser_engine import Parser2GIS
+
+
+class FakeChrome:
+    def __init__(self, service=None, options=None):
+        self.options = options
+
+
+def test_setup_driver_launches_chrome_unless_asked_to_attach(monkeypatch):
+    def no_probe(port):
+        raise AssertionError('probed the daemon port')
+
+    monkeypatch.setattr(chrome_remote, 'debugger_version', no_probe)
+    monkeypatch.setattr(chrome_remote, 'resolve_chromedriver', lambda: 'chromedriver')
+    monkeypatch.setattr(parser_engine.webdriver, 'Chrome', FakeChrome)
+    parser = Parser2GIS('', headless=True)
+    driver = parser.setup_driver()
+    assert not parser.attached and '--headless=new' in driver.options.arguments
+
+
+def test_setup_driver_attaches_on_the_given_port(monkeypatch):
+    monkeypatch.setattr(chrome_remote, 'debugger_version', lambda port: {'Browser': 'Chrome/120'} if port == 9400 else None)
+    monkeypatch.setattr(chrome_remote, 'attach_driver', lambda port: f'attached:{port}')
+    parser = Parser2GIS('', chrome_port=9400)
+    assert parser.setup_driver() == 'attached:9400' and parser.attached
+
+
+def test_resolve_chromedriver_does_not_cache_an_unknown_version(monkeypatch, tmp_path):
+    cache_file = tmp_path / 'chromedriver.json'
+    monkeypatch.setattr(chrome_remote, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(chrome_remote, 'DRIVER_CACHE_FILE', str(cache_file))
+    monkeypatch.setattr(chrome_remote, 'chrome_major_version', lambda: None)
+    driver = tmp_path / 'chromedriver'
+    driver.write_text('')
+    import webdriver_manager.chrome
+    monkeypatch.setattr(webdriver_manager.chrome, 'ChromeDriverManager',
+                        lambda: type('Manager', (), {'install': lambda self: str(driver)})())
+    assert chrome_remote.resolve_chromedriver() == str(driver)
+    assert not cache_file.exists()
+
+    monkeypatch.setattr(chrome_remote, 'chrome_major_version', lambda: '120')
+    chrome_remote.resolve_chromedriver()
+    assert json.loads(cache_file.read_text()) == {'120': str(driver)}
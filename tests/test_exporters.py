@@ -0,0 +1,65 @@
+import datetime
+import pytest
+from openpyxl import load_workbook
+import exporters
+from output_writer import StreamWriter, PLACE_COLUMNS, REVIEW_COLUMNS
+
+
+def write_run(tmp_path, places=2, reviews_per_place=3):
+    writer = StreamWriter(str(tmp_path / 'run'))
+    for i in range(places):
+        reviews = [{'reviewer_name': f'Reviewer {i}-{j}', 'rating': 5, 'text': 'Good', 'likes': 1,
+                    'date': '2024-01-02T10:11:12+05:00', 'review_id': f'{i}-{j}'} for j in range(reviews_per_place)]
+        if reviews:
+            reviews[0].update(overall_rating='4.8', total_ratings='120')
+        writer.write_record({'Название': f'Кафе {i}', 'Ссылка': f'https://2gis.ru/almaty/firm/7000000100000000{i}',
+                             'Отзывы': reviews})
+    writer.close()
+    return writer
+
+
+def test_export_excel_headers_and_review_sheet_rollover(tmp_path, monkeypatch):
+    monkeypatch.setattr(exporters, 'EXCEL_MAX_ROWS', 4)  # Header and three reviews per sheet
+    writer = write_run(tmp_path)
+    filename = str(tmp_path / 'run.xlsx')
+    assert exporters.export_excel(writer.place_files(), writer.review_files(), filename) == 2
+
+    workbook = load_workbook(filename, read_only=True)
+    assert workbook.sheetnames == ['Businesses', 'Reviews', 'Reviews_2']
+    businesses = list(workbook['Businesses'].values)
+    assert list(businesses[0]) == PLACE_COLUMNS and len(businesses) == 3
+    first, second = (list(workbook[name].values) for name in ('Reviews', 'Reviews_2'))
+    assert list(first[0]) == REVIEW_COLUMNS and list(second[0]) == REVIEW_COLUMNS
+    assert len(first) == 4 and len(second) == 4
+    assert first[1][REVIEW_COLUMNS.index('overall_rating')] == '4.8'
+
+
+def test_export_excel_without_reviews_keeps_one_sheet(tmp_path):
+    writer = write_run(tmp_path, reviews_per_place=0)
+    filename = str(tmp_path / 'run.xlsx')
+    exporters.export_excel(writer.place_files(), writer.review_files(), filename)
+    assert load_workbook(filename, read_only=True).sheetnames == ['Sheet1']
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'arrow'])
+def test_export_columnar_round_trips_typed_columns(tmp_path, fmt):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+
+    writer = write_run(tmp_path)
+    places_path, reviews_path = exporters.export_columnar(writer.place_files(), writer.review_files(), str(tmp_path / 'run'), fmt)
+    if fmt == 'parquet':
+        places, reviews = pq.read_table(places_path), pq.read_table(reviews_path)
+    else:
+        places, reviews = (pa.ipc.open_stream(path).read_all() for path in (places_path, reviews_path))
+
+    assert places.num_rows == 2 and reviews.num_rows == 6
+    assert reviews.schema.field('rating').type == pa.int8()
+    # Parquet has no second unit and reads the timestamps back as milliseconds
+    date_type = reviews.schema.field('date').type
+    assert pa.types.is_timestamp(date_type) and date_type.tz == 'UTC'
+    assert pa.types.is_dictionary(reviews.schema.field('firm_id').type)
+    assert pa.types.is_dictionary(places.schema.field('firm_id').type)
+    row = reviews.to_pylist()[0]
+    assert row['firm_id'] == '70000001000000000' and row['rating'] == 5 and row['likes'] == 1
+    assert row['date'] == datetime.datetime(2024, 1, 2, 5, 11, 12, tzinfo=datetime.timezone.utc)
@@ -0,0 +1,108 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import pytest
+import requests
+import http_client
+from job_ledger import JobLedger
+
+FIRMS = [{'id': f'{70000001000000 + i}_x', 'name': f'Кафе {i}', 'address_name': f'Абая, {i}'} for i in range(25)]
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Stand-in for the catalog and reviews APIs"""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == '/3.0/items':
+            page, size = int(query['page']), int(query['page_size'])
+            body = {'result': {'items': FIRMS[(page - 1) * size:page * size], 'total': len(FIRMS)}}
+        elif url.path.endswith('/reviews'):
+            firm_id = url.path.split('/')[-2]
+            body = {'reviews': [{'id': f'{firm_id}-{i}', 'user': {'name': 'Ann'}, 'rating': 5, 'text': 'Good',
+                                 'likes_count': 0, 'date_created': '2024-01-02'} for i in range(3)], 'meta': {}}
+        else:
+            self.send_error(404)
+            return
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ApiHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    monkeypatch.setattr(http_client, 'CATALOG_URL', f'{base}/3.0/items')
+    monkeypatch.setattr(http_client, 'REVIEWS_URL', base + '/2.0/branches/{firm_id}/reviews')
+    yield base
+    server.shutdown()
+    server.server_close()
+
+
+def test_search_and_reviews_against_stand_in_api(api):
+    engine = http_client.Parser2GISHttp('кафе', scrape_reviews=True, max_reviews=2, concurrency=4, page_size=10)
+    records = engine.run()
+    assert sorted(record['Название'] for record in records) == sorted(firm['name'] for firm in FIRMS)
+    assert all(len(record['Отзывы']) == 2 for record in records)
+
+
+def test_resumed_search_skips_places_the_ledger_has_done(api, tmp_path):
+    ledger = JobLedger('кафе', resume=True, path=str(tmp_path / 'jobs.sqlite'))
+    done = FIRMS[:12]
+    for firm in done:
+        ledger.mark_done(f"https://2gis.ru/almaty/firm/{firm['id'].split('_')[0]}")
+    engine = http_client.Parser2GISHttp('кафе', concurrency=4, page_size=10, ledger=ledger)
+    records = engine.run()
+    assert sorted(record['Название'] for record in records) == sorted(firm['name'] for firm in FIRMS[12:])
+    ledger.close()
+
+
+def test_run_submits_through_a_bounded_window():
+    pulled = []
+    engine = http_client.Parser2GISHttp(concurrency=2)
+    engine.process_place = lambda place: dict(place, Название=str(place['id']))
+
+    def places():
+        for i in range(50):
+            pulled.append(i)
+            yield {'id': str(i)}
+
+    first_pulled = []
+    engine.on_record = lambda record: first_pulled.append(len(pulled)) if not first_pulled else None
+    engine.run(places())
+    assert len(pulled) == 50
+    assert first_pulled[0] <= 2 * engine.concurrency
+
+
+class FailingSession:
+    def get(self, *args, **kwargs):
+        raise requests.ConnectionError('refused')
+
+
+def test_process_place_falls_back_to_chrome_when_the_api_fails():
+    calls = []
+    engine = http_client.Parser2GISHttp(scrape_reviews=True, fallback=lambda url: calls.append(url) or {'Ссылка': url})
+    engine.session = FailingSession()
+    engine.parsing_active = True
+    url = 'https://2gis.ru/almaty/firm/70000001012345678'
+    assert engine.process_place({'Ссылка': url}) == {'Ссылка': url}
+    assert calls == [url]
+
+
+def test_process_place_raises_without_fallback():
+    engine = http_client.Parser2GISHttp(scrape_reviews=True)
+    engine.session = FailingSession()
+    engine.parsing_active = True
+    with pytest.raises(requests.ConnectionError):
+        engine.process_place({'Ссылка': 'https://2gis.ru/almaty/firm/70000001012345678'})
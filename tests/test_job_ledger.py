@@ -0,0 +1,63 @@
+from job_ledger import JobLedger, place_key
+
+URL = 'https://2gis.ru/almaty/firm/70000001012345678'
+
+
+def open_ledger(tmp_path, resume=False, job='кафе'):
+    return JobLedger(job, resume=resume, path=str(tmp_path / 'jobs.sqlite'))
+
+
+def test_place_key_matches_variants_of_one_firm():
+    assert place_key(URL) == place_key('https://2gis.ru/firm/70000001012345678?utm_source=x') == '70000001012345678'
+    assert place_key('https://example.com/place?id=1') == 'https://example.com/place'
+
+
+def test_mark_done_is_done_and_done_places(tmp_path):
+    ledger = open_ledger(tmp_path)
+    assert not ledger.is_done(URL)
+    ledger.mark_done(URL + '?tracking=1', 'output/кафе_1.jsonl')
+    assert ledger.is_done(URL)
+    assert ledger.done_places() == [(URL + '?tracking=1', 'output/кафе_1.jsonl')]
+    assert list(ledger.pending([URL, 'https://2gis.ru/firm/2'])) == ['https://2gis.ru/firm/2']
+    ledger.close()
+
+
+def test_save_progress_round_trips_through_partial_reviews(tmp_path):
+    reviews = [{'reviewer_name': 'Аня', 'rating': '5 stars', 'text': 'Вкусно', 'likes': '2', 'date': '2024-01-02',
+                'review_id': '7'}]
+    ledger = open_ledger(tmp_path)
+    assert ledger.partial_reviews(URL) == []
+    ledger.save_progress(URL, reviews)
+    ledger.close()
+
+    resumed = open_ledger(tmp_path, resume=True)
+    assert resumed.partial_reviews(URL) == reviews
+    assert resumed.counts() == {'in_progress': 1}
+    resumed.mark_done(URL)
+    assert resumed.partial_reviews(URL) == []
+    # A late checkpoint or failure does not reopen a finished place
+    resumed.save_progress(URL, reviews)
+    resumed.mark_failed(URL, 'timeout')
+    assert resumed.counts() == {'done': 1}
+    resumed.close()
+
+
+def test_a_new_run_clears_only_its_own_job(tmp_path):
+    ledger = open_ledger(tmp_path)
+    ledger.output_base('output/кафе')
+    ledger.mark_done(URL)
+    other = open_ledger(tmp_path, job='бары')
+    other.mark_done(URL)
+    ledger.close()
+    other.close()
+
+    resumed = open_ledger(tmp_path, resume=True)
+    assert resumed.is_done(URL)
+    assert resumed.output_base('output/new') == 'output/кафе'
+    resumed.close()
+
+    restarted = open_ledger(tmp_path)
+    assert not restarted.is_done(URL)
+    assert restarted.output_base('output/new') == 'output/new'
+    assert open_ledger(tmp_path, resume=True, job='бары').is_done(URL)
+    restarted.close()
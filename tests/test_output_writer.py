@@ -0,0 +1,27 @@
+import csv
+import json
+from output_writer import StreamWriter
+
+RECORD = {
+    'Название': 'Кафе', 'Ссылка': 'https://2gis.ru/almaty/firm/70000001000000001',
+    'Отзывы': [{'reviewer_name': 'Ann', 'rating': '5 stars', 'text': 'Good', 'overall_rating': '4.8', 'total_ratings': '120'},
+               {'reviewer_name': 'Bob', 'rating': '4 stars', 'text': 'Fine'}],
+}
+
+
+def test_csv_reviews_keep_the_overall_metrics(tmp_path):
+    writer = StreamWriter(str(tmp_path / 'run'), fmt='csv')
+    writer.write_record(RECORD)
+    writer.close()
+    with open(writer.reviews.paths[0], encoding='utf-8', newline='') as file:
+        rows = list(csv.DictReader(file))
+    assert [(row['overall_rating'], row['total_ratings']) for row in rows] == [('4.8', '120'), ('', '')]
+
+
+def test_jsonl_and_csv_reviews_carry_the_same_fields(tmp_path):
+    writer = StreamWriter(str(tmp_path / 'run'), fmt='jsonl')
+    writer.write_record(RECORD)
+    writer.close()
+    with open(writer.reviews.paths[0], encoding='utf-8') as file:
+        first = json.loads(file.readline())
+    assert set(first) <= set(writer.reviews.columns)
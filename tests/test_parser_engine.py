@@ -0,0 +1,147 @@
+import parser_engine
+import pathes
+import review_extractor
+from parser_engine import Parser2GIS
+from selector_registry import SelectorRegistry, TAKE_PAGE_STATS_JS
+from waits import StepTask, ELEMENT_VISIBLE_JS, LOCATION_CHANGED_JS
+
+HEADER_NODES = 2  # Rating summary and sort bar before the first review node
+
+
+class Element:
+    def __init__(self, text=''):
+        self.text = text
+
+    def click(self):
+        pass
+
+
+class ReviewTab:
+    """Reviews list of one tab: rendered review nodes, the observer queue and what was read or emptied"""
+
+    def __init__(self, total, rendered=50):
+        self.total = total
+        self.rendered = rendered
+        self.late = 0  # Nodes of the last 'Load More' batch still being inserted
+        self.queue = []
+        self.extracted = set()
+        self.pruned = set()
+        self.lost = []  # Nodes emptied before they were extracted
+
+    def indexes(self, start=1, end=None):
+        return list(range(max(start, HEADER_NODES + 1), (end or self.rendered + HEADER_NODES) + 1))
+
+    def insert(self, count):
+        first = self.rendered + HEADER_NODES + 1
+        self.rendered += count
+        self.queue += self.indexes(first)
+
+
+class ReviewTabsDriver:
+    """Several tabs with a reviews list each; scripts act on the current tab"""
+
+    def __init__(self, tabs):
+        self.tabs = tabs
+        self.current_window_handle = next(iter(tabs))
+        self.switch_to = self
+
+    def window(self, handle):
+        self.current_window_handle = handle
+
+    @property
+    def current_url(self):
+        return f'https://2gis.ru/almaty/firm/{self.current_window_handle}'
+
+    def back(self):
+        pass
+
+    def find_element(self, by, xpath):
+        tab = self.tabs[self.current_window_handle]
+        return Element({pathes.review_overall_rating: '4.5', pathes.reviews_total_rating_count: f'{tab.total} оценок',
+                        pathes.reviews_count: str(tab.total)}.get(xpath, ''))
+
+    def execute_cdp_cmd(self, command, params):
+        return {'usedSize': 1024 * 1024}
+
+    def execute_script(self, script, *args):
+        tab = self.tabs[self.current_window_handle]
+        if script is review_extractor.INSTALL_REVIEW_OBSERVER_JS:
+            tab.queue = tab.indexes()
+            return len(tab.queue)
+        if script is review_extractor.DRAIN_REVIEW_QUEUE_JS:
+            batch, tab.queue = tab.queue, []
+            tab.extracted.update(batch)
+            # The rest of the batch lands while the tab is being read
+            tab.insert(tab.late)
+            tab.late = 0
+            reviews = [{'index': i, 'name': f'{self.current_window_handle}-{i}', 'stars': 5, 'text': 'Good',
+                        'likes': '', 'date': '', 'truncated': False} for i in batch]
+            return {'added': len(batch), 'reviews': reviews}
+        if script is review_extractor.PROBE_REVIEW_INDEXES_JS:
+            return tab.indexes(args[2])
+        if script is review_extractor.REVIEW_NODE_COUNT_JS:
+            return tab.rendered + HEADER_NODES
+        if script is review_extractor.CLICK_LOAD_MORE_JS:
+            if tab.rendered + tab.late >= tab.total:
+                return False
+            tab.insert(tab.late)
+            page = min(tab.total - tab.rendered, review_extractor.REVIEWS_PAGE_SIZE)
+            tab.insert(page // 2)
+            tab.late = page - page // 2
+            return True
+        if script is review_extractor.PRUNE_REVIEWS_JS:
+            emptied = [i for i in tab.indexes(end=args[2] - 1) if i not in tab.pruned]
+            tab.lost += [i for i in emptied if i not in tab.extracted]
+            tab.pruned.update(emptied)
+            return len(emptied)
+        if script is review_extractor.MORE_REVIEW_NODES_JS:
+            return 'more'
+        if script is parser_engine.DOM_SIZE_JS:
+            return 1000
+        if script is TAKE_PAGE_STATS_JS:
+            return {}
+        if script in (ELEMENT_VISIBLE_JS, LOCATION_CHANGED_JS):
+            return True
+        raise AssertionError('unexpected script')
+
+
+def test_interleaved_review_steps_prune_only_their_own_tab():
+    driver = ReviewTabsDriver({'deep': ReviewTab(total=900), 'short': ReviewTab(total=300)})
+    parser = Parser2GIS('', scrape_reviews=True, prune_reviews=True)
+    parser.driver = driver
+    parser.selectors = SelectorRegistry(driver)
+    parser.parsing_active = True
+    tasks = {'deep': StepTask(parser.review_steps(800))}
+
+    # Round-robin like TabPool; the short tab opens its reviews once the deep tab's cursor is far ahead
+    while not all(task.done for task in tasks.values()):
+        if 'short' not in tasks and driver.tabs['deep'].pruned:
+            tasks['short'] = StepTask(parser.review_steps(250))
+        for handle, task in tasks.items():
+            if task.done:
+                continue
+            driver.switch_to.window(handle)
+            if task.wait is None:
+                task.advance()
+            else:
+                task.poll(driver)
+
+    assert len(tasks['deep'].result) == 800 and len(tasks['short'].result) == 250
+    for handle, task in tasks.items():
+        assert all(review['reviewer_name'].startswith(handle) for review in task.result)
+        assert driver.tabs[handle].pruned and not driver.tabs[handle].lost
+
+
+def test_review_steps_without_a_selector_registry():
+    driver = ReviewTabsDriver({'only': ReviewTab(total=30)})
+    errors = []
+    parser = Parser2GIS('', scrape_reviews=True, on_log=lambda message, level: level == 'error' and errors.append(message))
+    parser.driver = driver
+    parser.parsing_active = True
+    task = StepTask(parser.review_steps(20))
+    while not task.done:
+        if task.wait is None:
+            task.advance()
+        else:
+            task.poll(driver)
+    assert len(task.result) == 20 and errors == []
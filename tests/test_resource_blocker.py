@@ -0,0 +1,119 @@
+import io
+import json
+import queue
+import time
+import pytest
+import resource_blocker
+from traffic_archive import TrafficArchive
+
+HANDLE = 'CDwindow-ABC123'
+REVIEWS_URL = 'https://public-api.reviews.2gis.com/2.0/branches/1/reviews?limit=50'
+
+
+class FakeSocket:
+    """Browser websocket that answers every command; attachToTarget and getResponseBody get real-looking results"""
+
+    def __init__(self):
+        self.sent = []
+        self.replies = queue.Queue()
+
+    def send(self, data):
+        message = json.loads(data)
+        self.sent.append(message)
+        result = {}
+        if message['method'] == 'Target.attachToTarget':
+            result = {'sessionId': 'session-1'}
+        elif message['method'] == 'Fetch.getResponseBody':
+            result = {'body': '{"reviews": []}', 'base64Encoded': False}
+        self.replies.put({'id': message['id'], 'result': result})
+
+    def recv(self):
+        reply = self.replies.get()
+        if reply is None:
+            raise ConnectionError('closed')
+        return json.dumps(reply)
+
+    def close(self):
+        self.replies.put(None)
+
+    def commands(self, method):
+        return [message['params'] for message in self.sent if message['method'] == method]
+
+
+@pytest.fixture
+def socket(monkeypatch):
+    ws = FakeSocket()
+    version = json.dumps({'webSocketDebuggerUrl': 'ws://127.0.0.1:9222/devtools/browser/x'}).encode('utf-8')
+    monkeypatch.setattr(resource_blocker, 'urlopen', lambda url, timeout: io.BytesIO(version))
+    monkeypatch.setattr(resource_blocker.websocket, 'create_connection', lambda url, **options: ws)
+    return ws
+
+
+def paused(request_id, resource_type, url='https://2gis.ru/almaty/firm/1'):
+    return {'requestId': request_id, 'resourceType': resource_type, 'request': {'method': 'GET', 'url': url}}
+
+
+def test_lean_profile_blocks_types_outside_the_allow_list(socket):
+    blocker = resource_blocker.ResourceBlocker('127.0.0.1:9222', resource_blocker.PROFILES['lean'])
+    blocker.watch(HANDLE)
+    assert socket.commands('Target.attachToTarget') == [{'targetId': 'ABC123', 'flatten': True}]
+    assert socket.commands('Fetch.enable') == [{'patterns': [{'urlPattern': '*', 'requestStage': 'Request'}]}]
+
+    for request_id, resource_type in (('1', 'Image'), ('2', 'Stylesheet'), ('3', 'Script'), ('4', 'Fetch')):
+        blocker.handle_event('Fetch.requestPaused', paused(request_id, resource_type), 'session-1')
+    assert [params['requestId'] for params in socket.commands('Fetch.failRequest')] == ['1', '2']
+    assert {params['errorReason'] for params in socket.commands('Fetch.failRequest')} == {'BlockedByClient'}
+    assert [params['requestId'] for params in socket.commands('Fetch.continueRequest')] == ['3', '4']
+
+    blocker.handle_event('Network.requestWillBeSent', {'requestId': 'n3', 'type': 'Script'}, 'session-1')
+    blocker.handle_event('Network.loadingFinished', {'requestId': 'n3', 'encodedDataLength': 2048}, 'session-1')
+    report = blocker.take_report(HANDLE)
+    assert report['requests'] == 1 and report['bytes_by_type'] == {'Script': 2048}
+    assert report['blocked'] == 2 and report['blocked_by_type'] == {'Image': 1, 'Stylesheet': 1}
+    assert blocker.take_report(HANDLE)['blocked'] == 0
+    # Events of tabs that are not watched are ignored
+    blocker.handle_event('Fetch.requestPaused', paused('5', 'Image'), 'session-2')
+    assert len(socket.commands('Fetch.failRequest')) == 2
+    blocker.close()
+
+
+def test_full_profile_records_responses_to_the_archive(socket, tmp_path):
+    archive = TrafficArchive(str(tmp_path / 'run.har.jsonl'), 'record')
+    blocker = resource_blocker.ResourceBlocker('127.0.0.1:9222', resource_blocker.PROFILES['full'], archive=archive)
+    blocker.watch(HANDLE)
+    assert socket.commands('Fetch.enable') == [{'patterns': [{'urlPattern': '*', 'requestStage': 'Response'}]}]
+
+    blocker.handle_event('Fetch.requestPaused', dict(paused('1', 'Image'), responseStatusCode=200,
+                                                     responseHeaders=[]), 'session-1')
+    blocker.handle_event('Fetch.requestPaused', dict(paused('2', 'XHR', REVIEWS_URL), responseStatusCode=200,
+                                                     responseStatusText='OK', responseHeaders=[]), 'session-1')
+    deadline = time.monotonic() + 5
+    while len(socket.commands('Fetch.continueRequest')) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sorted(params['requestId'] for params in socket.commands('Fetch.continueRequest')) == ['1', '2']
+    assert not socket.commands('Fetch.failRequest')
+    blocker.close()
+    archive.close()
+
+    replay = TrafficArchive(str(tmp_path / 'run.har.jsonl'), 'replay')
+    assert replay.count == 2
+    assert replay.lookup('GET', REVIEWS_URL)['response']['content']['text'] == '{"reviews": []}'
+
+
+def test_replay_answers_from_the_archive_and_fails_misses_offline(socket, tmp_path):
+    path = tmp_path / 'run.har.jsonl'
+    recorder = TrafficArchive(str(path), 'record')
+    recorder.add('GET', REVIEWS_URL, None, 200, 'OK', [], '{"reviews": []}', False)
+    recorder.close()
+    blocker = resource_blocker.ResourceBlocker('127.0.0.1:9222', resource_blocker.PROFILES['full'],
+                                               archive=TrafficArchive(str(path), 'replay'))
+    blocker.watch(HANDLE)
+    assert socket.commands('Fetch.enable') == [{'patterns': [{'urlPattern': '*', 'requestStage': 'Request'}]}]
+
+    blocker.handle_event('Fetch.requestPaused', paused('1', 'XHR', REVIEWS_URL), 'session-1')
+    blocker.handle_event('Fetch.requestPaused', paused('2', 'XHR', 'https://2gis.ru/api/unknown'), 'session-1')
+    assert [params['requestId'] for params in socket.commands('Fetch.fulfillRequest')] == ['1']
+    assert socket.commands('Fetch.failRequest') == [{'requestId': '2', 'errorReason': 'InternetDisconnected'}]
+    report = blocker.take_report(HANDLE)
+    assert report['replayed'] == 1 and report['replay_misses'] == 1
+    blocker.close()
@@ -0,0 +1,73 @@
+import sys
+from datetime import date
+import review_extractor
+import waits
+from review_index import fingerprint
+
+
+class PagingDriver:
+    """Reviews container that grows by one page per 'Load More' click until total reviews are rendered"""
+
+    def __init__(self, rendered=50, total=500, page_size=50):
+        self.rendered = rendered
+        self.total = total
+        self.page_size = page_size
+        self.clicks = 0
+
+    def execute_script(self, script, *args):
+        if script is review_extractor.PROBE_REVIEW_INDEXES_JS:
+            return list(range(3, self.rendered + 3))
+        if script is review_extractor.REVIEW_NODE_COUNT_JS:
+            return self.rendered + 2
+        if script is review_extractor.CLICK_LOAD_MORE_JS:
+            if self.rendered >= self.total:
+                return False
+            self.clicks += 1
+            self.rendered = min(self.total, self.rendered + self.page_size)
+            return True
+        if script is review_extractor.MORE_REVIEW_NODES_JS:
+            return 'more'
+        raise AssertionError('unexpected script')
+
+
+def test_load_more_clicks():
+    assert review_extractor.load_more_clicks(120, 50) == 2
+    assert review_extractor.load_more_clicks(120, 50, available=60) == 1
+    assert review_extractor.load_more_clicks(10, 50) == 0
+
+
+def test_load_more_steps_stops_at_the_target():
+    driver = PagingDriver()
+    assert waits.run_steps(driver, review_extractor.load_more_steps(driver, 120)) == 2
+    assert driver.rendered == 150
+
+
+def test_load_more_steps_has_no_depth_limit():
+    driver = PagingDriver(total=5000)
+    waits.run_steps(driver, review_extractor.load_more_steps(driver, sys.maxsize))
+    assert driver.rendered == 5000 and driver.clicks == 99
+
+
+def test_load_more_steps_respects_max_clicks_and_available():
+    driver = PagingDriver()
+    assert waits.run_steps(driver, review_extractor.load_more_steps(driver, 400, max_clicks=1)) == 1
+    driver = PagingDriver()
+    assert waits.run_steps(driver, review_extractor.load_more_steps(driver, 400, available=90)) == 1
+
+
+def test_review_date_reads_the_page_formats():
+    today = date(2024, 6, 10)
+    assert review_extractor.review_date('5 июня 2023, отредактирован', today) == '2023-06-05'
+    assert review_extractor.review_date('12 марта', today) == '2024-03-12'
+    assert review_extractor.review_date('12 декабря', today) == '2023-12-12'
+    assert review_extractor.review_date('Сегодня', today) == '2024-06-10'
+    assert review_extractor.review_date('вчера', today) == '2024-06-09'
+    assert review_extractor.review_date('', today) == ''
+
+
+def test_page_and_api_reviews_share_a_fingerprint():
+    page = review_extractor.to_review_record({'index': 3, 'name': 'Ann', 'stars': 5, 'text': 'Good', 'likes': '',
+                                              'date': '2 января 2024', 'truncated': False})
+    api = {'reviewer_name': 'Ann', 'text': 'Good', 'date': '2024-01-02T10:11:12.000000+05:00'}
+    assert page['date'] == '2024-01-02'
+    assert fingerprint(page) == fingerprint(api)
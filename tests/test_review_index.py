@@ -0,0 +1,37 @@
+from api_payloads import parse_reviews_payload
+from review_extractor import to_review_record
+from review_index import ReviewIndex, DeltaFilter, KNOWN_RUN_STOP, fingerprint
+
+FIRM = '70000001012345678'
+
+
+def review(i):
+    return to_review_record({'name': f'Гость {i}', 'stars': 5, 'text': f'Отзыв {i}', 'likes': 0,
+                             'date': f'{i % 28 + 1} января 2024', 'review_id': str(i)})
+
+
+def test_delta_filter_stops_at_the_first_run_of_known_reviews(tmp_path):
+    index = ReviewIndex(str(tmp_path / 'review_index.sqlite'))
+    # The previous crawl wrote reviews 10-39, plus an isolated 3 the list shows among the new ones
+    index.add(FIRM, [review(i) for i in range(10, 40)] + [review(3)])
+    delta = DeltaFilter(index, FIRM)
+
+    first_page = delta.filter([review(i) for i in range(0, 8)])
+    assert [r['review_id'] for r in first_page] == ['0', '1', '2', '4', '5', '6', '7']
+    assert not delta.reached_known
+
+    second_page = delta.filter([review(i) for i in range(8, 20)])
+    assert [r['review_id'] for r in second_page] == ['8', '9']
+    assert delta.reached_known
+    assert delta.skipped == 1 + KNOWN_RUN_STOP
+    index.close()
+
+
+def test_page_and_api_reviews_share_a_fingerprint():
+    page = to_review_record({'name': 'Анна ', 'stars': 4, 'text': 'Хороший кофе', 'likes': 2,
+                             'date': '2 января 2024, отредактирован', 'review_id': ''})
+    api = parse_reviews_payload({'reviews': [{'id': '9001', 'user': {'name': 'Анна'}, 'rating': 4, 'text': 'Хороший кофе\n',
+                                              'likes_count': 2, 'date_created': '2024-01-02T18:20:11.123+07:00'}]})[0]
+    assert page['date'] == api['date'] == '2024-01-02'
+    assert fingerprint(page) == fingerprint(api)
+    assert fingerprint(page) != fingerprint(dict(api, date='2024-01-03'))
@@ -0,0 +1,62 @@
+from lxml import html
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+import snapshot_parser
+from benchmarks.fixtures import review_html
+from review_extractor import extract_review_at, to_review_record
+from selector_registry import SelectorRegistry
+
+
+class LxmlElement:
+    """WebElement stand-in over an lxml node, enough for SelectorRegistry and extract_review_at"""
+
+    def __init__(self, node):
+        self.node = node
+        self.tag_name = node.tag
+
+    @property
+    def text(self):
+        return self.node.text_content()
+
+    def find_elements(self, by, value):
+        xpath = value if by == By.XPATH else f'.//{value}'
+        return [LxmlElement(node) for node in self.node.xpath(xpath)]
+
+    def find_element(self, by, value):
+        found = self.find_elements(by, value)
+        if not found:
+            raise NoSuchElementException(value)
+        return found[0]
+
+
+class SnapshotDriver:
+    """Driver whose reviews container is the parsed snapshot markup"""
+
+    def __init__(self, markup):
+        self.container = LxmlElement(html.fragment_fromstring(markup))
+
+    def find_element(self, by, value):
+        return self.container
+
+    def execute_script(self, script, *args):
+        return {}
+
+
+def test_snapshot_and_dom_extraction_give_the_same_records():
+    # A non-review node between the reviews, as the 'Load More' wrapper is on the page
+    nodes = [review_html('70000001000000001', number, number % 2 == 0) for number in range(6)]
+    nodes.insert(3, '<div><button>Загрузить ещё</button></div>')
+    markup = '<div>' + ''.join(nodes) + '</div>'
+
+    snapshot = snapshot_parser.parse_reviews(markup)
+    driver = SnapshotDriver(markup)
+    selectors = SelectorRegistry(driver)
+    dom = [review for review in (extract_review_at(driver, index, selectors) for index in range(1, len(nodes) + 1)) if review]
+
+    assert [review['index'] for review in snapshot] == [review['index'] for review in dom] == [1, 2, 3, 5, 6, 7]
+    assert [review['truncated'] for review in snapshot] == [review['truncated'] for review in dom]
+    assert [to_review_record(review) for review in snapshot] == [to_review_record(review) for review in dom]
+    first = to_review_record(snapshot[0])
+    assert first['text'].startswith('Review 0 of firm') and first['text'].endswith('...')
+    assert dict(first, text=None) == {'reviewer_name': 'Reviewer 70000001000000001-0', 'rating': '1 stars', 'text': None,
+                                      'likes': '0', 'date': '2024-03-01', 'review_id': ''}
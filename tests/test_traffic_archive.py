@@ -0,0 +1,54 @@
+import base64
+import pytest
+from traffic_archive import TrafficArchive
+
+API = 'https://public-api.reviews.2gis.com/2.0/branches/1/reviews'
+JSON_HEADERS = [{'name': 'Content-Type', 'value': 'application/json'}, {'name': 'Content-Encoding', 'value': 'gzip'}]
+
+
+def record(path, entries):
+    archive = TrafficArchive(str(path), 'record')
+    for url, body in entries:
+        archive.add('GET', url, None, 200, 'OK', JSON_HEADERS, body, False)
+    archive.close()
+    return TrafficArchive(str(path), 'replay')
+
+
+def test_replay_serves_recorded_responses_in_order(tmp_path):
+    replay = record(tmp_path / 'run.har.jsonl', [(f'{API}?limit=50', '{"page": 1}'), (f'{API}?limit=50', '{"page": 2}')])
+    assert replay.count == 2
+    assert replay.lookup('get', f'{API}?limit=50')['response']['content']['text'] == '{"page": 1}'
+    # The last response of a repeated request keeps being served
+    assert replay.lookup('GET', f'{API}?limit=50')['response']['content']['text'] == '{"page": 2}'
+    assert replay.lookup('GET', f'{API}?limit=50')['response']['content']['text'] == '{"page": 2}'
+
+    params = replay.fulfill_params(replay.lookup('GET', f'{API}?limit=50'))
+    assert base64.b64decode(params['body']).decode('utf-8') == '{"page": 2}'
+    assert params['responseCode'] == 200 and params['responsePhrase'] == 'OK'
+    assert [header['name'] for header in params['responseHeaders']] == ['Content-Type']
+
+
+def test_replay_falls_back_to_the_closest_query_on_the_same_path(tmp_path):
+    replay = record(tmp_path / 'run.har.jsonl', [(f'{API}?limit=50&sort_by=date_created&key=old', 'by date'),
+                                                 (f'{API}?limit=50&sort_by=rating&key=old', 'by rating')])
+    entry = replay.lookup('GET', f'{API}?limit=50&sort_by=date_created&key=new&ts=1')
+    assert entry['response']['content']['text'] == 'by date'
+
+
+def test_replay_misses_other_paths_and_methods(tmp_path):
+    replay = record(tmp_path / 'run.har.jsonl', [(f'{API}?limit=50', '{}')])
+    assert replay.lookup('GET', 'https://public-api.reviews.2gis.com/2.0/branches/2/reviews?limit=50') is None
+    assert replay.lookup('POST', f'{API}?limit=50', '{}') is None
+
+
+def test_replay_skips_a_line_torn_by_a_crash(tmp_path):
+    path = tmp_path / 'run.har.jsonl'
+    record(path, [(f'{API}?limit=50', '{}')])
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"request": {"method": "GET", "ur')
+    assert TrafficArchive(str(path), 'replay').count == 1
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        TrafficArchive(str(tmp_path / 'run.har.jsonl'), 'rewrite')
@@ -0,0 +1,45 @@
+from concurrent.futures import Future
+import waits
+
+
+class FailingDriver:
+    def execute_script(self, script, *args):
+        raise RuntimeError('Execution context was destroyed')
+
+
+def place_steps(log):
+    reviews = ['kept']
+    try:
+        yield waits.Wait('return false;', timeout=1)
+        reviews.append('unreachable')
+    except Exception as e:
+        log.append(str(e))
+    return reviews
+
+
+def test_run_steps_throws_wait_errors_into_the_generator():
+    log = []
+    assert waits.run_steps(FailingDriver(), place_steps(log)) == ['kept']
+    assert log == ['Execution context was destroyed']
+
+
+def test_step_task_throws_wait_errors_into_the_generator():
+    log = []
+    task = waits.StepTask(place_steps(log))
+    task.advance()
+    assert task.poll(FailingDriver())
+    assert task.done and task.result == ['kept']
+    assert log == ['Execution context was destroyed']
+
+
+def test_failed_future_is_thrown_into_the_generator():
+    future = Future()
+    future.set_exception(ValueError('parse failed'))
+
+    def steps():
+        try:
+            yield waits.Wait(future=future)
+        except ValueError as e:
+            return str(e)
+
+    assert waits.run_steps(None, steps()) == 'parse failed'
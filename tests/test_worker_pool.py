@@ -0,0 +1,118 @@
+from parser_engine import Parser2GIS
+from waits import Wait
+import worker_pool
+
+
+class TabsDriver:
+    """One browser whose tabs are window handles; scripts are answered by the tab that is current"""
+
+    def __init__(self):
+        self.handles = ['tab-1']
+        self.current_window_handle = 'tab-1'
+        self.switch_to = self
+        self.quit_calls = 0
+
+    def new_window(self, kind):
+        self.handles.append(f'tab-{len(self.handles) + 1}')
+        self.current_window_handle = self.handles[-1]
+
+    def window(self, handle):
+        self.current_window_handle = handle
+
+    def set_window_size(self, width, height):
+        pass
+
+    def execute_script(self, script, *args):
+        return True
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+def fake_browser(monkeypatch, driver):
+    monkeypatch.setattr(Parser2GIS, 'setup_driver', lambda self: driver)
+    monkeypatch.setattr(Parser2GIS, 'setup_network_interception', lambda self: None)
+    monkeypatch.setattr(Parser2GIS, 'start_resource_blocker', lambda self: None)
+
+
+def test_tab_pool_runs_every_tab_on_its_own_parser(monkeypatch):
+    driver = TabsDriver()
+    fake_browser(monkeypatch, driver)
+    seen = []
+
+    def place_steps(self, url):
+        handle = self.driver.current_window_handle
+        self.api_review_ids = {url}  # Per-place state a shared parser would lose to the other tabs
+        for _ in range(3):
+            yield Wait('return true;')
+            assert self.driver.current_window_handle == handle
+            assert self.api_review_ids == {url}
+        seen.append((url, handle, self))
+        return {'Ссылка': url}
+
+    monkeypatch.setattr(Parser2GIS, 'place_steps', place_steps)
+    pool = worker_pool.TabPool(tabs=3)
+    urls = [f'https://2gis.ru/almaty/firm/{i}' for i in range(7)]
+    records = pool.run(urls)
+
+    assert sorted(record['Ссылка'] for record in records) == sorted(urls)
+    parsers_by_handle = {}
+    for _, handle, parser in seen:
+        assert parsers_by_handle.setdefault(handle, parser) is parser
+    assert len(set(map(id, parsers_by_handle.values()))) == 3
+    assert len({id(parser.selectors) for parser in pool.parsers}) == 3
+    assert driver.quit_calls == 1
+
+
+class FakeParser:
+    """Stands in for a worker's Parser2GIS: scrape_place answers from a table instead of a browser"""
+
+    def __init__(self, outcomes, opened):
+        self.outcomes = outcomes
+        self.opened = opened
+        self.parsing_active = False
+
+    def open_browser(self):
+        self.opened.append(self)
+
+    def close_browser(self):
+        self.closed = True
+
+    def scrape_place(self, url):
+        outcome = self.outcomes[url]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def fake_pool(monkeypatch, outcomes, **options):
+    opened = []
+    pool = worker_pool.BrowserWorkerPool(**options)
+    monkeypatch.setattr(pool, 'create_parser', lambda: FakeParser(outcomes, opened))
+    return pool, opened
+
+
+def test_browser_worker_pool_keeps_queue_order_with_one_worker(monkeypatch):
+    urls = [f'https://2gis.ru/almaty/firm/{i}' for i in range(6)]
+    pool, opened = fake_pool(monkeypatch, {url: {'Ссылка': url} for url in urls}, workers=1)
+    assert [record['Ссылка'] for record in pool.run(iter(urls))] == urls
+    assert len(opened) == 1 and opened[0].closed
+
+
+def test_browser_worker_pool_marks_failed_places_in_the_ledger(monkeypatch, tmp_path):
+    from job_ledger import JobLedger
+
+    urls = [f'https://2gis.ru/almaty/firm/{i}' for i in range(9)]
+    outcomes = {url: {'Ссылка': url} for url in urls}
+    outcomes[urls[2]] = TimeoutError('page did not load')
+    outcomes[urls[5]] = None  # Not a company page: skipped, not failed
+    ledger = JobLedger('кафе', path=str(tmp_path / 'jobs.sqlite'))
+    collected = []
+    pool, opened = fake_pool(monkeypatch, outcomes, workers=3, ledger=ledger, on_record=collected.append)
+
+    assert pool.run(urls) == []
+    assert sorted(record['Ссылка'] for record in collected) == sorted(url for url in urls if url not in (urls[2], urls[5]))
+    assert len(opened) == 3
+    assert ledger.counts() == {'failed': 1}
+    assert ledger.execute('SELECT url, error FROM places') == [(urls[2], 'page did not load')]
+    ledger.close()
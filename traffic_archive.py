@@ -0,0 +1,111 @@
+import os
+import json
+import base64
+import datetime
+import threading
+from collections import defaultdict, deque
+from urllib.parse import urlsplit, parse_qsl
+
+# Headers that no longer match the stored body, which DevTools hands over decoded
+SKIPPED_REPLAY_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+def request_key(method, url, post_data=None):
+    return method.upper(), url, post_data or ''
+
+
+def path_key(method, url):
+    parts = urlsplit(url)
+    return method.upper(), parts.scheme, parts.netloc, parts.path
+
+
+class TrafficArchive:
+    """
+    Responses of a crawl as HAR entries, one JSON object per line
+
+    In 'record' mode resource_blocker.ResourceBlocker appends every response as it arrives, so
+    an interrupted crawl keeps what it received. In 'replay' mode the file is loaded and lookup()
+    serves the responses back: repeated requests get their recorded responses in order, and a
+    request never seen exactly falls back to the same path with the most query parameters in
+    common (tokens and timestamps differ between runs).
+    """
+
+    def __init__(self, path, mode='record'):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown traffic archive mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.file = None
+        self.exact = defaultdict(deque)
+        self.by_path = defaultdict(list)
+        self.count = 0
+        if mode == 'record':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.file = open(path, 'a', encoding='utf-8')
+        else:
+            self.load()
+
+    def load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Line torn by a crash
+                request = entry['request']
+                post_data = (request.get('postData') or {}).get('text')
+                self.exact[request_key(request['method'], request['url'], post_data)].append(entry)
+                self.by_path[path_key(request['method'], request['url'])].append(entry)
+                self.count += 1
+
+    def add(self, method, url, post_data, status, status_text, headers, body, base64_encoded):
+        """Append one response; body is the text or base64 returned by Fetch.getResponseBody"""
+        mime_type = next((header['value'] for header in headers if header['name'].lower() == 'content-type'), '')
+        request = {'method': method, 'url': url, 'headers': []}
+        if post_data:
+            request['postData'] = {'mimeType': '', 'text': post_data}
+        content = {'size': len(body), 'mimeType': mime_type, 'text': body}
+        if base64_encoded:
+            content['encoding'] = 'base64'
+        entry = {
+            'startedDateTime': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'request': request,
+            'response': {'status': status, 'statusText': status_text, 'headers': headers, 'content': content},
+        }
+        with self.lock:
+            self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.file.flush()
+            self.count += 1
+
+    def lookup(self, method, url, post_data=None):
+        """The recorded entry for a request, or None"""
+        with self.lock:
+            queue = self.exact.get(request_key(method, url, post_data))
+            if queue:
+                # The last response of a repeated request keeps being served
+                return queue.popleft() if len(queue) > 1 else queue[0]
+            candidates = self.by_path.get(path_key(method, url))
+            if not candidates:
+                return None
+            params = set(parse_qsl(urlsplit(url).query))
+            return max(candidates, key=lambda entry: len(params & set(parse_qsl(urlsplit(entry['request']['url']).query))))
+
+    def fulfill_params(self, entry):
+        """Fetch.fulfillRequest parameters for a recorded entry, without the request id"""
+        response = entry['response']
+        content = response['content']
+        body = content.get('text') or ''
+        if content.get('encoding') != 'base64':
+            body = base64.b64encode(body.encode('utf-8')).decode('ascii')
+        headers = [header for header in response['headers'] if header['name'].lower() not in SKIPPED_REPLAY_HEADERS]
+        params = {'responseCode': response['status'], 'responseHeaders': headers, 'body': body}
+        if response.get('statusText'):
+            params['responsePhrase'] = response['statusText']
+        return params
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
@@ -7,9 +7,13 @@ import os
 import re
 from urllib.parse import urlparse
 
+# Parser2GIS.review_mode values; the first is the default
+REVIEW_MODES = ('batch', 'api', 'snapshot', 'index')
+
 class ParserUI:
-    def __init__(self, root):
+    def __init__(self, root, chrome_port=None):
         self.root = root
+        self.chrome_port = chrome_port  # Browser daemon to attach to (main.py --attach), None launches Chrome
         self.root.title("2GIS Parser")
         self.root.geometry("900x650")
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -68,6 +72,11 @@ class ParserUI:
         self.entry_max_reviews = ttk.Entry(self.frame_reviews, width=5)
         self.entry_max_reviews.insert(0, "10")
         self.entry_max_reviews.grid(row=0, column=2, padx=5, pady=5, sticky=tk.W)
+
+        ttk.Label(self.frame_reviews, text="Review mode:").grid(row=0, column=3, padx=5, pady=5, sticky=tk.W)
+        self.combo_review_mode = ttk.Combobox(self.frame_reviews, values=REVIEW_MODES, state='readonly', width=9)
+        self.combo_review_mode.set(REVIEW_MODES[0])
+        self.combo_review_mode.grid(row=0, column=4, padx=5, pady=5, sticky=tk.W)
         
         # Dynamic reviews info that appears during review extraction
         self.review_info_frame = ttk.Frame(self.frame_reviews)
@@ -115,6 +124,7 @@ class ParserUI:
         """Enable/disable review options based on checkbox"""
         state = "normal" if self.var_scrape_reviews.get() else "disabled"
         self.entry_max_reviews.config(state=state)
+        self.combo_review_mode.config(state='readonly' if self.var_scrape_reviews.get() else 'disabled')
     
     def _configure_logging(self):
         """Configure logging to text widget"""
@@ -253,6 +263,7 @@ class ParserUI:
         self.entry_url.config(state=tk.DISABLED)
         self.chk_scrape_reviews.config(state=tk.DISABLED)
         self.entry_max_reviews.config(state=tk.DISABLED)
+        self.combo_review_mode.config(state=tk.DISABLED)
         
         # Clear log
         self.log_text.configure(state='normal')
@@ -272,7 +283,9 @@ class ParserUI:
             scrape_reviews=scrape_reviews,
             max_reviews=max_reviews, 
             direct_url=direct_url if direct_url else None,
-            on_review_update=on_review_update
+            on_review_update=on_review_update,
+            review_mode=self.combo_review_mode.get(),
+            chrome_port=self.chrome_port
         )
         
         # Start parsing in a separate thread
@@ -0,0 +1,184 @@
+from time import monotonic
+from profiler import profiled_sleep as sleep
+
+# Truthy once the element at arguments[0] exists and is rendered
+ELEMENT_VISIBLE_JS = """
+    const element = document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    return !!(element && element.getClientRects().length);
+"""
+
+# Injected into every document: counts in-flight fetch/XHR requests for the network-idle signal
+# and turns off transitions, animations and CSS smooth scrolling. A script asking for
+# scrollIntoView({behavior: 'smooth'}) still animates, so the scripts here scroll with 'instant'.
+PAGE_HELPERS_JS = """
+(function() {
+    if (window.__p2gNetwork) return;
+    const net = window.__p2gNetwork = {inflight: 0, lastEnd: performance.now()};
+    const begin = () => { net.inflight++; };
+    const end = () => { net.inflight = Math.max(0, net.inflight - 1); net.lastEnd = performance.now(); };
+
+    const originalFetch = window.fetch;
+    window.fetch = function() {
+        begin();
+        return originalFetch.apply(this, arguments).finally(end);
+    };
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        begin();
+        this.addEventListener('loadend', end, {once: true});
+        return originalSend.apply(this, arguments);
+    };
+
+    const addStyle = () => {
+        const style = document.createElement('style');
+        style.textContent = '*, *::before, *::after { transition: none !important; animation: none !important; ' +
+                            'scroll-behavior: auto !important; }';
+        document.head.appendChild(style);
+    };
+    if (document.head) addStyle(); else document.addEventListener('DOMContentLoaded', addStyle);
+})();
+"""
+
+# In-page helper for wait scripts: true once no request is in flight and none has finished
+# (and nothing was clicked through CLICK_JS) for idleMs
+NETWORK_SETTLED_HELPER_JS = """
+    function networkSettled(idleMs) {
+        const net = window.__p2gNetwork;
+        if (!net) return false;
+        const since = Math.max(net.lastEnd, window.__p2gClickAt || 0);
+        return net.inflight === 0 && performance.now() - since >= idleMs;
+    }
+"""
+
+NETWORK_IDLE_JS = NETWORK_SETTLED_HELPER_JS + "return networkSettled(arguments[0]);"
+
+# Scrolls the element into view without animation and clicks it, remembering when for networkSettled()
+CLICK_JS = """
+    arguments[0].scrollIntoView({block: 'center', behavior: 'instant'});
+    window.__p2gClickAt = performance.now();
+    arguments[0].click();
+"""
+
+# Truthy once location.href differs from arguments[0] and the document is loaded
+LOCATION_CHANGED_JS = "return location.href !== arguments[0] && document.readyState === 'complete';"
+
+NETWORK_IDLE_MS = 500
+
+# Truthy once a navigation started with NAVIGATE_JS has produced a new, fully loaded document
+NAVIGATE_JS = "window.__p2gNavigating = true; window.location.href = arguments[0];"
+NAVIGATION_DONE_JS = "return !window.__p2gNavigating && document.readyState === 'complete';"
+
+
+class Wait:
+    """
+    A pause yielded by a step generator
+
+    With a script the wait ends as soon as the script returns a truthy value (which is sent
+    back into the generator) or after timeout seconds (None is sent). With a future (work handed
+    to a thread or process pool) it ends when the future is done and its result is sent.
+    Otherwise it is a plain delay of timeout seconds.
+    """
+
+    def __init__(self, script=None, *args, timeout=10.0, poll=0.1, future=None):
+        self.script = script
+        self.args = args
+        self.future = future
+        self.timeout = timeout
+        self.poll = poll
+        self.deadline = None
+
+    def start(self):
+        self.deadline = monotonic() + self.timeout
+
+    def check(self, driver):
+        """Evaluate the wait once; returns (finished, value)"""
+        if self.future is not None:
+            if self.future.done():
+                return True, self.future.result()
+            return monotonic() >= self.deadline, None
+        if self.script is None:
+            return monotonic() >= self.deadline, True
+        value = driver.execute_script(self.script, *self.args)
+        if value:
+            return True, value
+        return monotonic() >= self.deadline, None
+
+    def remaining(self):
+        return max(0.0, self.deadline - monotonic())
+
+
+def install_page_helpers(driver):
+    """Inject PAGE_HELPERS_JS into every future document and the current one"""
+    driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': PAGE_HELPERS_JS})
+    driver.execute_script(PAGE_HELPERS_JS)
+
+
+def wait_until(driver, script, *args, timeout=10.0, poll=0.1):
+    """Block until script returns a truthy value; returns that value, or None on timeout"""
+    wait = Wait(script, *args, timeout=timeout, poll=poll)
+    wait.start()
+    finished, value = wait.check(driver)
+    while not finished:
+        sleep(poll)
+        finished, value = wait.check(driver)
+    return value
+
+
+def run_steps(driver, steps):
+    """Drive a step generator to completion, blocking on every Wait it yields; returns its result"""
+    try:
+        wait = next(steps)
+        while True:
+            wait.start()
+            try:
+                finished, value = wait.check(driver)
+                while not finished:
+                    sleep(wait.poll if wait.script or wait.future else wait.remaining())
+                    finished, value = wait.check(driver)
+            except Exception as e:
+                # Raised at the yield, so the generator's own error handling decides
+                wait = steps.throw(e)
+                continue
+            wait = steps.send(value)
+    except StopIteration as stop:
+        return stop.value
+
+
+class StepTask:
+    """A step generator that can be advanced a little at a time, so several can share one driver"""
+
+    def __init__(self, steps, key=None):
+        self.steps = steps
+        self.key = key
+        self.wait = None
+        self.done = False
+        self.result = None
+
+    def advance(self, value=None, error=None):
+        """Run the generator up to its next Wait (or to completion); error is raised inside it at the current yield"""
+        try:
+            if error is not None:
+                self.wait = self.steps.throw(error)
+            else:
+                self.wait = next(self.steps) if self.wait is None else self.steps.send(value)
+            self.wait.start()
+        except StopIteration as stop:
+            self.done = True
+            self.result = stop.value
+
+    def ready(self):
+        """True when the current wait is a delay that has elapsed or a condition worth polling"""
+        if self.wait.future is not None:
+            return self.wait.future.done() or self.wait.remaining() == 0
+        return self.wait.script is not None or self.wait.remaining() == 0
+
+    def poll(self, driver):
+        """Check the current wait and advance when it is over; returns True if the task moved on"""
+        try:
+            finished, value = self.wait.check(driver)
+        except Exception as e:
+            self.advance(error=e)
+            return True
+        if finished:
+            self.advance(value)
+        return finished
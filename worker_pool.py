@@ -0,0 +1,271 @@
+import os
+import queue
+import logging
+import threading
+from profiler import profiled_sleep as sleep
+from parser_engine import Parser2GIS
+from waits import StepTask
+
+CHROME_MEMORY_MB = 300  # Approximate resident size of one headless Chrome worker
+
+
+def default_worker_count(memory_per_worker_mb=CHROME_MEMORY_MB):
+    """Derive a worker count from the CPU count and the currently available RAM"""
+    workers = os.cpu_count() or 1
+    try:
+        available_mb = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+        workers = min(workers, available_mb // memory_per_worker_mb)
+    except (AttributeError, ValueError, OSError):
+        pass  # sysconf is unavailable on Windows; rely on the CPU count
+    return max(1, workers)
+
+
+class BrowserWorkerPool:
+    """Scrape place URLs with N headless Chrome workers that share one queue and one result collector"""
+
+    def __init__(self, workers=None, on_log=None, on_record=None, scrape_reviews=False, max_reviews=5,
+                 review_mode='batch', headless=True, resource_profile='lean', ledger=None, new_reviews_only=False,
+                 review_index=None, profile_driver=False, traffic_archive=None, prune_reviews=False):
+        self.workers = workers or default_worker_count()
+        self.on_log = on_log
+        self.on_record = on_record
+        self.scrape_reviews = scrape_reviews
+        self.max_reviews = max_reviews
+        self.review_mode = review_mode
+        self.headless = headless
+        self.resource_profile = resource_profile
+        self.ledger = ledger  # Shared JobLedger: review checkpoints and failed places
+        self.new_reviews_only = new_reviews_only
+        self.review_index = review_index
+        self.profile_driver = profile_driver
+        self.traffic_archive = traffic_archive
+        self.prune_reviews = prune_reviews
+        self.urls = queue.Queue()
+        self.results = queue.Queue()
+        self.parsers = []
+        self.active = False
+        self.producer_done = threading.Event()
+
+    def log(self, message, level='info'):
+        """Log message to both internal logger and UI logger if provided"""
+        getattr(logging, level if level in ('info', 'warning', 'error') else 'info')(message)
+        if self.on_log:
+            self.on_log(message, level)
+
+    def create_parser(self):
+        """Create the Parser2GIS instance that owns one worker's browser; workers never attach to a shared daemon"""
+        return Parser2GIS('', on_log=self.on_log, chrome_port=None, scrape_reviews=self.scrape_reviews, max_reviews=self.max_reviews,
+                          review_mode=self.review_mode, headless=self.headless, resource_profile=self.resource_profile,
+                          ledger=self.ledger, new_reviews_only=self.new_reviews_only, review_index=self.review_index,
+                          profile_driver=self.profile_driver, traffic_archive=self.traffic_archive,
+                          prune_reviews=self.prune_reviews)
+
+    def worker(self, worker_id):
+        """Pull URLs from the shared queue until it is drained or the pool is stopped"""
+        parser = self.create_parser()
+        self.parsers.append(parser)
+        try:
+            parser.open_browser()
+            parser.parsing_active = True
+        except Exception as e:
+            self.log(f"Worker {worker_id} could not start Chrome: {e}", "error")
+            return
+
+        try:
+            while self.active:
+                try:
+                    url = self.urls.get(timeout=0.5)
+                except queue.Empty:
+                    if self.producer_done.is_set():
+                        break
+                    continue
+                try:
+                    self.log(f"Worker {worker_id} processing {url}")
+                    record = parser.scrape_place(url)
+                    if record:
+                        self.results.put(record)
+                    else:
+                        self.log(f"Worker {worker_id}: {url} is not a company page", "warning")
+                except Exception as e:
+                    self.log(f"Worker {worker_id} failed on {url}: {e}", "warning")
+                    if self.ledger:
+                        self.ledger.mark_failed(url, e)
+                finally:
+                    self.urls.task_done()
+        finally:
+            parser.parsing_active = False
+            parser.close_browser()
+
+    def feed(self, urls):
+        """Put URLs on the queue; accepts any iterable so places can be streamed in while workers run"""
+        try:
+            for url in urls:
+                if not self.active:
+                    break
+                self.urls.put(url)
+        finally:
+            self.producer_done.set()
+
+    def run(self, urls):
+        """
+        Scrape all URLs and collect the records in the calling thread
+
+        Args:
+            urls: Iterable of place URLs
+
+        Returns:
+            list: Records in completion order (empty when on_record consumes them)
+        """
+        self.active = True
+        self.producer_done.clear()
+        threads = [threading.Thread(target=self.worker, args=(i + 1,), daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        producer = threading.Thread(target=self.feed, args=(urls,), daemon=True)
+        producer.start()
+        self.log(f"Started {self.workers} browser workers")
+
+        records = []
+        try:
+            while any(thread.is_alive() for thread in threads) or not self.results.empty():
+                try:
+                    record = self.results.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if self.on_record:
+                    self.on_record(record)
+                else:
+                    records.append(record)
+        finally:
+            self.active = False
+            for thread in threads:
+                thread.join()
+        return records
+
+    def stop(self):
+        """Stop all workers after their current place"""
+        self.active = False
+        for parser in self.parsers:
+            parser.parsing_active = False
+
+
+class TabPool:
+    """
+    Interleave K places across the tabs of a single Chrome
+
+    Each tab runs the place's step generator. While one tab waits on a page load or a
+    'Load More' batch, the scheduler switches to another tab whose wait is over.
+    """
+
+    def __init__(self, tabs=4, on_log=None, on_record=None, scrape_reviews=False, max_reviews=5,
+                 review_mode='batch', headless=True, resource_profile='lean', ledger=None, new_reviews_only=False,
+                 review_index=None, profile_driver=False, traffic_archive=None, prune_reviews=False, chrome_port=None):
+        self.tabs = tabs
+        self.on_log = on_log
+        self.on_record = on_record
+        # One parser per tab, so every place keeps its own review state; the first one owns the browser
+        self.parsers = [Parser2GIS('', on_log=on_log, scrape_reviews=scrape_reviews, max_reviews=max_reviews,
+                                   review_mode=review_mode, headless=headless, resource_profile=resource_profile,
+                                   ledger=ledger, new_reviews_only=new_reviews_only, review_index=review_index,
+                                   profile_driver=profile_driver, traffic_archive=traffic_archive,
+                                   prune_reviews=prune_reviews, chrome_port=chrome_port) for i in range(max(1, tabs))]
+        self.parser = self.parsers[0]
+        self.active = False
+
+    def log(self, message, level='info'):
+        """Log message to both internal logger and UI logger if provided"""
+        getattr(logging, level if level in ('info', 'warning', 'error') else 'info')(message)
+        if self.on_log:
+            self.on_log(message, level)
+
+    def open_tabs(self):
+        """Start Chrome and open the tabs; returns {window handle: parser of that tab}"""
+        self.parser.open_browser()
+        driver = self.parser.driver
+        tabs = {driver.current_window_handle: self.parser}
+        for parser in self.parsers[1:]:
+            driver.switch_to.new_window('tab')
+            parser.share_browser(self.parser)
+            tabs[driver.current_window_handle] = parser
+            # CDP scripts and blocking are per tab
+            self.parser.setup_network_interception()
+            self.parser.start_resource_blocker()
+        for parser in self.parsers:
+            parser.parsing_active = True
+        if self.parser.attached:
+            self.parser.owned_handles = list(tabs)
+        return tabs
+
+    def run(self, urls):
+        """
+        Scrape all URLs, keeping every tab busy
+
+        Args:
+            urls: Iterable of place URLs
+
+        Returns:
+            list: Records in completion order (empty when on_record consumes them)
+        """
+        self.active = True
+        records = []
+        pending = iter(urls)
+        exhausted = False
+        try:
+            parsers = self.open_tabs()
+            handles = list(parsers)
+            driver = self.parser.driver
+            tasks = dict.fromkeys(handles)
+            current = driver.current_window_handle
+            while self.active:
+                progressed = False
+                for handle in handles:
+                    task = tasks[handle]
+                    if task is None:
+                        url = None if exhausted else next(pending, None)
+                        if url is None:
+                            exhausted = True
+                            continue
+                        task = tasks[handle] = StepTask(parsers[handle].place_steps(url), key=url)
+                    elif not task.ready():
+                        continue
+
+                    if handle != current:
+                        driver.switch_to.window(handle)
+                        current = handle
+                    try:
+                        if task.wait is None:
+                            task.advance()
+                            progressed = True
+                        else:
+                            progressed = task.poll(driver) or progressed
+                    except Exception as e:
+                        self.log(f"Tab failed on {task.key}: {e}", "warning")
+                        if self.parser.ledger:
+                            self.parser.ledger.mark_failed(task.key, e)
+                        tasks[handle] = None
+                        continue
+
+                    if task.done:
+                        tasks[handle] = None
+                        if task.result:
+                            if self.on_record:
+                                self.on_record(task.result)
+                            else:
+                                records.append(task.result)
+                        else:
+                            self.log(f"{task.key} is not a company page", "warning")
+
+                if exhausted and all(task is None for task in tasks.values()):
+                    break
+                if not progressed:
+                    sleep(0.05)
+        finally:
+            self.active = False
+            for parser in self.parsers:
+                parser.parsing_active = False
+            self.parser.close_browser()
+        return records
+
+    def stop(self):
+        """Stop after the current step of every tab"""
+        self.active = False